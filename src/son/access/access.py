@@ -67,10 +67,10 @@ import time
 from os.path import expanduser
 from argparse import ArgumentParser
 from Crypto.PublicKey import RSA
-from Crypto.Hash import SHA256
 from son.workspace.workspace import Workspace
 from son.access.pull import Pull
 from son.access.push import Push
+from son.package.md5 import file_digest
 
 log = logging.getLogger(__name__)
 
@@ -465,10 +465,10 @@ class AccessClient:
                 if not result:
                     return
             # CALL SIGN METHOD
-            # Push son-package to the Service Platform
-            sign = self.sign_package(path)
+            # Push son-package to the Service Platform. The package digest
+            # is computed while it is read for the upload, when possible
             print(self.default_push.upload_package
-                  (self.access_token, path, sign))
+                  (self.access_token, path, signer=self.sign_digest))
 
         else:
             # Push son-package to the Service Platform
@@ -483,18 +483,29 @@ class AccessClient:
         :return: string containing an int representation of the 
                  package's signature
         """
+        try:
+            # streamed, the package is never fully loaded in memory
+            package_hash = file_digest(path, 'sha256')
+        except IOError as err:
+            print("I/O error: {0}".format(err))
+            return
+
+        return self.sign_digest(package_hash, private_key=private_key)
+
+    def sign_digest(self, package_hash, private_key=None):
+        """
+        Sign the SHA256 digest of a package using the RSA keypair
+        :param package_hash: SHA256 digest (bytes) of the package
+        :param private_key: optional private_key used in signature
+                           (default None)
+        :return: string containing an int representation of the
+                 package's signature
+        """
         if private_key:
             # Private key used to test
             private_key_obj = RSA.importKey(private_key)
         else:
             private_key_obj = RSA.importKey(self.dev_private_key)
-        try:
-            with open(path, 'rb') as fhandle:
-                package_content = fhandle.read()
-        except IOError as err:
-            print("I/O error: {0}".format(err))
-        # File read as binary, it's not necessary to encode 'utf-8' to hash
-        package_hash = SHA256.new(package_content).digest()
         # Signature is a tuple containing an integer as first entry
         signature = private_key_obj.sign(package_hash, '')
         return str(signature[0])
@@ -29,6 +29,7 @@ import requests
 import logging
 import sys
 from son.access.config.config import GK_ADDRESS, GK_PORT
+from son.access.upload import PackageUploader, log_progress
 
 log = logging.getLogger(__name__)
 
@@ -164,9 +165,16 @@ class Push(object):
 
         return response
 
-    def upload_package(self, access_token, package_file_name, signature=None):
+    def upload_package(self, access_token, package_file_name, signature=None,
+                       signer=None, progress=None,
+                       chunk_size=PackageUploader.DEFAULT_CHUNK_SIZE,
+                       retries=PackageUploader.DEFAULT_RETRIES,
+                       backoff=PackageUploader.DEFAULT_BACKOFF,
+                       resumable=None):
         """
-        Upload package to platform
+        Upload package to platform.
+        The package is streamed from disk, failed uploads are retried and,
+        if supported by the gatekeeper, resumed (see PackageUploader)
 
         :param access_token: authentication token that enables
                              access to the SONATA service
@@ -180,6 +188,25 @@ class Push(object):
         :param signature: Sets to True or False if the package is signed
                      before pushing it to the Platform
 
+        :param signer: callable(digest) returning the signature of the
+                       SHA256 digest of the package. The digest is computed
+                       while streaming the upload, where possible. Ignored
+                       if signature is given
+
+        :param progress: callable(sent, total) reporting the upload
+                         progress. By default, it is logged
+
+        :param chunk_size: number of bytes read (and, if resumable,
+                           sent per request) at a time
+
+        :param retries: maximum number of consecutive retries
+
+        :param backoff: delay (seconds) before the first retry, doubled
+                        on each subsequent retry
+
+        :param resumable: use resumable uploads. If None, they are used
+                          only if supported by the gatekeeper
+
         :returns: text response message of the server or
                   error message
         """
@@ -196,24 +223,29 @@ class Push(object):
             return url, "is not a valid url."
 
         try:
-            with open(package_file_name, 'rb') as pkg_file:
-                payload = {'package': pkg_file}
-                if access_token:
-                    headers = {'Authorization': "Bearer %s" % access_token}
-                else:
-                    headers = {}
-                if signature:
-                    # Including signature header in case it's passed as param
-                    print("SIGNATURE= ", signature)
-                    headers['signature'] = signature
-                r = requests.post(url, headers=headers, files=payload)
-                if r.status_code == 201:
-                    msg = "Upload succeeded"
-                elif r.status_code == 409:
-                    msg = "Package already exists"
-                else:
-                    msg = "Upload error"
-                return "%s (%d): %r" % (msg, r.status_code, r.text)
+            if access_token:
+                headers = {'Authorization': "Bearer %s" % access_token}
+            else:
+                headers = {}
+            if signature:
+                # Including signature header in case it's passed as param
+                print("SIGNATURE= ", signature)
+                headers['signature'] = signature
+
+            uploader = PackageUploader(
+                url, headers=headers, field='package', chunk_size=chunk_size,
+                retries=retries, backoff=backoff, resumable=resumable,
+                progress=progress if progress else log_progress(),
+                signer=None if signature else signer)
+            r = uploader.upload(package_file_name)
+            # a completed resumable upload is acknowledged with 204
+            if r.status_code in (201, 204):
+                msg = "Upload succeeded"
+            elif r.status_code == 409:
+                msg = "Package already exists"
+            else:
+                msg = "Upload error"
+            return "%s (%d): %r" % (msg, r.status_code, r.text)
 
         except Exception as e:
             return "Service package upload failed. " + str(e)
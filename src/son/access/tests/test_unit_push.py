@@ -0,0 +1,235 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE, i2CAT,
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE, i2CAT,
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import hashlib
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import unittest
+from email.parser import BytesParser
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from son.access.push import Push
+from son.access.upload import PackageUploader, UploadError
+
+
+class StandInGatekeeper(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    Local stand-in of the gatekeeper package upload endpoint. Supports
+    multipart uploads and, optionally, resumable (tus) uploads. A number
+    of requests can be set to fail.
+    """
+    daemon_threads = True
+
+    def __init__(self, resumable=False, failures=0):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.resumable = resumable
+        self.failures = failures
+        self.packages = dict()
+        self.uploads = dict()
+        self.requests = []
+        self.signatures = []
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, headers=None, body=b''):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def fail(self):
+        self.server.requests.append(self.command)
+        if 'signature' in self.headers:
+            self.server.signatures.append(self.headers['signature'])
+        if self.server.failures > 0 and self.command in ('POST', 'PATCH'):
+            self.server.failures -= 1
+            self.body()
+            self.reply(503)
+            return True
+        return False
+
+    def do_OPTIONS(self):
+        self.server.requests.append(self.command)
+        if self.server.resumable:
+            self.reply(204, {'Tus-Resumable': '1.0.0',
+                             'Tus-Version': '1.0.0',
+                             'Tus-Extension': 'creation'})
+        else:
+            self.reply(405)
+
+    def do_POST(self):
+        if self.fail():
+            return
+
+        if 'Upload-Length' in self.headers:
+            upload = '/uploads/{}'.format(len(self.server.uploads))
+            self.server.uploads[upload] = [
+                int(self.headers['Upload-Length']), b'']
+            self.reply(201, {'Location': upload})
+            return
+
+        message = BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode() +
+            b'\r\n\r\n' + self.body())
+        for part in message.get_payload():
+            if part.get_param('name', header='content-disposition') == \
+                    'package':
+                self.server.packages[part.get_filename()] = \
+                    part.get_payload(decode=True)
+        self.reply(201, body=b'{"uuid": "1"}')
+
+    def do_PATCH(self):
+        if self.fail():
+            return
+
+        upload = self.server.uploads[self.path]
+        data = self.body()
+        if int(self.headers['Upload-Offset']) != len(upload[1]):
+            self.reply(409)
+            return
+
+        # only store half of the first chunk, then fail
+        if self.server.resumable == 'partial':
+            self.server.resumable = True
+            upload[1] += data[:len(data) // 2]
+            self.reply(500)
+            return
+
+        upload[1] += data
+        self.reply(204, {'Upload-Offset': str(len(upload[1]))})
+
+    def do_HEAD(self):
+        self.server.requests.append(self.command)
+        upload = self.server.uploads[self.path]
+        self.reply(200, {'Upload-Offset': str(len(upload[1])),
+                         'Upload-Length': str(upload[0])})
+
+
+class UnitPushUploadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.package = os.path.join(self.root, 'sonata.son')
+        self.content = os.urandom(300000)
+        with open(self.package, 'wb') as f:
+            f.write(self.content)
+        self.server = None
+
+    def tearDown(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        shutil.rmtree(self.root)
+
+    def start(self, **kwargs):
+        self.server = StandInGatekeeper(**kwargs)
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        return self.server
+
+    def test_multipart_upload(self):
+        """ The package is streamed and progress reported """
+        server = self.start(failures=1)
+        progress = []
+        msg = Push(server.url).upload_package(
+            None, self.package, progress=lambda s, t: progress.append((s, t)),
+            chunk_size=65536, backoff=0)
+
+        self.assertTrue(msg.startswith('Upload succeeded (201)'), msg)
+        self.assertEqual(server.packages['sonata.son'], self.content)
+        self.assertEqual(server.requests, ['OPTIONS', 'POST', 'POST'])
+
+        # chunks of the configured size, up to the multipart body size
+        self.assertGreater(len(progress), 300000 // 65536)
+        self.assertEqual(progress[-1][0], progress[-1][1])
+
+    def test_retries_exhausted(self):
+        server = self.start(failures=10)
+        uploader = PackageUploader(server.url + '/api/v2/packages',
+                                   retries=2, backoff=0, resumable=False)
+        with self.assertRaises(UploadError):
+            uploader.upload(self.package)
+        self.assertEqual(server.requests, ['POST'] * 3)
+
+    def test_resumable_upload(self):
+        """ A failed chunk is resumed from the offset of the server """
+        server = self.start(resumable='partial', failures=1)
+        progress = []
+        uploader = PackageUploader(server.url + '/api/v2/packages',
+                                   chunk_size=100000, backoff=0,
+                                   progress=lambda s, t: progress.append(s))
+        response = uploader.upload(self.package)
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(server.uploads['/uploads/0'][1], self.content)
+        # creation failed once, first chunk stored only in half
+        self.assertEqual(server.requests[:4],
+                         ['OPTIONS', 'POST', 'POST', 'PATCH'])
+        self.assertEqual(server.requests[4], 'HEAD')
+        self.assertEqual(server.requests.count('PATCH'), 4)
+        self.assertEqual(progress[-1], len(self.content))
+
+    def test_signed_multipart_upload(self):
+        """ The signature of the package digest is sent in a header """
+        server = self.start(failures=1)
+        digests = []
+        msg = Push(server.url).upload_package(
+            None, self.package, signer=lambda d: digests.append(d) or 'sig',
+            progress=lambda s, t: None, backoff=0)
+
+        self.assertTrue(msg.startswith('Upload succeeded (201)'), msg)
+        # signed once, sent on every attempt
+        self.assertEqual(digests, [hashlib.sha256(self.content).digest()])
+        self.assertEqual(server.signatures, ['sig', 'sig'])
+
+    def test_signed_resumable_upload(self):
+        """ The digest is computed from the chunks, also when resuming """
+        server = self.start(resumable='partial')
+        uploader = PackageUploader(server.url + '/api/v2/packages',
+                                   chunk_size=100000, backoff=0,
+                                   signer=lambda d: d.hex())
+        response = uploader.upload(self.package)
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(server.uploads['/uploads/0'][1], self.content)
+        # only sent with the last chunk
+        self.assertEqual(server.signatures,
+                         [hashlib.sha256(self.content).hexdigest()])
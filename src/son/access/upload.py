@@ -0,0 +1,377 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE, i2CAT,
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE, i2CAT,
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import base64
+import hashlib
+import io
+import logging
+import os
+import time
+import requests
+from urllib.parse import urljoin
+from requests_toolbelt import MultipartEncoder
+from son.package.md5 import file_digest
+
+log = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    pass
+
+
+class ProgressReader(object):
+    """
+    File-like wrapper of an upload body. The body is read in chunks of a
+    fixed size, each read being reported to a progress callback.
+    """
+
+    def __init__(self, body, length, chunk_size, progress=None, offset=0):
+        """
+        :param body: file-like object with the data to upload
+        :param length: number of bytes of the body
+        :param chunk_size: number of bytes of each read
+        :param progress: callable(sent, total) invoked after each read
+        :param offset: bytes already uploaded, reported as sent
+        """
+        self._body = body
+        self._length = length
+        self._chunk_size = chunk_size
+        self._progress = progress
+        self._offset = offset
+        self._sent = 0
+
+    @property
+    def len(self):
+        return self._length
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        # the requested size is ignored, the chunk size is used instead.
+        # Nothing beyond the body length is read.
+        remaining = self._length - self._sent
+        if remaining <= 0:
+            return b''
+        chunk = self._body.read(min(self._chunk_size, remaining))
+        self._sent += len(chunk)
+        if self._progress and chunk:
+            self._progress(self._offset + self._sent,
+                           self._offset + self._length)
+        return chunk
+
+
+class PackageUploader(object):
+    """
+    Upload of a package file to the gatekeeper.
+    The package is streamed from disk as a multipart/form-data request,
+    i.e. it is never fully loaded in memory. Failed uploads (connection
+    errors or HTTP 5xx/429 responses) are retried with an exponential
+    backoff.
+    If the upload endpoint supports resumable uploads (tus protocol
+    v1.0.0, with the creation extension), the package is uploaded in
+    chunks and a failed upload resumes from the last acknowledged byte,
+    instead of restarting.
+    Packages can be signed on upload, the signature being sent in the
+    'signature' header. In resumable uploads, the SHA256 digest to sign is
+    computed from the chunks being sent, so that the package is read from
+    disk only once, and the header is sent with the last chunk. Multipart
+    uploads require the header before the body, thus the digest is
+    computed beforehand, in a separate streaming pass.
+    """
+
+    DEFAULT_CHUNK_SIZE = 1024 * 1024
+    DEFAULT_RETRIES = 3
+    DEFAULT_BACKOFF = 1.0
+    DEFAULT_TIMEOUT = 60
+
+    TUS_VERSION = '1.0.0'
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, url, headers=None, field='package',
+                 chunk_size=DEFAULT_CHUNK_SIZE, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT,
+                 progress=None, resumable=None, signer=None):
+        """
+        :param url: upload endpoint
+        :param headers: additional HTTP headers, e.g. authorization
+        :param field: form field of the package (multipart upload)
+        :param chunk_size: number of bytes read (and, if resumable,
+                           sent per request) at a time
+        :param retries: maximum number of consecutive retries
+        :param backoff: delay (seconds) before the first retry, doubled
+                        on each subsequent retry
+        :param timeout: timeout (seconds) of each request, while waiting
+                        for the server
+        :param progress: callable(sent, total) reporting the progress
+        :param resumable: use resumable uploads. If None, they are used
+                          only if supported by the endpoint
+        :param signer: callable(digest) returning the signature of the
+                       SHA256 digest (bytes) of the package. If None, the
+                       package is not signed
+        """
+        self._url = url
+        self._headers = headers if headers else {}
+        self._field = field
+        self._chunk_size = chunk_size
+        self._retries = retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._progress = progress
+        self._resumable = resumable
+        self._signer = signer
+        self._session = requests.Session()
+
+    def upload(self, filename):
+        """
+        Upload a package file.
+        :param filename: path of the package file
+        :return: response of the (last) upload request
+        :raise UploadError: if the upload failed after all retries
+        """
+        resumable = self._resumable
+        if resumable is None:
+            resumable = self.supports_resumable()
+
+        if resumable:
+            return self.__upload_resumable__(filename)
+        return self.__upload_multipart__(filename)
+
+    def supports_resumable(self):
+        """
+        Verify if the upload endpoint supports resumable uploads.
+        :return: True if supported, False otherwise
+        """
+        try:
+            response = self._session.options(
+                self._url, headers=self._headers, timeout=self._timeout)
+        except requests.RequestException:
+            return False
+
+        extensions = response.headers.get('Tus-Extension', '')
+        return response.ok and \
+            self.TUS_VERSION in response.headers.get('Tus-Version', '') and \
+            'creation' in [e.strip() for e in extensions.split(',')]
+
+    def __upload_multipart__(self, filename):
+        headers = dict(self._headers)
+        if self._signer:
+            headers['signature'] = self._signer(
+                file_digest(filename, 'sha256'))
+
+        attempt = 0
+        while True:
+            try:
+                with open(filename, 'rb') as package:
+                    encoder = MultipartEncoder(fields={
+                        self._field: (os.path.basename(filename), package,
+                                      'application/octet-stream')})
+                    headers['Content-Type'] = encoder.content_type
+                    response = self._session.post(
+                        self._url, headers=headers, timeout=self._timeout,
+                        data=ProgressReader(encoder, encoder.len,
+                                            self._chunk_size,
+                                            self._progress))
+
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    return response
+                error = "HTTP {}".format(response.status_code)
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            attempt = self.__retry__(attempt, error)
+
+    def __upload_resumable__(self, filename):
+        size = os.path.getsize(filename)
+        location = self.__create_upload__(filename, size)
+
+        attempt = 0
+        offset = 0
+        response = None
+        # digest of the bytes acknowledged by the server, up to 'hashed'
+        digest = hashlib.sha256() if self._signer else None
+        hashed = 0
+        with open(filename, 'rb') as package:
+            while offset < size or response is None:
+                try:
+                    if digest is not None and hashed != offset:
+                        digest, hashed = self.__hash_range__(
+                            package, digest, hashed, offset)
+
+                    package.seek(offset)
+                    chunk = package.read(min(self._chunk_size, size - offset))
+                    headers = dict(self._headers)
+                    headers.update({
+                        'Tus-Resumable': self.TUS_VERSION,
+                        'Upload-Offset': str(offset),
+                        'Content-Type': 'application/offset+octet-stream'})
+                    if digest is not None and offset + len(chunk) == size:
+                        final = digest.copy()
+                        final.update(chunk)
+                        headers['signature'] = self._signer(final.digest())
+
+                    response = self._session.patch(
+                        location, headers=headers, timeout=self._timeout,
+                        data=ProgressReader(io.BytesIO(chunk), len(chunk),
+                                            len(chunk), self._progress,
+                                            offset))
+
+                    if response.status_code == 204:
+                        acked = int(response.headers['Upload-Offset'])
+                        if digest is not None:
+                            digest.update(
+                                memoryview(chunk)[:max(0, acked - offset)])
+                            hashed = min(acked, offset + len(chunk))
+                        offset = acked
+                        attempt = 0
+                        continue
+                    if response.status_code not in \
+                            self.RETRY_STATUS_CODES + (409,):
+                        raise UploadError(
+                            "Upload rejected with HTTP {}: {}".format(
+                                response.status_code, response.text))
+                    error = "HTTP {}".format(response.status_code)
+
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+
+                attempt = self.__retry__(attempt, error)
+                offset = self.__upload_offset__(location)
+                response = None
+                log.info("Resuming upload of '{}' at byte {}"
+                         .format(filename, offset))
+
+        return response
+
+    def __hash_range__(self, package, digest, start, end):
+        """
+        Bring the digest of a resumed upload up to date with the offset of
+        the server, reading the bytes it received but were not hashed yet,
+        e.g. from a partially received chunk.
+        :return: updated digest and number of bytes hashed
+        """
+        if end < start:
+            # the server discarded acknowledged bytes, hash from scratch
+            digest, start = hashlib.sha256(), 0
+        package.seek(start)
+        while start < end:
+            data = package.read(min(self._chunk_size, end - start))
+            if not data:
+                break
+            digest.update(data)
+            start += len(data)
+        return digest, start
+
+    def __create_upload__(self, filename, size):
+        """
+        Create a resumable upload.
+        :return: URL of the upload
+        """
+        headers = dict(self._headers)
+        headers.update({
+            'Tus-Resumable': self.TUS_VERSION,
+            'Upload-Length': str(size),
+            'Upload-Metadata': 'filename ' + base64.b64encode(
+                os.path.basename(filename).encode('utf-8')).decode('ascii')})
+
+        attempt = 0
+        while True:
+            try:
+                response = self._session.post(self._url, headers=headers,
+                                              timeout=self._timeout)
+                if response.status_code == 201:
+                    return urljoin(self._url, response.headers['Location'])
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    raise UploadError(
+                        "Failed to create upload, HTTP {}: {}".format(
+                            response.status_code, response.text))
+                error = "HTTP {}".format(response.status_code)
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            attempt = self.__retry__(attempt, error)
+
+    def __upload_offset__(self, location):
+        """
+        Obtain the number of bytes of a resumable upload already received
+        by the server.
+        """
+        attempt = 0
+        while True:
+            try:
+                headers = dict(self._headers)
+                headers['Tus-Resumable'] = self.TUS_VERSION
+                response = self._session.head(location, headers=headers,
+                                              timeout=self._timeout)
+                if response.ok:
+                    return int(response.headers['Upload-Offset'])
+                error = "HTTP {}".format(response.status_code)
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            attempt = self.__retry__(attempt, error)
+
+    def __retry__(self, attempt, error):
+        """
+        Wait before retrying a failed request.
+        :param attempt: number of retries already performed
+        :param error: error of the failed request
+        :return: updated number of retries
+        :raise UploadError: if there are no retries left
+        """
+        if attempt >= self._retries:
+            raise UploadError("Upload failed after {} retries: {}"
+                              .format(attempt, error))
+
+        delay = self._backoff * 2 ** attempt
+        log.warning("Upload request failed ({}). Retrying in {:.1f} sec..."
+                    .format(error, delay))
+        time.sleep(delay)
+        return attempt + 1
+
+
+def log_progress(step=10):
+    """
+    Obtain a progress callback that logs the progress of an upload, every
+    given percentage.
+    :param step: percentage between log messages
+    :return: callable(sent, total)
+    """
+    last = [-step]
+
+    def progress(sent, total):
+        percentage = 100 * sent // total if total else 100
+        if percentage >= last[0] + step or sent == total:
+            if percentage == last[0]:
+                return
+            last[0] = percentage
+            log.info("Uploaded {}% ({} of {} bytes)"
+                     .format(percentage, sent, total))
+
+    return progress
@@ -0,0 +1,907 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+import yaml
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from tabulate import tabulate
+from son.package.md5 import chunk_size
+
+log = logging.getLogger(__name__)
+
+# Path of the package descriptor inside a package
+MANIFEST_NAME = "META-INF/MANIFEST.MF"
+
+# Content types of the package descriptors
+CT_PACKAGE_DESCRIPTOR = "application/sonata.package_descriptor"
+CT_SERVICE_DESCRIPTOR = "application/sonata.service_descriptor"
+CT_FUNCTION_DESCRIPTOR = "application/sonata.function_descriptor"
+
+# Default compression of package contents, by content type.
+# Descriptors (YAML) compress well and are always deflated.
+DEFAULT_COMPRESSION = {
+    CT_PACKAGE_DESCRIPTOR: zipfile.ZIP_DEFLATED,
+    CT_SERVICE_DESCRIPTOR: zipfile.ZIP_DEFLATED,
+    CT_FUNCTION_DESCRIPTOR: zipfile.ZIP_DEFLATED,
+}
+
+# Image formats ('application/sonata.<format>_files') that are stored,
+# since they are usually compressed already and deflating them is costly
+STORED_IMAGE_FORMATS = ('qcow2', 'vmdk', 'vhd', 'vhdx', 'vdi', 'iso',
+                        'docker')
+
+# File extensions of already compressed contents
+COMPRESSED_EXTENSIONS = ('.gz', '.tgz', '.bz2', '.xz', '.lz', '.lzma',
+                         '.zst', '.zip', '.7z', '.rar', '.jar', '.son',
+                         '.qcow2', '.vmdk', '.vhd', '.vhdx', '.iso',
+                         '.png', '.jpg', '.jpeg', '.gif')
+
+# Compression level used for deflated contents
+DEFAULT_LEVEL = 6
+
+# Deflated members larger than a block are compressed in independent
+# blocks, which can be deflated concurrently. Each block is primed with
+# the last bytes (deflate window) of the previous one, so the compression
+# ratio is close to the one of a single stream. The compressed data only
+# depends on the block size, not on the number of workers.
+COMPRESS_BLOCK_SIZE = 1024 * 1024
+DEFLATE_WINDOW = 32 * 1024
+
+# Empty final deflate block, terminating a stream of sync flushed blocks
+DEFLATE_END = b'\x03\x00'
+
+# Permissions of archive entries
+ENTRY_MODE = 0o644
+
+# Timestamp of the entries of reproducible archives. It can be overridden
+# with the SOURCE_DATE_EPOCH environment variable.
+REPRODUCIBLE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Layout of the fixed part of a zip local file header
+LOCAL_HEADER_FORMAT = '<4s2B4HL2L2H'
+LOCAL_HEADER_SIZE = struct.calcsize(LOCAL_HEADER_FORMAT)
+LOCAL_HEADER_SIGNATURE = b'PK\003\004'
+
+# Data descriptor, following the data of members whose CRC and sizes are
+# not known when their local header is written (non-seekable archives)
+DATA_DESCRIPTOR_FLAG = 0x08
+DATA_DESCRIPTOR_SIGNATURE = b'PK\007\010'
+
+# Compressed data may be slightly larger than the original. Members that
+# may come close to the zip limits are written with Zip64 extensions.
+ZIP64_MARGIN = 1.05
+
+# Members are written through ZipFile.open(), except where writing their
+# data directly into the archive file is faster: deflated members
+# compressed in parallel blocks and members copied without recompressing
+# their data. This relies on these internals of zipfile.ZipFile. Without
+# them (e.g. in other Python implementations), all members are written
+# through ZipFile.open().
+ZIP_INTERNALS = ('fp', 'filelist', 'NameToInfo', 'start_dir', '_didModify')
+
+# The compression level of a member written through ZipFile.open() can
+# only be set from Python 3.13. Before, ZipFile.open() deflates members at
+# the zlib default level, others are written directly.
+ZIPINFO_LEVEL = hasattr(zipfile.ZipInfo(), 'compress_level')
+ZLIB_DEFAULT_LEVEL = 6
+
+
+def compression_for(content_type, name, policy=None):
+    """
+    Obtain the compression method of a package content entry.
+    :param content_type: content type of the entry
+    :param name: name (path) of the entry
+    :param policy: dictionary mapping content types to compression
+                   methods, overrides the default policy
+    :return: zipfile compression method (ZIP_STORED or ZIP_DEFLATED)
+    """
+    if policy and content_type in policy:
+        return policy[content_type]
+
+    if name.lower().endswith(COMPRESSED_EXTENSIONS):
+        return zipfile.ZIP_STORED
+
+    if content_type in DEFAULT_COMPRESSION:
+        return DEFAULT_COMPRESSION[content_type]
+
+    for img_format in STORED_IMAGE_FORMATS:
+        if content_type == "application/sonata.{}_files".format(img_format):
+            return zipfile.ZIP_STORED
+
+    return zipfile.ZIP_DEFLATED
+
+
+def compression_level(content_type, name, policy=None, levels=None,
+                      level=DEFAULT_LEVEL):
+    """
+    Obtain the compression method and level of a package content entry.
+    :param content_type: content type of the entry
+    :param name: name (path) of the entry
+    :param policy: see compression_for()
+    :param levels: dictionary mapping content types to compression levels,
+                   overrides the compression method of the policy. Level 0
+                   stores the contents, levels 1-9 deflate them
+    :param level: compression level of the remaining deflated contents
+    :return: (zipfile compression method, compression level) tuple
+    """
+    if levels and content_type in levels:
+        level = levels[content_type]
+        return (zipfile.ZIP_DEFLATED if level else zipfile.ZIP_STORED,
+                level)
+
+    return compression_for(content_type, name, policy), level
+
+
+def deflate_block(data, level, dictionary=None):
+    """
+    Deflate a block of a member, as a raw deflate stream that can be
+    concatenated with the following blocks.
+    :param data: block data
+    :param level: compression level
+    :param dictionary: last bytes of the previous block, if any
+    :return: compressed data
+    """
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15,
+                                      zlib.DEF_MEM_LEVEL,
+                                      zlib.Z_DEFAULT_STRATEGY, dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def reblock(chunks, size):
+    """
+    Split an iterable of data chunks into blocks of a fixed size. The last
+    block may be smaller.
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        if not buf and len(chunk) == size:
+            yield chunk
+            continue
+        buf += chunk
+        while len(buf) >= size:
+            yield bytes(buf[:size])
+            del buf[:size]
+    if buf:
+        yield bytes(buf)
+
+
+def is_seekable(fileobj):
+    """
+    Verify if an archive can be written with random access.
+    :param fileobj: path of the archive file, or a file-like object
+    :return: True if it is a path or a seekable file-like object
+    """
+    if isinstance(fileobj, str):
+        return True
+    try:
+        fileobj.seek(fileobj.tell())
+    except (AttributeError, OSError, ValueError):
+        return False
+    return True
+
+
+def reproducible_date_time():
+    """
+    Obtain the timestamp of the entries of reproducible archives.
+    :return: date_time tuple
+    """
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if not epoch:
+        return REPRODUCIBLE_DATE_TIME
+
+    try:
+        date_time = time.gmtime(int(epoch))[:6]
+    except (ValueError, OverflowError):
+        log.warning("Ignoring invalid SOURCE_DATE_EPOCH '{}'".format(epoch))
+        return REPRODUCIBLE_DATE_TIME
+
+    # zip timestamps start in 1980
+    return max(date_time, REPRODUCIBLE_DATE_TIME)
+
+
+def member_data_offset(fp, zinfo):
+    """
+    Obtain the offset of the (compressed) data of a member in its archive
+    file, from its local header.
+    :param fp: file object of the archive
+    :param zinfo: ZipInfo of the member
+    :return: offset in bytes
+    """
+    fp.seek(zinfo.header_offset)
+    header = struct.unpack(LOCAL_HEADER_FORMAT, fp.read(LOCAL_HEADER_SIZE))
+    if header[0] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(
+            "Bad local header of entry '{}'".format(zinfo.filename))
+    # skip the file name and extra field
+    return zinfo.header_offset + LOCAL_HEADER_SIZE + header[-2] + header[-1]
+
+
+class PackageArchive(object):
+    """
+    Writer of SONATA package archives.
+    Contents are streamed straight into the archive, computing their MD5
+    hash on the same pass, without an intermediate copy on disk.
+    With multiple workers, the blocks of large deflated members are
+    compressed concurrently by a pool of threads (zlib releases the GIL)
+    and written in order.
+    Archives can be written to non-seekable file-like objects (e.g.
+    pipes or sockets), their members followed by data descriptors.
+    """
+
+    def __init__(self, filename, policy=None, level=DEFAULT_LEVEL,
+                 reproducible=False, workers=1, levels=None):
+        """
+        Create a new package archive.
+        :param filename: path of the archive file, or a writable file-like
+                         object
+        :param policy: dictionary mapping content types to compression
+                       methods, see compression_for()
+        :param level: compression level of deflated contents
+        :param reproducible: write all entries with the same timestamp
+                             and permissions, regardless of the source
+                             files. Same contents, written in the same
+                             order, then result in the same archive.
+        :param workers: number of threads compressing the blocks of large
+                        members
+        :param levels: dictionary mapping content types to compression
+                       levels, see compression_level()
+        """
+        self._filename = filename
+        self._policy = policy
+        self._level = level
+        self._levels = levels
+        self._pool = ThreadPoolExecutor(max_workers=workers) \
+            if workers > 1 else None
+        self._workers = workers
+        self._date_time = reproducible_date_time() if reproducible else None
+        self._lock = threading.Lock()
+        self._seekable = is_seekable(filename)
+        self._zip = zipfile.ZipFile(filename, 'w', allowZip64=True)
+        self._direct = all(hasattr(self._zip, attr)
+                           for attr in ZIP_INTERNALS)
+        if not self._direct:
+            log.debug("zipfile internals unavailable, members are written "
+                      "through ZipFile.open()")
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def names(self):
+        return self._zip.namelist()
+
+    def write_file(self, name, src, content_type=None, cache=None):
+        """
+        Stream a file into the archive.
+        :param name: name (path) of the entry in the archive
+        :param src: path of the source file
+        :param content_type: content type of the entry
+        :param cache: HashCache object where the file hash is stored
+        :return: MD5 hex digest of the file content
+        """
+        ident = cache.identity(src) if cache is not None else None
+        size = os.path.getsize(src)
+
+        compression = self.__compression__(content_type, name)
+        # deflated in blocks, see _write()
+        cs = COMPRESS_BLOCK_SIZE \
+            if compression[0] == zipfile.ZIP_DEFLATED else chunk_size(size)
+        with open(src, 'rb') as _file:
+            value = self._write(
+                name, iter(lambda: _file.read(cs), b''),
+                size, *compression, date_time=self._date_time or
+                time.localtime(os.path.getmtime(src))[:6])
+
+        if ident:
+            cache.put(ident, value)
+        return value
+
+    def write_bytes(self, name, data, content_type=None):
+        """
+        Write the given data as an entry of the archive.
+        :param name: name (path) of the entry in the archive
+        :param data: content (bytes)
+        :param content_type: content type of the entry
+        :return: MD5 hex digest of the content
+        """
+        return self._write(name, [data], len(data),
+                           *self.__compression__(content_type, name))
+
+    def copy_member(self, package, zinfo):
+        """
+        Copy a member of another package archive into this archive,
+        without decompressing and recompressing its data (unless the
+        zipfile internals are unavailable, see ZIP_INTERNALS).
+        :param package: PackageIndex of the source package
+        :param zinfo: ZipInfo of the member in the source package
+        """
+        if zinfo.flag_bits & 0x01:
+            raise zipfile.BadZipFile(
+                "Cannot copy encrypted entry '{}'".format(zinfo.filename))
+
+        if not self._direct:
+            cs = chunk_size(zinfo.file_size)
+            with package.lock, zipfile.ZipFile(package.fp) as src, \
+                    src.open(zinfo) as data:
+                self._write(zinfo.filename, iter(lambda: data.read(cs), b''),
+                            zinfo.file_size, zinfo.compress_type,
+                            date_time=self._date_time or zinfo.date_time)
+            return
+
+        copy = self.__copy_zipinfo__(zinfo.filename, zinfo)
+        with self._lock, package.lock:
+            self.__copy_data__(copy, package.fp,
+                               member_data_offset(package.fp, zinfo))
+
+        log.debug("Copied '{}' from previous package ({} bytes)"
+                  .format(copy.filename, copy.compress_size))
+
+    def duplicate_member(self, name, member):
+        """
+        Add a member with the same content as a member already written,
+        copying its compressed data within the archive, i.e. without
+        reading its source file nor compressing it again.
+        :param name: name (path) of the new entry in the archive
+        :param member: name of the member already written
+        :return: True if the member was added, False if the data cannot be
+                 read back from the archive (e.g. a non-seekable stream or
+                 unavailable zipfile internals)
+        """
+        if not self._seekable or not self._direct:
+            return False
+
+        with self._lock:
+            fp = self._zip.fp
+            zinfo = self._zip.NameToInfo.get(member.lstrip('/'))
+            readable = getattr(fp, 'readable', lambda: False)()
+            if not zinfo or not readable or zinfo.flag_bits & 0x01:
+                return False
+            copy = self.__copy_zipinfo__(name.lstrip('/'), zinfo)
+            self.__copy_data__(copy, fp, member_data_offset(fp, zinfo))
+
+        log.debug("Copied '{}' from '{}' ({} bytes)"
+                  .format(copy.filename, zinfo.filename, copy.compress_size))
+        return True
+
+    @property
+    def members(self):
+        """
+        Metadata (ZipInfo) of the members written, with the CRC and sizes
+        computed while writing them.
+        """
+        return self._zip.infolist()
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
+        if self._pool:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __compression__(self, content_type, name):
+        return compression_level(content_type, name, self._policy,
+                                 self._levels, self._level)
+
+    @staticmethod
+    def __zipinfo__(name, date_time):
+        zinfo = zipfile.ZipInfo(name, date_time)
+        zinfo.external_attr = ENTRY_MODE << 16
+        # the creating system otherwise depends on the platform
+        zinfo.create_system = 3
+        return zinfo
+
+    def __copy_zipinfo__(self, name, zinfo):
+        copy = self.__zipinfo__(name, self._date_time or zinfo.date_time)
+        copy.compress_type = zinfo.compress_type
+        if not self._date_time:
+            copy.external_attr = zinfo.external_attr
+        copy.CRC = zinfo.CRC
+        copy.file_size = zinfo.file_size
+        copy.compress_size = zinfo.compress_size
+        return copy
+
+    def __copy_data__(self, copy, src, offset):
+        """
+        Write a member from the compressed data of another one. The source
+        can be the archive file itself, the data is then read ahead of the
+        end of the archive, where it is written.
+        :param copy: ZipInfo of the new member, with its CRC and sizes
+        :param src: file object holding the compressed data
+        :param offset: offset of the data in the source file
+        """
+        zip64 = max(copy.file_size, copy.compress_size) > \
+            zipfile.ZIP64_LIMIT
+        cs = chunk_size(copy.compress_size)
+
+        fp = self._zip.fp
+        copy.header_offset = self._zip.start_dir
+        if src is fp:
+            fp.seek(copy.header_offset)
+        fp.write(copy.FileHeader(zip64))
+        end = fp.tell()
+        remaining = copy.compress_size
+        while remaining > 0:
+            src.seek(offset)
+            chunk = src.read(min(remaining, cs))
+            if not chunk:
+                raise zipfile.BadZipFile(
+                    "Truncated entry '{}'".format(copy.filename))
+            offset += len(chunk)
+            remaining -= len(chunk)
+            if src is fp:
+                fp.seek(end)
+            fp.write(chunk)
+            end += len(chunk)
+        self.__register__(copy, end)
+
+    def _write(self, name, chunks, size, compress_type, level=None,
+               date_time=None):
+        """
+        Write an archive member from an iterable of data chunks, through
+        ZipFile.open() or directly, see ZIP_INTERNALS.
+        :return: MD5 hex digest of the data
+        """
+        level = self._level if level is None else level
+        zinfo = self.__zipinfo__(name.lstrip('/'),
+                                 self._date_time or date_time or
+                                 time.localtime()[:6])
+        zinfo.compress_type = compress_type
+        zinfo.file_size = size
+        zip64 = size * ZIP64_MARGIN > zipfile.ZIP64_LIMIT
+
+        if self._direct and compress_type == zipfile.ZIP_DEFLATED and (
+                size > COMPRESS_BLOCK_SIZE or
+                not ZIPINFO_LEVEL and level != ZLIB_DEFAULT_LEVEL):
+            return self.__write_direct__(zinfo, chunks, level, zip64)
+        if ZIPINFO_LEVEL:
+            zinfo.compress_level = level
+
+        md5 = hashlib.md5()
+        with self._lock, self._zip.open(zinfo, 'w',
+                                        force_zip64=zip64) as dest:
+            for chunk in chunks:
+                md5.update(chunk)
+                dest.write(chunk)
+
+        log.debug("Added '{}' to package archive ({} bytes)"
+                  .format(zinfo.filename, zinfo.file_size))
+        return md5.hexdigest()
+
+    def __write_direct__(self, zinfo, chunks, level, zip64):
+        """
+        Write a deflated member directly into the archive file. Members
+        larger than a block are compressed in blocks, in parallel with
+        multiple workers. The local file header is written ahead of the
+        data and updated once the CRC and sizes are known.
+        :return: MD5 hex digest of the data
+        """
+        zinfo.compress_size = 0
+        zinfo.CRC = 0
+        if not self._seekable:
+            zinfo.flag_bits |= DATA_DESCRIPTOR_FLAG
+
+        if zinfo.file_size > COMPRESS_BLOCK_SIZE:
+            compressor = BlockCompressor(level, self._pool, self._workers)
+            chunks = reblock(chunks, COMPRESS_BLOCK_SIZE)
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+
+        md5 = hashlib.md5()
+        crc = 0
+        file_size = 0
+        compress_size = 0
+
+        with self._lock:
+            fp = self._zip.fp
+            zinfo.header_offset = fp.tell()
+            fp.write(zinfo.FileHeader(zip64))
+
+            for chunk in chunks:
+                md5.update(chunk)
+                crc = zlib.crc32(chunk, crc)
+                file_size += len(chunk)
+                chunk = compressor.compress(chunk)
+                fp.write(chunk)
+                compress_size += len(chunk)
+
+            chunk = compressor.flush()
+            fp.write(chunk)
+            compress_size += len(chunk)
+
+            if not zip64 and max(file_size, compress_size) > \
+                    zipfile.ZIP64_LIMIT:
+                raise zipfile.LargeZipFile(
+                    "Entry '{}' grew beyond the zip size limit while being "
+                    "written".format(zinfo.filename))
+
+            zinfo.CRC = crc & 0xffffffff
+            zinfo.file_size = file_size
+            zinfo.compress_size = compress_size
+
+            if self._seekable:
+                # rewrite the local header with the final CRC and sizes
+                end = fp.tell()
+                fp.seek(zinfo.header_offset)
+                fp.write(zinfo.FileHeader(zip64))
+                fp.seek(end)
+            else:
+                fp.write(struct.pack('<4sLQQ' if zip64 else '<4sLLL',
+                                     DATA_DESCRIPTOR_SIGNATURE, zinfo.CRC,
+                                     compress_size, file_size))
+                end = fp.tell()
+            self.__register__(zinfo, end)
+
+        log.debug("Added '{}' to package archive ({} bytes, deflated)"
+                  .format(zinfo.filename, file_size))
+        return md5.hexdigest()
+
+    def __register__(self, zinfo, end):
+        """
+        Register a member written directly into the archive file.
+        :param zinfo: ZipInfo of the member
+        :param end: offset of the end of its data
+        """
+        self._zip.filelist.append(zinfo)
+        self._zip.NameToInfo[zinfo.filename] = zinfo
+        self._zip.start_dir = end
+        self._zip._didModify = True
+
+
+class BlockCompressor(object):
+    """
+    Compressor of a member in independent blocks (see deflate_block), with
+    the same interface of a zlib compression object. Each compress() call
+    takes a whole block. Blocks are deflated by a pool of threads, if
+    given, and their compressed data returned in order, as it becomes
+    available. The number of blocks in flight is bounded.
+    """
+
+    def __init__(self, level, pool=None, workers=1):
+        self._level = level
+        self._pool = pool
+        self._max_pending = 2 * workers
+        self._pending = deque()
+        self._dictionary = None
+
+    def compress(self, data):
+        if not self._pool:
+            out = deflate_block(data, self._level, self._dictionary)
+            self._dictionary = data[-DEFLATE_WINDOW:]
+            return out
+
+        self._pending.append(self._pool.submit(
+            deflate_block, data, self._level, self._dictionary))
+        self._dictionary = data[-DEFLATE_WINDOW:]
+
+        out = []
+        while len(self._pending) >= self._max_pending or \
+                (self._pending and self._pending[0].done()):
+            out.append(self._pending.popleft().result())
+        return b''.join(out)
+
+    def flush(self):
+        out = [future.result() for future in self._pending]
+        self._pending.clear()
+        out.append(DEFLATE_END)
+        return b''.join(out)
+
+
+class PackageIndex(object):
+    """
+    Index of the contents of an existing package archive, from the
+    package content entries of its manifest. Members whose MD5 matches
+    the one of a new content can be copied as they are into a new
+    package archive.
+    """
+
+    def __init__(self, filename):
+        """
+        Open a package archive and read its manifest.
+        :param filename: path of the package archive
+        """
+        self._filename = filename
+        self.lock = threading.Lock()
+        self.fp = open(filename, 'rb')
+        self._entries = dict()
+
+        try:
+            with zipfile.ZipFile(self.fp) as pck:
+                manifest = yaml.load(pck.read(MANIFEST_NAME))
+                members = {i.filename: i for i in pck.infolist()}
+        except (zipfile.BadZipFile, KeyError, yaml.YAMLError):
+            self.fp.close()
+            raise
+
+        for pce in manifest.get('package_content') or []:
+            name = pce.get('name', '').lstrip('/')
+            if name in members and pce.get('md5'):
+                self._entries[name] = (pce['md5'], members[name])
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, name, md5):
+        """
+        Obtain the member of a package content entry, if unchanged.
+        :param name: name of the package content entry
+        :param md5: current MD5 of the content
+        :return: ZipInfo of the member, None if absent or changed
+        """
+        entry = self._entries.get(name.lstrip('/'))
+        if entry and entry[0] == md5:
+            return entry[1]
+
+    def has_entry(self, name):
+        return name.lstrip('/') in self._entries
+
+    def close(self):
+        self.fp.close()
+
+
+class PackageReader(object):
+    """
+    Random access to the contents of a package archive, without
+    extracting it. Only the zip central directory is read when opening
+    the package. The manifest and the descriptors are read (and parsed)
+    on first access, other members (e.g. VDU images) are never read,
+    unless explicitly opened.
+    """
+
+    def __init__(self, package):
+        """
+        Open a package archive.
+        :param package: path of the package archive, or a seekable
+                        file-like object
+        :raise zipfile.BadZipFile: if the package is not a zip archive
+        """
+        self._filename = package if isinstance(package, str) else \
+            getattr(package, 'name', None)
+        self._zip = zipfile.ZipFile(package, 'r')
+        self._manifest = None
+        self._descriptors = dict()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def manifest(self):
+        """
+        Package descriptor (parsed MANIFEST.MF), None if missing.
+        """
+        if self._manifest is None and self.member(MANIFEST_NAME):
+            self._manifest = yaml.load(self._zip.read(MANIFEST_NAME))
+        return self._manifest
+
+    @property
+    def members(self):
+        """
+        Metadata (ZipInfo) of all members, in archive order.
+        """
+        return self._zip.infolist()
+
+    def member(self, name):
+        """
+        Obtain the metadata of a member.
+        :param name: name of the member or of its package content entry
+        :return: ZipInfo object, None if absent
+        """
+        try:
+            return self._zip.getinfo(name.lstrip('/'))
+        except KeyError:
+            return
+
+    def entries(self):
+        """
+        Obtain the package content entries of the manifest, along with the
+        metadata of their members.
+        :return: list of dictionaries with the name, content type, md5,
+                 size, compressed size and compression method of each
+                 entry. Sizes are None if the entry is not packaged.
+        """
+        entries = []
+        for pce in (self.manifest or {}).get('package_content') or []:
+            zinfo = self.member(pce.get('name', ''))
+            entries.append(dict(
+                name=pce.get('name'),
+                content_type=pce.get('content-type'),
+                md5=pce.get('md5'),
+                sealed=pce.get('sealed', True) is not False,
+                size=zinfo.file_size if zinfo else None,
+                compress_size=zinfo.compress_size if zinfo else None,
+                compress_type=zinfo.compress_type if zinfo else None))
+        return entries
+
+    def descriptor(self, name):
+        """
+        Obtain a parsed descriptor of the package.
+        :param name: name of the descriptor member or package content entry
+        :return: descriptor content, None if absent
+        """
+        name = name.lstrip('/')
+        if name not in self._descriptors:
+            if not self.member(name):
+                return
+            self._descriptors[name] = yaml.load(self._zip.read(name))
+        return self._descriptors[name]
+
+    @property
+    def descriptors(self):
+        """
+        Names of the service and function descriptors of the package.
+        """
+        return [pce['name'] for pce in self.entries()
+                if pce['content_type'] in (CT_SERVICE_DESCRIPTOR,
+                                           CT_FUNCTION_DESCRIPTOR)]
+
+    def open(self, name):
+        """
+        Open a member for streamed reading.
+        :param name: name of the member or of its package content entry
+        :return: file-like object
+        """
+        return self._zip.open(name.lstrip('/'))
+
+    def md5(self, name):
+        """
+        Generate the MD5 hash of a member, streamed from the archive, i.e.
+        without extracting it. The CRC of the member is verified as well.
+        :param name: name of the member or of its package content entry
+        :return: hex digest
+        :raise zipfile.BadZipFile: if the CRC of the member is invalid
+        """
+        zinfo = self._zip.getinfo(name.lstrip('/'))
+        hash = hashlib.md5()
+        with self._zip.open(zinfo) as member:
+            cs = chunk_size(zinfo.file_size)
+            for chunk in iter(lambda: member.read(cs), b''):
+                hash.update(chunk)
+        return hash.hexdigest()
+
+    def extract(self, path, names):
+        """
+        Extract some members of the package.
+        :param path: destination directory
+        :param names: names of the members (or of their package content
+                      entries) to extract. Absent members are ignored
+        """
+        for name in names:
+            zinfo = self.member(name)
+            if zinfo:
+                self._zip.extract(zinfo, path)
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def verify_archive(filename, members):
+    """
+    Verify that a package archive written to disk holds the members that
+    were written to it, from its central directory and the local headers
+    of the members. The data of the members is not read: the CRC computed
+    while writing each member is compared to the CRCs recorded in the
+    archive.
+    :param filename: path of the package archive
+    :param members: metadata (ZipInfo) of the members written
+    :raise zipfile.BadZipFile: if the archive does not hold the members
+    """
+    with open(filename, 'rb') as fp, zipfile.ZipFile(fp) as pck:
+        written = pck.infolist()
+        if len(written) != len(members):
+            raise zipfile.BadZipFile("Expected {} members, found {}"
+                                     .format(len(members), len(written)))
+
+        written = {zinfo.filename: zinfo for zinfo in written}
+        for expected in members:
+            zinfo = written.get(expected.filename)
+            if not zinfo or zinfo.CRC != expected.CRC or \
+                    zinfo.file_size != expected.file_size or \
+                    zinfo.compress_size != expected.compress_size:
+                raise zipfile.BadZipFile(
+                    "Entry '{}' differs from the one written"
+                    .format(expected.filename))
+
+            # the CRC of members followed by a data descriptor is not in
+            # their local header
+            fp.seek(zinfo.header_offset)
+            header = fp.read(LOCAL_HEADER_SIZE)
+            if len(header) != LOCAL_HEADER_SIZE or \
+                    not __valid_local_header__(
+                        struct.unpack(LOCAL_HEADER_FORMAT, header),
+                        expected.CRC):
+                raise zipfile.BadZipFile("Bad local header of entry '{}'"
+                                         .format(expected.filename))
+
+
+def __valid_local_header__(header, crc):
+    return header[0] == LOCAL_HEADER_SIGNATURE and \
+        (header[3] & DATA_DESCRIPTOR_FLAG or header[7] == crc)
+
+
+def inspect_package(package):
+    """
+    Describe the contents of a package, from its manifest and zip
+    central directory, without extracting it.
+    :param package: path of the package archive
+    :return: formatted description
+    """
+    with PackageReader(package) as reader:
+        manifest = reader.manifest
+        if manifest is None:
+            raise KeyError("Missing '{}'".format(MANIFEST_NAME))
+
+        general = [[key, manifest[key]] for key in sorted(manifest)
+                   if not isinstance(manifest[key], (list, dict))]
+
+        rows = []
+        for entry in reader.entries():
+            rows.append([
+                entry['name'], entry['content_type'],
+                entry['size'] if entry['size'] is not None else '-',
+                entry['compress_size']
+                if entry['compress_size'] is not None else '-',
+                {zipfile.ZIP_STORED: 'stored',
+                 zipfile.ZIP_DEFLATED: 'deflated'}.get(
+                    entry['compress_type'], '-') if entry['sealed']
+                else 'not packaged',
+                entry['md5']])
+
+        members = reader.members
+        rows.append(['total ({} members)'.format(len(members)), '',
+                     sum(m.file_size for m in members),
+                     sum(m.compress_size for m in members), '', ''])
+
+    return '{}\n\n{}'.format(
+        tabulate(general),
+        tabulate(rows, headers=['Name', 'Content type', 'Size',
+                                'Compressed', 'Method', 'MD5']))
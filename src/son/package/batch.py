@@ -0,0 +1,304 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tabulate import tabulate
+from son.workspace.project import Project
+from son.package.package import Packager, PackageOptions, get_package_name
+from son.package.perf import span, propagate
+from son.schema.validator import SchemaValidator
+from son.validate import event
+from son.validate.validate import Validator
+from son.access.access import AccessClient
+
+log = logging.getLogger(__name__)
+evtlog = event.get_logger('validator.events')
+
+
+class BatchResult(object):
+    """
+    Outcome of packaging a single project of a batch.
+    """
+
+    def __init__(self, project, package=None, size=None, start=None,
+                 duration=None, error=None, events=None):
+        self.project = project
+        self.package = package
+        self.size = size
+        self.start = start
+        self.duration = duration
+        self.error = error
+        # validation events logged while packaging the project
+        self.events = events if events is not None else dict()
+
+    @property
+    def success(self):
+        return self.package is not None
+
+    def __repr__(self):
+        return "BatchResult(project={}, package={}, error={})".format(
+            self.project, self.package, self.error)
+
+
+class BatchPackager(object):
+    """
+    Generate the packages of multiple projects of the same workspace.
+    The workspace, the son-access client, the validators and the schema
+    validators (with their loaded schema library) are shared by all
+    packages, instead of being re-created for each project. Projects are
+    packaged concurrently by a pool of threads, each one reusing its own
+    validator and schema validator, as they are not thread-safe. The
+    validator of a thread shares its schema validator, so that schemas are
+    loaded once per thread. The validation events of each project are
+    captured apart from the other projects.
+    """
+
+    def __init__(self, workspace, dst_path=None, options=None):
+        """
+        Initialize the batch packager.
+        :param workspace: workspace object of all projects
+        :param dst_path: location to write the packages
+        :param options: PackageOptions object, applied to all projects.
+                        Its workers are the number of projects packaged
+                        concurrently, each one by a single worker.
+        """
+        options = options if options else PackageOptions()
+        self._workspace = workspace
+        self._dst_path = dst_path if dst_path else '.'
+        self._workers = max(1, options.workers)
+        self._incremental = options.incremental
+        self._options = options.replace(workers=1)
+
+        self._access = AccessClient(workspace,
+                                    log_level=workspace.log_level)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def validator(self):
+        """
+        Validator of the calling thread, created on first use, sharing the
+        schema validator of the thread.
+        """
+        validator = getattr(self._local, 'validator', None)
+        if not validator:
+            validator = Validator(workspace=self._workspace,
+                                  schema_validator=self.schema_validator)
+            self._local.validator = validator
+        return validator
+
+    @property
+    def schema_validator(self):
+        """
+        Schema validator of the calling thread, created on first use.
+        """
+        schema_validator = getattr(self._local, 'schema_validator', None)
+        if not schema_validator:
+            schema_validator = SchemaValidator(self._workspace, preload=True)
+            self._local.schema_validator = schema_validator
+        return schema_validator
+
+    def package(self, project, name=None):
+        """
+        Generate the package of a single project.
+        :param project: project object or project root directory
+        :param name: name of the package, obtained from the project
+                     descriptor if not specified
+        :return: BatchResult object
+        """
+        prj_root = project.project_root \
+            if isinstance(project, Project) else project
+
+        def packager():
+            prj = project
+            if not isinstance(prj, Project):
+                prj = Project.__create_from_descriptor__(self._workspace,
+                                                         prj_root)
+                if not prj:
+                    raise ValueError("Invalid project")
+
+            return Packager(self._workspace, project=prj,
+                            dst_path=self._dst_path,
+                            previous=self.__previous__(prj, name),
+                            validator=self.validator,
+                            schema_validator=self.schema_validator,
+                            access=self._access, options=self._options)
+
+        with span('project', project=prj_root):
+            return self.__package__(prj_root, name, packager)
+
+    def package_descriptors(self, nsd, vnfds, name, images=None,
+                            description=None):
+        """
+        Generate the package of service and function descriptors given in
+        memory (see Packager), without a project on disk.
+        :param nsd: service descriptor (dictionary)
+        :param vnfds: list of function descriptors (dictionaries)
+        :param name: name of the package
+        :param images: local files of the VDU images, mapping each VNF name
+                       to a mapping of vm_image references to files
+        :param description: general description of the package
+        :return: BatchResult object
+        """
+        def packager():
+            return Packager(self._workspace, dst_path=self._dst_path,
+                            nsd=nsd, vnfds=vnfds, images=images,
+                            description=description,
+                            validator=self.validator,
+                            schema_validator=self.schema_validator,
+                            access=self._access, options=self._options)
+
+        with span('project', project=name):
+            return self.__package__(name, name, packager)
+
+    def __package__(self, prj_root, name, packager):
+        with evtlog.capture() as events:
+            result = self.__package_captured__(prj_root, name, packager)
+        result.events = events
+
+        with self._lock:
+            evtlog.merge(events)
+        return result
+
+    def __package_captured__(self, prj_root, name, packager):
+        start = time.time()
+        pck = None
+        try:
+            pck = packager()
+            if not pck.package_descriptor:
+                raise ValueError("Failed to build the package descriptor")
+
+            package = pck.generate_package(name)
+            if not package:
+                raise ValueError("Failed to validate the package")
+
+            return BatchResult(prj_root, package=package,
+                               size=os.path.getsize(package), start=start,
+                               duration=time.time() - start)
+
+        except Exception as e:
+            log.error("Failed to package project '{}': {}"
+                      .format(prj_root, e))
+            return BatchResult(prj_root, start=start,
+                               duration=time.time() - start, error=str(e))
+        finally:
+            if pck:
+                pck.cleanup()
+
+    def package_all(self, projects):
+        """
+        Generate the packages of multiple projects, concurrently.
+        A failed project does not interrupt the remaining ones.
+        :param projects: list of project objects or root directories
+        :return: list of BatchResult objects, in the order of the projects
+        """
+        if not os.path.isdir(self._dst_path):
+            os.makedirs(self._dst_path)
+
+        if self._workers == 1 or len(projects) <= 1:
+            return [self.package(project) for project in projects]
+
+        with ThreadPoolExecutor(max_workers=self._workers) as ex:
+            return list(ex.map(propagate(self.package), projects))
+
+    def __previous__(self, project, name):
+        if not self._incremental:
+            return
+        try:
+            name = name if name else \
+                get_package_name(project.project_config.get('package'))
+        except (KeyError, TypeError):
+            return
+        previous = os.path.join(self._dst_path, name + '.son')
+        return previous if os.path.isfile(previous) else None
+
+
+def list_projects(path):
+    """
+    Obtain the project directories of a batch.
+    :param path: a project directory, a directory containing project
+                 directories or a file listing one project directory
+                 per line (blank lines and lines starting with '#' are
+                 ignored). Relative entries of a list file are relative
+                 to the location of the file.
+    :return: list of project directories
+    """
+    if os.path.isfile(path):
+        base = os.path.dirname(os.path.abspath(path))
+        with open(path, 'r') as f:
+            entries = [line.strip() for line in f]
+        return [os.path.join(base, entry) for entry in entries
+                if entry and not entry.startswith('#')]
+
+    if __is_project__(path):
+        return [path]
+
+    if not os.path.isdir(path):
+        log.error("Batch location '{}' not found".format(path))
+        return []
+
+    return [os.path.join(path, d) for d in sorted(os.listdir(path))
+            if __is_project__(os.path.join(path, d))]
+
+
+def summary(results):
+    """
+    Build the summary table of a batch. The total time is the wall-clock
+    time of the batch, from the start of its first project to the end of
+    its last one, as projects may be packaged concurrently.
+    :param results: list of BatchResult objects
+    :return: formatted table
+    """
+    rows = []
+    for r in results:
+        rows.append([r.project,
+                     r.package if r.success else 'FAILED: ' + str(r.error),
+                     '{:.2f}'.format(r.size / 1024 / 1024)
+                     if r.success else '-',
+                     '{:.2f}'.format(r.duration)])
+
+    timed = [r for r in results if r.start is not None]
+    duration = max(r.start + r.duration for r in timed) - \
+        min(r.start for r in timed) if timed else \
+        sum(r.duration for r in results)
+
+    rows.append(['total ({}/{} packaged)'.format(
+                     sum(1 for r in results if r.success), len(results)),
+                 '',
+                 '{:.2f}'.format(sum(r.size for r in results
+                                     if r.success) / 1024 / 1024),
+                 '{:.2f}'.format(duration)])
+
+    return tabulate(rows, headers=['Project', 'Package', 'Size (MB)',
+                                   'Time (s)'])
+
+
+def __is_project__(path):
+    return os.path.isfile(os.path.join(path, Project.__descriptor_name__))
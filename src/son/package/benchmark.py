@@ -0,0 +1,441 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+"""
+Packaging benchmark.
+
+Generates a synthetic workspace and project, with a configurable number
+of VNFs, VDUs and image files, and measures the packaging of the project
+in multiple scenarios (packaging modes). Results are written as JSON and
+can be compared against the results of a previous (baseline) run:
+
+    python -m son.package.benchmark --vnfs 10 --image-size 8M \\
+        --output current.json --baseline baseline.json
+"""
+
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import yaml
+from tabulate import tabulate
+from son.package.cache import get_workspace_cache
+from son.package.package import Packager, PackageOptions
+from son.package.perf import PerfReport
+from son.workspace.project import Project
+from son.workspace.workspace import Workspace
+
+log = logging.getLogger(__name__)
+
+# Version of the results format
+RESULTS_VERSION = 1
+
+# Build options of each benchmark scenario (see PackageOptions). The
+# number of workers of the 'parallel' scenario is configurable.
+SCENARIOS = {
+    'workdir': dict(direct=False),
+    'direct': dict(direct=True),
+    'reproducible': dict(direct=True, reproducible=True),
+    'parallel': dict(direct=True),
+}
+DEFAULT_SCENARIOS = ['workdir', 'direct', 'parallel']
+
+# Changes below this duration (seconds) are not regressions, regardless
+# of the relative change
+MIN_DELTA = 0.005
+
+_WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+def generate_workspace(root, schemas=None):
+    """
+    Create a synthetic workspace.
+    :param root: workspace root directory, must not exist
+    :param schemas: directory of the local schema master. If not
+                    specified, permissive schemas are generated, so that
+                    the generated descriptors are always valid
+    :return: Workspace object
+    """
+    workspace = Workspace(root, ws_name='benchmark', log_level='warning')
+    workspace.create_dirs()
+
+    if not schemas:
+        schemas = os.path.join(root, 'schemas')
+        os.makedirs(schemas)
+        for name in ('pd', 'nsd', 'vnfd'):
+            with open(os.path.join(schemas, name + '-schema.yml'), 'w') as f:
+                yaml.dump({'type': 'object'}, f)
+
+    # schemas are only loaded locally
+    workspace.config['schemas_local_master'] = os.path.abspath(schemas)
+    workspace.config['schemas_remote_master'] = 'local/'
+    workspace.write_ws_descriptor()
+    return workspace
+
+
+def generate_project(workspace, root, vnfs=4, vdus=1, images=1,
+                     image_size=1024 * 1024, seed=0):
+    """
+    Create a synthetic project. Each VDU references a single image file
+    or, with multiple images, a directory of image files. Images contain
+    pseudo-random (incompressible) data, the same for the same seed.
+    :param workspace: Workspace object
+    :param root: project root directory, must not exist
+    :param vnfs: number of VNFs
+    :param vdus: number of VDUs of each VNF
+    :param images: number of image files of each VDU
+    :param image_size: size (bytes) of each image file
+    :param seed: seed of the image contents
+    :return: Project object
+    """
+    rnd = random.Random(seed)
+    config = {
+        'version': Project.CONFIG_VERSION,
+        'package': {
+            'name': 'benchmark',
+            'vendor': 'eu.sonata-nfv.benchmark',
+            'version': '0.1',
+            'maintainer': 'Benchmark',
+            'description': 'Synthetic project of the packaging benchmark'
+        },
+        'descriptor_extension': workspace.default_descriptor_extension
+    }
+    project = Project(workspace, root, config=config)
+    os.makedirs(project.nsd_root)
+    __dump__(os.path.join(root, Project.__descriptor_name__), config)
+
+    functions = []
+    for i in range(vnfs):
+        name = 'vnf{}'.format(i)
+        vnf_dir = os.path.join(project.vnfd_root, name)
+        os.makedirs(vnf_dir)
+
+        units = []
+        for j in range(vdus):
+            vdu = 'vdu{}'.format(j)
+            if images == 1:
+                image = vdu + '.qcow2'
+                __write_image__(os.path.join(vnf_dir, image), image_size,
+                                rnd)
+                image_format = 'qcow2'
+            else:
+                image = vdu
+                os.makedirs(os.path.join(vnf_dir, image))
+                for k in range(images):
+                    # file names are unique within the VNF, since the
+                    # package entry names do not include the VDU
+                    __write_image__(os.path.join(
+                        vnf_dir, image, '{}-img{}.raw'.format(vdu, k)),
+                        image_size, rnd)
+                image_format = 'raw'
+
+            units.append({'id': vdu, 'vm_image': image,
+                          'vm_image_format': image_format,
+                          'connection_points': [{'id': vdu + ':cp0'}]})
+
+        __dump__(os.path.join(vnf_dir,
+                              name + '.' + project.descriptor_extension),
+                 {'descriptor_version': '1.0',
+                  'vendor': 'eu.sonata-nfv.benchmark',
+                  'name': name, 'version': '0.1',
+                  'virtual_deployment_units': units})
+        functions.append({'vnf_id': name,
+                          'vnf_vendor': 'eu.sonata-nfv.benchmark',
+                          'vnf_name': name, 'vnf_version': '0.1'})
+
+    __dump__(os.path.join(project.nsd_root,
+                          'nsd.' + project.descriptor_extension),
+             {'descriptor_version': '1.0',
+              'vendor': 'eu.sonata-nfv.benchmark',
+              'name': 'benchmark-ns', 'version': '0.1',
+              'network_functions': functions})
+    return project
+
+
+def run_scenario(workspace, project, repeat=3, warm=False, **options):
+    """
+    Package a project multiple times and measure each run.
+    :param workspace: Workspace object
+    :param project: Project object
+    :param repeat: number of runs
+    :param warm: keep the hash cache of the workspace between runs.
+                 By default, every run starts with an empty cache
+    :param options: PackageOptions arguments of the scenario
+    :return: list of runs. Each run holds the duration of build_package
+             (i.e. the Packager construction), generate_package and
+             both (total), the package size, and the cumulative
+             duration and bytes of each stage (see PerfReport.stages)
+    """
+    runs = []
+    for _ in range(repeat):
+        if not warm:
+            get_workspace_cache(workspace).clear()
+
+        dst = tempfile.mkdtemp(prefix='son-benchmark-')
+        report = PerfReport('benchmark')
+        try:
+            with report.activate():
+                start = time.perf_counter()
+                pck = Packager(workspace, project=project, dst_path=dst,
+                               options=PackageOptions(**options))
+                built = time.perf_counter()
+                package = pck.generate_package('benchmark')
+                end = time.perf_counter()
+            pck.cleanup()
+
+            if not package:
+                raise RuntimeError("Failed to generate the package")
+
+            runs.append(dict(build_package=built - start,
+                             generate_package=end - built,
+                             total=end - start,
+                             size=os.path.getsize(package),
+                             stages=report.stages()))
+        finally:
+            shutil.rmtree(dst, ignore_errors=True)
+
+    return runs
+
+
+def summarize(runs):
+    """
+    Obtain the median durations of multiple runs of a scenario.
+    :param runs: list of runs, as returned by run_scenario
+    :return: dictionary with the median of build_package,
+             generate_package and total durations, and of each stage
+    """
+    summary = {metric: statistics.median(run[metric] for run in runs)
+               for metric in ('build_package', 'generate_package', 'total')}
+    summary['stages'] = {
+        stage: statistics.median(run['stages'][stage]['duration']
+                                 for run in runs if stage in run['stages'])
+        for stage in sorted(set(stage for run in runs
+                                for stage in run['stages']))}
+    return summary
+
+
+def run_benchmark(root, scenarios=None, vnfs=4, vdus=1, images=1,
+                  image_size=1024 * 1024, repeat=3, workers=4, warm=False,
+                  schemas=None):
+    """
+    Generate a synthetic workspace and project and measure their
+    packaging in multiple scenarios.
+    :param root: directory of the generated workspace and project
+    :param scenarios: names of the scenarios to run, see SCENARIOS
+    :param vnfs: number of VNFs of the project
+    :param vdus: number of VDUs of each VNF
+    :param images: number of image files of each VDU
+    :param image_size: size (bytes) of each image file
+    :param repeat: number of runs of each scenario
+    :param workers: number of workers of the 'parallel' scenario
+    :param warm: keep the hash cache of the workspace between runs
+    :param schemas: directory of the local schema master, permissive
+                    schemas are used if not specified
+    :return: results dictionary
+    """
+    scenarios = scenarios if scenarios else DEFAULT_SCENARIOS
+    workspace = generate_workspace(os.path.join(root, 'workspace'), schemas)
+    project = generate_project(workspace, os.path.join(root, 'project'),
+                               vnfs=vnfs, vdus=vdus, images=images,
+                               image_size=image_size)
+
+    results = dict(
+        version=RESULTS_VERSION,
+        timestamp=time.time(),
+        environment=dict(python=platform.python_version(),
+                         platform=platform.platform(),
+                         cpus=os.cpu_count()),
+        project=dict(vnfs=vnfs, vdus=vdus, images=images,
+                     image_size=image_size, repeat=repeat, warm=warm,
+                     bytes=vnfs * vdus * images * image_size),
+        scenarios=dict())
+
+    for name in scenarios:
+        options = dict(SCENARIOS[name])
+        if name == 'parallel':
+            options['workers'] = workers
+        log.info("Running scenario '{}' ({} runs)".format(name, repeat))
+
+        runs = run_scenario(workspace, project, repeat=repeat, warm=warm,
+                            **options)
+        results['scenarios'][name] = dict(options=options, runs=runs,
+                                          median=summarize(runs))
+    return results
+
+
+def compare(baseline, current, threshold=0.1, min_delta=MIN_DELTA):
+    """
+    Compare the median durations of two benchmark results.
+    :param baseline: results of the baseline run
+    :param current: results of the current run
+    :param threshold: relative increase of a duration considered a
+                      regression
+    :param min_delta: minimum absolute increase (seconds) of a duration
+                      considered a regression
+    :return: list of (scenario, metric, baseline duration, current
+             duration, relative change, regression) tuples
+    """
+    rows = []
+    for name, scenario in sorted(current['scenarios'].items()):
+        if name not in baseline['scenarios']:
+            continue
+        base = baseline['scenarios'][name]['median']
+        cur = scenario['median']
+
+        metrics = [(m, base[m], cur[m])
+                   for m in ('build_package', 'generate_package', 'total')]
+        metrics += [(stage, base['stages'][stage], cur['stages'][stage])
+                    for stage in sorted(cur['stages'])
+                    if stage in base['stages']]
+
+        for metric, before, after in metrics:
+            change = (after - before) / before if before else 0
+            regression = change > threshold and after - before > min_delta
+            rows.append((name, metric, before, after, change, regression))
+    return rows
+
+
+def parse_size(value):
+    """
+    Parse a size with an optional K, M or G suffix, e.g. '8M'.
+    :return: size in bytes
+    """
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper()
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def __write_image__(filename, size, rnd):
+    with open(filename, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            n = min(remaining, _WRITE_CHUNK_SIZE)
+            f.write(rnd.getrandbits(8 * n).to_bytes(n, 'little'))
+            remaining -= n
+
+
+def __dump__(filename, content):
+    with open(filename, 'w') as f:
+        yaml.dump(content, f, default_flow_style=False)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark the packaging of a synthetic SONATA project")
+    parser.add_argument("--vnfs", type=int, default=4,
+                        help="number of VNFs. Default: 4")
+    parser.add_argument("--vdus", type=int, default=1,
+                        help="number of VDUs of each VNF. Default: 1")
+    parser.add_argument("--images", type=int, default=1,
+                        help="number of image files of each VDU. "
+                             "Default: 1")
+    parser.add_argument("--image-size", dest="image_size", default='1M',
+                        help="size of each image file, e.g. 512K, 8M. "
+                             "Default: 1M")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of runs of each scenario, the median "
+                             "is reported. Default: 3")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="number of workers of the 'parallel' "
+                             "scenario. Default: 4")
+    parser.add_argument("--scenarios", nargs='+', choices=sorted(SCENARIOS),
+                        default=DEFAULT_SCENARIOS,
+                        help="scenarios to run. Default: {}"
+                             .format(' '.join(DEFAULT_SCENARIOS)))
+    parser.add_argument("--warm", action="store_true",
+                        help="keep the hash cache between runs")
+    parser.add_argument("--schemas",
+                        help="local schema master directory. By default, "
+                             "permissive schemas are used")
+    parser.add_argument("--root",
+                        help="directory to generate the synthetic "
+                             "workspace and project (in its 'workspace' "
+                             "and 'project' subdirectories), which are "
+                             "kept. By default, a temporary directory is "
+                             "used")
+    parser.add_argument("-o", "--output",
+                        help="write the results to the specified JSON file")
+    parser.add_argument("--baseline",
+                        help="compare the results against the results "
+                             "(JSON file) of a previous run. Exits with an "
+                             "error status if any duration regressed")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative increase of a duration considered "
+                             "a regression. Default: 0.1")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    root = args.root if args.root else tempfile.mkdtemp(
+        prefix='son-benchmark-')
+    try:
+        results = run_benchmark(
+            root, scenarios=args.scenarios, vnfs=args.vnfs, vdus=args.vdus,
+            images=args.images, image_size=parse_size(args.image_size),
+            repeat=args.repeat, workers=args.workers, warm=args.warm,
+            schemas=args.schemas)
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(tabulate(
+        [(name, s['median']['build_package'],
+          s['median']['generate_package'], s['median']['total'],
+          s['runs'][0]['size'])
+         for name, s in sorted(results['scenarios'].items())],
+        headers=['Scenario', 'build_package (s)', 'generate_package (s)',
+                 'Total (s)', 'Package size']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        rows = compare(baseline, results, threshold=args.threshold)
+        print()
+        print(tabulate(
+            [(s, m, b, c, '{:+.1%}'.format(ch), 'REGRESSION' if r else '')
+             for s, m, b, c, ch, r in rows],
+            headers=['Scenario', 'Metric', 'Baseline (s)', 'Current (s)',
+                     'Change', '']))
+        if any(row[5] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
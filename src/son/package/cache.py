@@ -0,0 +1,304 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class PersistentCache(object):
+    """
+    Base of the caches persisted to a JSON file.
+    Entries are kept in memory from least to most recently used, the
+    least recently used ones being evicted when the cache grows beyond its
+    maximum size. The cache file holds the version of the cache and its
+    entries, in the same order. Files of another version are discarded,
+    as are missing or invalid files. The file is replaced atomically when
+    saved, i.e. concurrent processes do not read partial files.
+    Subclasses set the version and the name of the cache (for messages)
+    and may override how entries are serialized.
+    """
+
+    CACHE_VERSION = 1
+    CACHE_NAME = 'cache'
+    DEFAULT_MAX_ENTRIES = 1024
+
+    def __init__(self, filename=None, max_entries=None):
+        """
+        Initialize the cache.
+        :param filename: file where the cache is persisted. If not
+                         specified, the cache is kept in memory only
+        :param max_entries: maximum number of cached entries, by default
+                            DEFAULT_MAX_ENTRIES
+        """
+        self._filename = filename
+        self._max_entries = self.DEFAULT_MAX_ENTRIES \
+            if max_entries is None else max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._modified = False
+
+        if self._filename:
+            self.load()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def max_entries(self):
+        return self._max_entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._modified = True
+
+    def _lookup(self, key):
+        """
+        Obtain an entry, marking it as the most recently used. The lock
+        must be held by the caller.
+        :return: the entry, None if not cached
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, entry):
+        """
+        Store an entry as the most recently used, evicting the least
+        recently used ones beyond the maximum size. The lock must be held
+        by the caller.
+        """
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._evict()
+        self._modified = True
+
+    def _evict(self):
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._modified = True
+
+    @staticmethod
+    def _dump_entry(key, entry):
+        """
+        Serialize an entry, by default as a list of the key followed by
+        the items of the entry (a list).
+        """
+        return [key] + entry
+
+    @staticmethod
+    def _load_entry(item):
+        """
+        Deserialize an entry, see _dump_entry().
+        :return: tuple (key, entry)
+        """
+        return item[0], item[1:]
+
+    def load(self):
+        """
+        Load the entries of the cache file, replacing the cached ones.
+        """
+        if not self._filename or not os.path.isfile(self._filename):
+            return
+
+        try:
+            with open(self._filename, 'r') as _file:
+                content = json.load(_file)
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring invalid {} file '{}': {}"
+                        .format(self.CACHE_NAME, self._filename, e))
+            return
+
+        if content.get('version') != self.CACHE_VERSION:
+            log.debug("Discarding {} '{}' of version '{}'"
+                      .format(self.CACHE_NAME, self._filename,
+                              content.get('version')))
+            return
+
+        with self._lock:
+            self._entries.clear()
+            for item in content['entries']:
+                key, entry = self._load_entry(item)
+                self._entries[key] = entry
+            self._evict()
+            self._modified = False
+
+        log.debug("Loaded {} entries from {} '{}'"
+                  .format(len(self._entries), self.CACHE_NAME,
+                          self._filename))
+
+    def save(self):
+        """
+        Write the entries to the cache file, if modified.
+        """
+        if not self._filename or not self._modified:
+            return
+
+        # e.g. the workspace was removed meanwhile
+        if not os.path.isdir(os.path.dirname(os.path.abspath(
+                self._filename))):
+            return
+
+        # entries may be modified in place, they are serialized while
+        # holding the lock
+        with self._lock:
+            content = json.dumps({
+                'version': self.CACHE_VERSION,
+                'entries': [self._dump_entry(key, entry)
+                            for key, entry in self._entries.items()]})
+            length = len(self._entries)
+            self._modified = False
+
+        tmp_filename = self._filename + '.tmp'
+        try:
+            with open(tmp_filename, 'w') as _file:
+                _file.write(content)
+            os.replace(tmp_filename, self._filename)
+        except OSError as e:
+            log.warning("Could not write {} file '{}': {}"
+                        .format(self.CACHE_NAME, self._filename, e))
+            return
+
+        log.debug("Saved {} entries to {} '{}'"
+                  .format(length, self.CACHE_NAME, self._filename))
+
+
+class HashCache(PersistentCache):
+    """
+    Persistent cache of file content hashes.
+    Entries are keyed on the identity of a file, i.e. its real path, size,
+    modification time (ns) and inode. A cached hash is only returned while
+    the file identity remains unchanged.
+    """
+
+    CACHE_VERSION = 1
+    CACHE_NAME = 'hash cache'
+    DEFAULT_MAX_ENTRIES = 4096
+
+    @staticmethod
+    def identity(path):
+        """
+        Obtain the identity of a file.
+        :param path: file path
+        :return: tuple (realpath, size, mtime_ns, inode)
+        """
+        realpath = os.path.realpath(path)
+        st = os.stat(realpath)
+        return realpath, st.st_size, st.st_mtime_ns, st.st_ino
+
+    def get(self, path, compute=None):
+        """
+        Obtain the hash of a file.
+        If the file is not cached, or was modified since it was cached, and
+        a compute function is provided, the hash is computed and stored.
+        :param path: file path
+        :param compute: function that computes the hash of the file
+        :return: hash value, None if not available
+        """
+        # identity is taken before computing, so that a file modified
+        # while being hashed is not stored with its new identity
+        ident = self.identity(path)
+        with self._lock:
+            entry = self._entries.get(ident[0])
+            if entry and tuple(entry[:3]) == ident[1:]:
+                self._entries.move_to_end(ident[0])
+                return entry[3]
+
+        if not compute:
+            return
+
+        value = compute()
+        self.put(ident, value)
+        return value
+
+    def put(self, ident, value):
+        """
+        Store the hash of a file.
+        :param ident: file path or file identity tuple
+        :param value: hash value
+        """
+        if isinstance(ident, str):
+            ident = self.identity(ident)
+
+        with self._lock:
+            self._store(ident[0], list(ident[1:]) + [value])
+
+
+class CacheManager(object):
+
+    def __init__(self):
+        self._caches = dict()
+        self._lock = threading.Lock()
+
+    def get_cache(self, filename=None):
+        with self._lock:
+            if filename not in self._caches:
+                cache = self._caches[filename] = HashCache(filename)
+                atexit.register(cache.save)
+
+            return self._caches[filename]
+
+
+HashCache.manager = CacheManager()
+
+
+def get_cache(filename=None):
+    """
+    Obtain the hash cache persisted in the given file. The same cache
+    object is shared by all callers in the process and is saved on exit.
+    :param filename: cache filename. If None, a process-wide in-memory
+                     cache is returned
+    :return: HashCache object
+    """
+    return HashCache.manager.get_cache(filename)
+
+
+def get_workspace_cache(workspace):
+    """
+    Obtain the hash cache of a workspace. The cache is only persisted if
+    the workspace exists on disk.
+    :param workspace: SONATA workspace object
+    :return: HashCache object
+    """
+    if workspace and os.path.isfile(os.path.join(
+            workspace.workspace_root, workspace.__descriptor_name__)):
+        return get_cache(workspace.hash_cache_file)
+
+    return get_cache()
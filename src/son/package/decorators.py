@@ -26,13 +26,16 @@
 
 import logging
 import time
+from son.package.perf import span
 
 
 def performance(method):
     def measure(*args, **kwargs):
         log = logging.getLogger(method.__module__)
         start = time.time()
-        result = method(*args, **kwargs)
+        # also recorded in the performance report, if active
+        with span(method.__name__):
+            result = method(*args, **kwargs)
         log.info('{0} executed in {1:.3f} sec'
                  .format(method.__name__, time.time() - start))
         return result
@@ -25,32 +25,239 @@
 # partner consortium (www.sonata-nfv.eu).
 
 import hashlib
+import logging
+import mmap
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
 
-def generate_hash(f, cs=128):
-    return __generate_hash__(f, cs) \
+log = logging.getLogger(__name__)
+
+# Bounds of the adaptive read buffer. Small files are read with the minimum
+# buffer, large files (e.g. VDU images) with buffers up to the maximum.
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Files above this size are hashed through a read-only memory map
+MMAP_THRESHOLD = 32 * 1024 * 1024
+
+# Modes of placing a file at its destination in copy_hash()
+COPY = 'copy'
+HARDLINK = 'hardlink'
+REFLINK = 'reflink'
+COPY_MODES = (COPY, HARDLINK, REFLINK)
+
+# Linux ioctl to clone the extents of a file (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+def generate_hash(f, cs=None, workers=None, cache=None):
+    """
+    Generate the MD5 hash of a file or of a directory tree.
+    :param f: file or directory path
+    :param cs: read buffer size. If not specified, it is chosen according
+               to the size of each file
+    :param workers: number of threads used to hash the files of a
+                    directory tree. If not specified, a default pool size
+                    is used
+    :param cache: HashCache object to look up (and store) file hashes
+    :return: hex digest
+    """
+    return __generate_hash__(f, cs, cache) \
         if os.path.isfile(f) \
-        else __generate_hash_path__(f, cs)
+        else __generate_hash_path__(f, cs, workers, cache)
+
+
+def chunk_size(size, cs=None):
+    """
+    Obtain the read buffer size to use for a file of the given size.
+    :param size: size of the file in bytes
+    :param cs: explicit buffer size, takes precedence when specified
+    :return: buffer size in bytes
+    """
+    if cs:
+        return cs
+    # aim for ~64 reads per file, bounded by [MIN_CHUNK_SIZE, MAX_CHUNK_SIZE]
+    return min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, size >> 6))
+
+
+def file_digest(f, algorithm='sha256', cs=None):
+    """
+    Generate the digest of a file with any hashlib algorithm. The file is
+    read in a single streaming pass, with bounded memory.
+    :param f: file path
+    :param algorithm: name of the hash algorithm, e.g. 'sha256'
+    :param cs: read buffer size
+    :return: digest (bytes)
+    """
+    hash = hashlib.new(algorithm)
+    __update_hash_file__(hash, f, cs)
+    return hash.digest()
 
 
-def __generate_hash__(f, cs=128):
+def __generate_hash__(f, cs=None, cache=None):
+    if cache is not None:
+        return cache.get(f, lambda: __generate_hash__(f, cs))
+
     hash = hashlib.md5()
+    __update_hash_file__(hash, f, cs)
+    return hash.hexdigest()
+
+
+def __update_hash_file__(hash, f, cs=None):
+    size = os.path.getsize(f)
+    cs = chunk_size(size, cs)
     with open(f, "rb") as file:
-        for chunk in iter(lambda: file.read(cs), b''):
-            hash.update(chunk)
+        if size >= MMAP_THRESHOLD and __update_hash_mmap__(hash, file, cs):
+            return
+        buf = bytearray(cs)
+        view = memoryview(buf)
+        for n in iter(lambda: file.readinto(buf), 0):
+            hash.update(view[:n])
+
+
+def __update_hash_mmap__(hash, file, cs):
+    """
+    Update a hash with the contents of a file using a memory map.
+    :return: True if successful, False if the file cannot be mapped
+    """
+    try:
+        mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return False
+
+    with mm:
+        view = memoryview(mm)
+        try:
+            for offset in range(0, len(mm), cs):
+                hash.update(view[offset:offset + cs])
+        finally:
+            view.release()
+    return True
+
+
+def __generate_hash_path__(p, cs=None, workers=None, cache=None):
+    # map each directory of the tree to its (files, subdirectories)
+    tree = dict()
+    for root, dirs, files in os.walk(p, followlinks=True):
+        tree[root] = ([os.path.join(root, f) for f in sorted(files)],
+                      [os.path.join(root, d) for d in sorted(dirs)])
+
+    files = [f for entry in tree.values() for f in entry[0]]
+    hashes = dict(zip(files, generate_hashes(files, cs, workers, cache)))
+    return __reduce_path__(p, tree, hashes)
+
+
+def __reduce_path__(p, tree, hashes):
+    if p not in tree:
+        return _reduce_hash([])
+
+    files, dirs = tree[p]
+    dir_hashes = [hashes[f] for f in files]
+    for d in dirs:  # guarantee same order to obtain same hash
+        dir_hashes.append(__reduce_path__(d, tree, hashes))
+    return _reduce_hash(dir_hashes)
+
+
+def generate_hashes(files, cs=None, workers=None, cache=None):
+    """
+    Generate the MD5 hashes of multiple files concurrently. The underlying
+    hash computation releases the GIL, so a thread pool scales with the
+    number of available cores.
+    :param files: list of file paths
+    :param cs: read buffer size
+    :param workers: number of threads. If 1, files are hashed sequentially
+    :param cache: HashCache object to look up (and store) file hashes
+    :return: list of hex digests, in the same order of the provided files
+    """
+    if workers == 1 or len(files) <= 1:
+        return [__generate_hash__(f, cs, cache) for f in files]
+
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as ex:
+        return list(ex.map(lambda f: __generate_hash__(f, cs, cache),
+                           files))
+
+
+def copy_hash(src, dst, mode=COPY, cs=None, cache=None):
+    """
+    Copy a file and generate its MD5 hash in a single pass, i.e. each
+    byte of the source file is only read once.
+    In hardlink or reflink mode the destination shares its data with the
+    source file. If the link cannot be created (e.g. different
+    filesystems, unsupported filesystem) a regular copy is performed.
+    :param src: source file path
+    :param dst: destination file path
+    :param mode: one of COPY, HARDLINK or REFLINK
+    :param cs: read buffer size
+    :param cache: HashCache object to look up (and store) the source hash
+    :return: hex digest
+    """
+    if mode not in COPY_MODES:
+        raise ValueError("Invalid copy mode '{}'".format(mode))
+
+    if mode != COPY and __link__(src, dst, mode):
+        # no data was copied, hash the source (or obtain it from cache)
+        return __generate_hash__(src, cs, cache)
+
+    if cache is None:
+        return __copy_hash__(src, dst, cs)
+
+    value = cache.get(src)
+    if value:
+        shutil.copyfile(src, dst)
+        return value
+
+    ident = cache.identity(src)
+    value = __copy_hash__(src, dst, cs)
+    cache.put(ident, value)
+    return value
+
+
+def __copy_hash__(src, dst, cs=None):
+    hash = hashlib.md5()
+    cs = chunk_size(os.path.getsize(src), cs)
+    buf = bytearray(cs)
+    view = memoryview(buf)
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        for n in iter(lambda: fsrc.readinto(buf), 0):
+            hash.update(view[:n])
+            fdst.write(view[:n])
     return hash.hexdigest()
 
 
-def __generate_hash_path__(p, cs=128):
-    hashes = []
-    for root, dirs, files in os.walk(p):
-        for f in sorted(files):  # guarantee same order to obtain same hash
-            hashes.append(__generate_hash__(os.path.join(root, f), cs))
-        for d in sorted(dirs):  # guarantee same order to obtain same hash
-            hashes.append(__generate_hash_path__(os.path.join(root, d), cs))
-        break
-    return _reduce_hash(hashes)
+def __link__(src, dst, mode):
+    """
+    Create a hard link or a reflink of a file.
+    :return: True if successful, False if a regular copy is required
+    """
+    try:
+        if mode == HARDLINK:
+            os.link(src, dst)
+            return True
+
+        if fcntl is None:
+            return False
+
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+
+    except OSError as e:
+        log.debug("Could not {} '{}' to '{}', copying instead: {}"
+                  .format(mode, src, dst, e))
+        # remove the empty destination created by the reflink attempt
+        if mode == REFLINK and os.path.isfile(dst):
+            os.remove(dst)
+        return False
+
+
+def default_workers():
+    return min(32, (os.cpu_count() or 1) + 4)
 
 
 def _reduce_hash(hashlist):
@@ -24,6 +24,7 @@
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.sonata-nfv.eu).
 
+import hashlib
 import logging
 import os
 import pathlib
@@ -31,15 +32,24 @@ import shutil
 import sys
 import zipfile
 import coloredlogs
-import requests
 import validators
 import yaml
 import time
+import uuid
 import atexit
-from contextlib import closing
+import filecmp
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import closing, ExitStack
 from son.validate.validate import Validator
 from son.package.decorators import performance
-from son.package.md5 import generate_hash
+from son.package.perf import span, propagate, PerfReport
+from son.package.md5 import generate_hash, copy_hash, COPY, COPY_MODES
+from son.package.cache import get_workspace_cache
+from son.package.remote import get_probe
+from son.package.archive import PackageArchive, PackageIndex, MANIFEST_NAME, \
+    CT_PACKAGE_DESCRIPTOR, CT_SERVICE_DESCRIPTOR, CT_FUNCTION_DESCRIPTOR, \
+    DEFAULT_LEVEL, inspect_package
 from son.workspace.project import Project
 from son.workspace.workspace import Workspace
 from son.schema.validator import SchemaValidator
@@ -47,12 +57,103 @@ from son.access.access import AccessClient
 
 log = logging.getLogger(__name__)
 
+# MD5 placeholder of remote artifacts that were not downloaded
+DUMMY_MD5 = '02236f2ae558018ed14b5222ef1bd9f1'
+
+# General description of custom packages
+CUSTOM_PACKAGE = {'vendor': 'custom',
+                  'name': 'package',
+                  'version': '1.0',
+                  'maintainer': 'developer',
+                  'description': 'custom generated package'}
+
+
+class PackageOptions(object):
+    """
+    Build options of packages, independent of their contents. The same
+    options are given to the Packager of a single package and shared by
+    all packages of a batch (see BatchPackager).
+    """
+
+    def __init__(self, copy_mode=COPY, direct=False, workers=1,
+                 incremental=False, reproducible=False, remote_md5=False,
+                 dedupe=False, level=None, levels=None):
+        """
+        Initialize the build options.
+        :param copy_mode: how artifacts are placed in the working
+                          directory, one of COPY_MODES
+        :param direct: stream contents directly into the package archive,
+                       without a working directory
+        :param workers: number of VNFs processed concurrently, also the
+                        number of threads compressing large members. In a
+                        batch, number of projects packaged concurrently.
+        :param incremental: reuse the contents of the previously generated
+                            package of each project of a batch, if
+                            existent (a single Packager is given its
+                            previous package instead)
+        :param reproducible: generate the same package bytes from the
+                             same contents
+        :param remote_md5: download remote VDU images to compute their MD5
+        :param dedupe: read and compress identical artifacts only once
+        :param level: compression level of the package contents
+        :param levels: compression levels by content type, overriding level
+        """
+        self.copy_mode = copy_mode
+        self.direct = direct
+        self.workers = workers
+        self.incremental = incremental
+        self.reproducible = reproducible
+        self.remote_md5 = remote_md5
+        self.dedupe = dedupe
+        self.level = level
+        self.levels = levels
+
+    def replace(self, **changes):
+        """
+        Obtain a copy of the options with some of them changed.
+        :param changes: options to change, by name
+        :return: PackageOptions object
+        """
+        options = dict(vars(self))
+        options.update(changes)
+        return PackageOptions(**options)
+
+    def __repr__(self):
+        return "PackageOptions({})".format(
+            ", ".join("{}={!r}".format(k, v)
+                      for k, v in sorted(vars(self).items())))
+
 
 class Packager(object):
 
     def __init__(self, workspace, project=None, services=None, functions=None,
-                 dst_path=None, generate_pd=True, version="1.0"):
-
+                 dst_path=None, generate_pd=True, version="1.0",
+                 options=None, previous=None, validator=None,
+                 schema_validator=None, access=None, nsd=None, vnfds=None,
+                 images=None, description=None):
+        """
+        Initialize the packager.
+        :param workspace: workspace object
+        :param project: project object to package
+        :param services: service descriptor files of a custom package
+        :param functions: function descriptor files of a custom package
+        :param dst_path: location to write the package (default: '.')
+        :param generate_pd: build the package descriptor on creation
+        :param version: version of the package descriptor
+        :param options: PackageOptions object, default options if None
+        :param previous: previously generated package, whose unchanged
+                         contents are reused (implies direct)
+        :param validator: Validator object to reuse, created if None
+        :param schema_validator: SchemaValidator object to reuse, the one
+                                 of the validator if None
+        :param access: son-access client to reuse, created if None
+        :param nsd: service descriptor given in memory (dictionary),
+                    instead of a project (implies direct)
+        :param vnfds: function descriptors given in memory (dictionaries)
+        :param images: local files of the VDU images of the in-memory
+                       VNFDs, by VNF name and vm_image reference
+        :param description: general description of an in-memory package
+        """
         # Assign parameters
         coloredlogs.install(level=workspace.log_level)
         self._version = version
@@ -61,17 +162,91 @@ class Packager(object):
         self._project = project
         self._services = services
         self._functions = functions
-
-        # Create a son-access client
-        self._access = AccessClient(self._workspace,
-                                    log_level=self._workspace.log_level)
-
-        # Create a validator
-        self._validator = Validator(workspace=workspace)
+        options = options if options else PackageOptions()
+
+        # How artifacts are placed in the workdir: copy, hardlink, reflink
+        self._copy_mode = options.copy_mode
+
+        # Stream contents directly into the package archive, instead of
+        # assembling them in the temporary working directory
+        self._direct = options.direct
+        self._archive = None
+
+        # Number of VNFs processed concurrently, also the number of threads
+        # compressing the blocks of large package members
+        self._workers = options.workers
+
+        # Compression level of the package contents and, overriding it,
+        # levels by content type (see PackageArchive). Unless configured
+        # or reproducible, packages assembled in the working directory
+        # have their contents stored.
+        self._level = options.level
+        self._levels = options.levels
+
+        # Generate the same package (bytes) from the same contents: sorted
+        # entries, fixed timestamps and permissions. In direct mode,
+        # contents are collected and only written, in sorted order, when
+        # the package is generated.
+        self._reproducible = options.reproducible
+        self._pending = [] if self._reproducible and self._direct else None
+
+        # Probe of remote VDU images. If remote_md5, the images are
+        # downloaded to compute their MD5.
+        self._probe = get_probe()
+        self._remote_md5 = options.remote_md5
+
+        # Read and compress identical artifacts (e.g. VDU images shared by
+        # VNFs) only once. Repeated artifacts are still packaged, as
+        # regular members, but copied from the member of the first one.
+        self._dedupe = options.dedupe
+        self._artifacts = []
+        self._duplicates = dict()
+
+        # Previously generated package, whose unchanged contents are
+        # reused (requires direct mode)
+        self._previous = None
+        self._reused = []
+        if previous:
+            self._direct = True
+            self.__open_previous__(previous)
+            if self._reproducible and self._pending is None:
+                self._pending = []
+
+        # Service and function descriptors given in memory (already
+        # parsed), instead of being read from a project, and the local
+        # files of the VDU images they reference, by VNF name and vm_image
+        # reference. Contents are only written once the package is
+        # generated, to a file or to a file-like object, without a working
+        # directory.
+        self._nsd = nsd
+        self._vnfds = vnfds
+        self._images = images
+        self._description = description
+        if nsd is not None:
+            self._direct = True
+            if self._pending is None:
+                self._pending = []
+
+        # Create a son-access client, unless provided
+        self._access = access if access else \
+            AccessClient(self._workspace, log_level=self._workspace.log_level)
+
+        # Create a validator, unless provided (e.g. reused across packages)
+        if validator:
+            validator.reset()
+            self._validator = validator
+        else:
+            self._validator = Validator(workspace=workspace,
+                                        schema_validator=schema_validator)
         self._validator.configure(syntax=True, integrity=False, topology=False)
 
-        # Create a schema validator
-        self._schema_validator = SchemaValidator(workspace)
+        # Schema validator, unless provided, shared with the validator, so
+        # that schemas are only loaded and compiled once
+        self._schema_validator = schema_validator if schema_validator else \
+            self._validator.schema_validator
+
+        # Hash cache of the workspace, avoids re-hashing unchanged files
+        self._hash_cache = get_workspace_cache(workspace)
 
         # Keep track of VNF packaging referenced in NS
         self._ns_vnf_registry = {}
@@ -80,7 +255,8 @@ class Packager(object):
         self._dst_path = dst_path if dst_path else '.'
 
         # temporary working directory
-        self._workdir = '.package-' + str(time.time())
+        self._workdir = '.package-{}-{}'.format(time.time(),
+                                                uuid.uuid4().hex[:8])
 
         # Specifies THE service template of this package
         self._entry_service_template = None
@@ -113,18 +289,77 @@ class Packager(object):
             log.error("Internal error. Temporary workdir already exists.")
             return
 
-        # workdir
-        os.mkdir(self._workdir)
-        atexit.register(shutil.rmtree, os.path.abspath(self._workdir))
+        # in-memory descriptors: the archive is created with the package
+        if self._nsd is not None:
+            return
 
         # destination path
         if not os.path.isdir(self._dst_path):
             os.mkdir(self._dst_path)
 
+        if self._direct:
+            # partial archive, renamed once the package is generated
+            archive = os.path.join(self._dst_path, self._workdir + '.son')
+            self._archive = self.__package_archive__(archive)
+            atexit.register(self.__remove_archive__)
+            return
+
+        # workdir
+        os.mkdir(self._workdir)
+        atexit.register(shutil.rmtree, os.path.abspath(self._workdir),
+                        ignore_errors=True)
+
+    def __open_previous__(self, previous):
+        if not os.path.isfile(previous):
+            log.warning("Previous package '{}' not found. Generating a full "
+                        "package.".format(previous))
+            return
+        try:
+            self._previous = PackageIndex(previous)
+        except (OSError, zipfile.BadZipFile, KeyError, yaml.YAMLError) as e:
+            log.warning("Unable to read previous package '{}', generating a "
+                        "full package: {}".format(previous, e))
+            return
+
+        atexit.register(self._previous.close)
+        log.info("Incremental packaging against '{}' ({} entries)"
+                 .format(previous, len(self._previous)))
+
+    @property
+    def reused_entries(self):
+        """
+        Package content entries copied from the previous package.
+        """
+        return self._reused
+
+    def __package_archive__(self, filename):
+        return PackageArchive(filename,
+                              level=self._level if self._level is not None
+                              else DEFAULT_LEVEL,
+                              reproducible=self._reproducible,
+                              workers=self._workers, levels=self._levels)
+
+    def __remove_archive__(self):
+        if self._archive and isinstance(self._archive.filename, str) and \
+                os.path.isfile(self._archive.filename):
+            self._archive.close()
+            os.remove(self._archive.filename)
+
     @property
     def package_descriptor(self):
         return self._package_descriptor
 
+    @property
+    def descriptor_extension(self):
+        """
+        Extension of descriptor files: the one of the project or, for
+        descriptors given in memory, the default one of the workspace.
+        """
+        if self._project:
+            return self._project.descriptor_extension
+        return self._workspace.default_descriptor_extension
+
+    @performance
     def build_package(self):
         """
         Create and set the full package descriptor as a dictionary.
@@ -148,6 +383,10 @@ class Packager(object):
         if self._project:
             general_description = self.package_gds(
                 prj_descriptor=self._project.project_config)
+        elif self._nsd is not None:
+            general_description = self.package_gds(prj_descriptor={
+                'package': self._description if self._description
+                else CUSTOM_PACKAGE})
         else:
             general_description = self.package_gds()
 
@@ -170,6 +409,18 @@ class Packager(object):
         self._package_descriptor.update(package_dependencies)
         self._package_descriptor.update(artifact_dependencies)
 
+        if self._reproducible:
+            # list entries in the same order, regardless of the order in
+            # which they were found
+            for section in ('package_content', 'artifact_dependencies'):
+                if section in self._package_descriptor:
+                    self._package_descriptor[section].sort(
+                        key=lambda entry: entry['name'])
+
+        # In direct mode, the manifest is written when the archive is closed
+        if self._archive or self._nsd is not None:
+            return
+
         # Create the manifest folder and file
         meta_inf = os.path.join(self._workdir, "META-INF")
         os.makedirs(meta_inf, exist_ok=True)
@@ -215,11 +466,7 @@ class Packager(object):
                 return
         else:
             # TODO: what properties to set in a custom package? TBD...
-            gds['vendor'] = 'custom'
-            gds['name'] = 'package'
-            gds['version'] = '1.0'
-            gds['maintainer'] = 'developer'
-            gds['description'] = 'custom generated package'
+            gds.update(CUSTOM_PACKAGE)
 
         return gds
 
@@ -246,6 +493,12 @@ class Packager(object):
                 log.error("Failed to package service descriptors")
                 return
             pcs += nsds
+        elif self._nsd is not None:
+            nsd = self.generate_memory_nsd()
+            if not nsd:
+                log.error("Failed to package service descriptor")
+                return
+            pcs += nsd
 
         # Load and add the function descriptors
         if self._project:
@@ -260,6 +513,12 @@ class Packager(object):
                 log.error("Failed to package function descriptors")
                 return
             pcs += vnfds
+        elif self._nsd is not None:
+            vnfds = self.generate_memory_vnfds()
+            if vnfds is None:
+                log.error("Failed to package function descriptors")
+                return
+            pcs += vnfds
 
         return dict(package_content=pcs)
 
@@ -336,8 +595,10 @@ class Packager(object):
         log.debug("Validating Service Descriptor NSD='{}'"
                   .format(nsd_filename))
 
-        if not self._validator.validate_service(os.path.join(base_path,
-                                                             nsd_filename)):
+        with span('validate', descriptor=nsd_filename):
+            valid = self._validator.validate_service(
+                os.path.join(base_path, nsd_filename))
+        if not valid:
             log.error("Failed to validate Service Descriptor '{}'. "
                       "Aborting package creation".format(nsd_filename))
             return
@@ -352,21 +613,13 @@ class Packager(object):
                                                      vnf['vnf_name'],
                                                      vnf['vnf_version']))
 
-        # Create SD location
-        nsd = os.path.join(base_path, nsd_filename)
-        sd_path = os.path.join(self._workdir, "service_descriptors")
-        os.makedirs(sd_path, exist_ok=True)
-
-        # Copy service descriptor file
-        sd = os.path.join(sd_path, nsd_filename)
-        self.copy_descriptor_file(nsd, sd)
-
-        # Generate NSD package content entry
+        # Generate NSD package content entry and add the descriptor file
         pce = []
         pce_sd = dict()
-        pce_sd["content-type"] = "application/sonata.service_descriptor"
+        pce_sd["content-type"] = CT_SERVICE_DESCRIPTOR
         pce_sd["name"] = "/service_descriptors/{}".format(nsd_filename)
-        pce_sd["md5"] = generate_hash(sd)
+        pce_sd["md5"] = self.add_descriptor(
+            os.path.join(base_path, nsd_filename), pce_sd)
         pce.append(pce_sd)
 
         # Specify the NSD as THE entry service template of package descriptor
@@ -386,20 +639,14 @@ class Packager(object):
                           .format(nsd_filename))
                 return
 
-        # Create SD location
-        sd_path = os.path.join(self._workdir, "service_descriptors")
-        os.makedirs(sd_path, exist_ok=True)
-
-        # Copy service descriptors and generate their entry points
+        # Add service descriptors and generate their entry points
         pce = []
         for nsd_filename in self._services:
             nsd_basename = os.path.basename(nsd_filename)
-            sd = os.path.join(sd_path, nsd_basename)
-            self.copy_descriptor_file(nsd_filename, sd)
             pce_sd = dict()
-            pce_sd["content-type"] = "application/sonata.service_descriptor"
+            pce_sd["content-type"] = CT_SERVICE_DESCRIPTOR
             pce_sd["name"] = "/service_descriptors/{}".format(nsd_basename)
-            pce_sd["md5"] = generate_hash(sd)
+            pce_sd["md5"] = self.add_descriptor(nsd_filename, pce_sd)
             pce.append(pce_sd)
 
         return pce
@@ -414,6 +661,15 @@ class Packager(object):
         pcs = self.generate_project_source_vnfds(os.path.join(
             self._project.project_root, 'sources', 'vnf'))
 
+        return self.__package_external_vnfds__(pcs)
+
+    def __package_external_vnfds__(self, pcs):
+        """
+        Package the VNFs referenced by the service descriptor that were not
+        packaged yet, from the VNF catalogue of the workspace.
+        :param pcs: package content entries of the VNFs already packaged
+        :return: all package content entries, None if unsuccessful
+        """
         # Verify that all VNFs from NSD were packaged
         unpack_vnfs = self.get_unpackaged_ns_vnfs()
         if len(unpack_vnfs) > 0:
@@ -444,35 +700,114 @@ class Packager(object):
 
         return pcs
 
+    def generate_memory_nsd(self):
+        """
+        Compile information for the service descriptor given in memory.
+        """
+        nsd_filename = "{}.yml".format(self._nsd.get('name'))
+        log.debug("Validating Service Descriptor NSD='{}'"
+                  .format(nsd_filename))
+        with span('validate', descriptor=nsd_filename):
+            valid = self._schema_validator.validate(
+                self._nsd, SchemaValidator.SCHEMA_SERVICE_DESCRIPTOR)
+        if not valid:
+            log.error("Failed to validate Service Descriptor '{}': {}"
+                      .format(nsd_filename, self._schema_validator.error_msg))
+            return
+
+        # Register the VNF IDs for later dependency check
+        for vnf in self._nsd.get('network_functions') or []:
+            if vnf['vnf_name']:
+                self.register_ns_vnf(get_vnf_id_full(vnf['vnf_vendor'],
+                                                     vnf['vnf_name'],
+                                                     vnf['vnf_version']))
+
+        pce_sd = dict()
+        pce_sd["content-type"] = CT_SERVICE_DESCRIPTOR
+        pce_sd["name"] = "/service_descriptors/{}".format(nsd_filename)
+        pce_sd["md5"] = self.add_descriptor(self._nsd, pce_sd)
+
+        # Specify the NSD as THE entry service template of package descriptor
+        self._entry_service_template = pce_sd['name']
+
+        return [pce_sd]
+
+    def generate_memory_vnfds(self):
+        """
+        Compile information for the function descriptors given in memory.
+        VNFs referenced by the service descriptor, but not given, are
+        packaged from the VNF catalogue of the workspace.
+        """
+        vnfds = []
+        for vnfd in self._vnfds or []:
+            vnfd_filename = "{}.yml".format(vnfd.get('name'))
+            log.debug("Validating VNF descriptor '{}'".format(vnfd_filename))
+            with span('validate', descriptor=vnfd_filename):
+                valid = self._schema_validator.validate(
+                    vnfd, SchemaValidator.SCHEMA_FUNCTION_DESCRIPTOR)
+            if not valid:
+                log.error("Failed to validate VNF descriptor '{}': {}"
+                          .format(vnfd_filename,
+                                  self._schema_validator.error_msg))
+                return
+            vnfds.append((vnfd_filename, vnfd))
+
+        self.__probe_remote_images__([vnfd for _, vnfd in vnfds])
+
+        plans = []
+        for vnfd_filename, vnfd in vnfds:
+            images = (self._images or {}).get(vnfd.get('name'), {})
+            plan = self.plan_vnfd_entry(None, vnfd.get('name'),
+                                        vnfd_filename, vnfd, images=images)
+            if plan:
+                plans.append((vnfd.get('name'), plan))
+
+        if self._dedupe:
+            self.__dedupe_artifacts__(plans)
+
+        pcs = [pce for plan in plans
+               for pce in self.__add_vnf_contents__(plan)]
+        return self.__package_external_vnfds__(pcs)
+
     def generate_custom_vnfds(self):
         """
         Compile information for the function descriptors, when creating a
         custom package.
         """
         log.info("Packaging VNF descriptors...")
-        for vnfd_filename in self._functions:
-            if not self._validator.validate_function(vnfd_filename):
+        if self._workers <= 1 or len(self._functions) <= 1:
+            valid = []
+            for vnfd_filename in self._functions:
+                with span('validate', descriptor=vnfd_filename):
+                    valid.append(
+                        self._validator.validate_function(vnfd_filename))
+        else:
+            # spans of worker processes are not recorded
+            with span('validate', workers=self._workers), \
+                    self.__process_pool__() as ex:
+                valid = list(ex.map(_validate_function_worker,
+                                    [(self._workspace, vnfd_filename)
+                                     for vnfd_filename in self._functions]))
+
+        for vnfd_filename, result in zip(self._functions, valid):
+            if not result:
                 log.error("Failed to package function '{}'"
                           .format(vnfd_filename))
                 return
 
-        # Create FD location
-        sd_path = os.path.join(self._workdir, "function_descriptors")
-        os.makedirs(sd_path, exist_ok=True)
-
-        # Copy function descriptors and generate their entry points
-        pce = []
+        # Add function descriptors and generate their entry points
+        contents = []
         for vnfd_filename in self._functions:
             vnfd_basename = os.path.basename(vnfd_filename)
-            sd = os.path.join(sd_path, vnfd_basename)
-            self.copy_descriptor_file(vnfd_filename, sd)
-            pce_sd = dict()
-            pce_sd["content-type"] = "application/sonata.function_descriptor"
-            pce_sd["name"] = "/service_descriptors/{}".format(vnfd_basename)
-            pce_sd["md5"] = generate_hash(sd)
-            pce.append(pce_sd)
+            pce_fd = dict()
+            pce_fd["content-type"] = CT_FUNCTION_DESCRIPTOR
+            pce_fd["name"] = "/function_descriptors/{}".format(vnfd_basename)
+            contents.append([(vnfd_filename, pce_fd, True)])
 
-        return pce
+        with ThreadPoolExecutor(max_workers=self._workers) as ex:
+            return [pce for pce_list in ex.map(propagate(self.add_contents),
+                                               contents)
+                    for pce in pce_list]
 
     def load_external_vnfds(self, vnf_id_list):
         """
@@ -524,7 +859,7 @@ class Packager(object):
             vnfd_f = open(os.path.join(catalogue_path,
                                        vnfd['name'] +
                                        "." +
-                                       self._project.descriptor_extension),
+                                       self.descriptor_extension),
                           'w')
 
             yaml.dump(vnfd, vnfd_f, default_flow_style=False)
@@ -542,34 +877,169 @@ class Packager(object):
             lambda file: os.path.isdir(os.path.join(base_path, file)),
             os.listdir(base_path))
 
-        pcs = []
-        for vnf in vnf_folders:
-            pc_entries = self.generate_vnfd_entry(
-                os.path.join(base_path, vnf), vnf)
-
-            if not pc_entries or len(pc_entries) == 0:
-                continue
-            for pce in iter(pc_entries):
-                pcs.append(pce)
-
-        return pcs
+        return self.generate_vnfd_entries(
+            [(os.path.join(base_path, vnf), vnf) for vnf in vnf_folders])
 
     def generate_external_vnfds(self, base_path, vnf_ids):
         vnf_folders = filter(
             lambda file: os.path.isdir(os.path.join(base_path, file)) and
             file in vnf_ids, os.listdir(base_path))
 
-        pcs = []
-        for vnf in vnf_folders:
-            pc_entries = self.generate_vnfd_entry(os.path.join(
-                base_path, vnf), vnf)
+        return self.generate_vnfd_entries(
+            [(os.path.join(base_path, vnf), vnf) for vnf in vnf_folders])
 
-            if not pc_entries or len(pc_entries) == 0:
+    def generate_vnfd_entries(self, vnf_paths):
+        """
+        Compile information for a list of VNFs.
+        With multiple workers, VNF descriptors are parsed and validated
+        by a pool of processes and their artifacts are added to the
+        package by a pool of threads. The VNFs are always registered, and
+        their entries returned, in the given order. Thus, the resulting
+        package descriptor is the same as in a serial build.
+        Remote VDU images of all VNFs are probed at once.
+
+        :param vnf_paths: list of (base_path, vnf) tuples
+        :return: The package content entries.
+        """
+        serial = self._workers <= 1 or len(vnf_paths) <= 1
+
+        # parse and validate descriptors
+        dext = self.descriptor_extension
+        if serial:
+            loaded = []
+            for base_path, vnf in vnf_paths:
+                with span('vnf', vnf=vnf):
+                    loaded.append(load_function_descriptor(
+                        base_path, dext, self._validator))
+        else:
+            # spans of worker processes are not recorded
+            with span('load_vnfds', workers=self._workers), \
+                    self.__process_pool__() as ex:
+                loaded = list(ex.map(_load_vnfd_worker,
+                                     [(self._workspace, base_path, dext)
+                                      for base_path, _ in vnf_paths]))
+
+        self.__probe_remote_images__([vnfd[1] for vnfd in loaded if vnfd])
+
+        # registration is kept serial to preserve the entries order
+        plans = []
+        for (base_path, vnf), vnfd in zip(vnf_paths, loaded):
+            if vnfd:
+                plan = self.plan_vnfd_entry(base_path, vnf, *vnfd)
+                if plan:
+                    plans.append((vnf, plan))
+
+        if self._dedupe:
+            self.__dedupe_artifacts__(plans)
+
+        # add descriptors and artifacts
+        if serial:
+            entries = [self.__add_vnf_contents__(plan) for plan in plans]
+        else:
+            with ThreadPoolExecutor(max_workers=self._workers) as ex:
+                entries = list(ex.map(propagate(self.__add_vnf_contents__),
+                                      plans))
+
+        return [pce for pce_list in entries for pce in pce_list]
+
+    def __dedupe_artifacts__(self, plans):
+        """
+        Find the planned artifacts whose content is identical to an
+        artifact planned before, in this or previous plans. They are set
+        aside, with the MD5 of their package content entries, and only
+        packaged once the package is generated, from the member of the
+        identical artifact, see __write_duplicates__().
+        Only artifacts sharing their size with another one are hashed, and
+        compared byte by byte with the artifact of the same MD5.
+        :param plans: list of (vnf, contents) tuples
+        """
+        artifacts = [(src, pce, os.path.getsize(src))
+                     for _, contents in plans
+                     for src, pce, descriptor in contents if not descriptor]
+        candidates = self._artifacts + artifacts
+        sizes = Counter(size for _, _, size in candidates)
+
+        members = dict()
+        deduped = 0
+        for src, pce, size in candidates:
+            if sizes[size] < 2 or pce["name"] in self._duplicates:
+                continue
+            with span('hash', path=src, entry=pce["name"]):
+                md5 = generate_hash(src, cache=self._hash_cache)
+            member, member_src = members.setdefault(md5, (pce["name"], src))
+            if member == pce["name"]:
                 continue
-            for pce in iter(pc_entries):
-                pcs.append(pce)
 
-        return pcs
+            with span('compare', size, entry=pce["name"]):
+                if not filecmp.cmp(src, member_src, shallow=False):
+                    log.warning("Artifacts '{}' and '{}' differ but share "
+                                "their MD5 hash".format(pce["name"], member))
+                    continue
+
+            log.debug("Artifact '{}' is identical to '{}', it will be "
+                      "copied from its member".format(pce["name"], member))
+            pce["md5"] = md5
+            self._duplicates[pce["name"]] = (src, pce, member)
+            deduped += size
+
+        self._artifacts += [a for a in artifacts
+                            if a[1]["name"] not in self._duplicates]
+        if deduped:
+            log.info("Deduplicated artifacts, {:.2f} MB copied from "
+                     "identical members".format(deduped / 1024 / 1024))
+
+    def __write_duplicates__(self):
+        """
+        Add the deduplicated artifacts to the package, sorted by name. In
+        direct mode, the compressed data of the member of the identical
+        artifact is copied within the archive, when it can be read back.
+        Otherwise the artifact is added as any other. In the working
+        directory, the file of the identical artifact is linked.
+        """
+        for name in sorted(self._duplicates):
+            src, pce, member = self._duplicates[name]
+            with span('duplicate', entry=name):
+                if not self._archive:
+                    member_path = self.__workdir_path__(member)
+                    try:
+                        os.link(member_path, self.__workdir_path__(name))
+                    except OSError:
+                        shutil.copyfile(member_path,
+                                        self.__workdir_path__(name))
+                elif not self._archive.duplicate_member(name, member):
+                    self.__write_artifact__(src, pce)
+
+    def __add_vnf_contents__(self, plan):
+        vnf, contents = plan
+        with span('vnf', vnf=vnf):
+            return self.add_contents(contents)
+
+    def __probe_remote_images__(self, vnfds):
+        """
+        Probe the remote VDU images of multiple VNFs concurrently. The
+        results are cached by the remote artifact probe.
+        :param vnfds: list of VNF descriptors
+        """
+        urls = [vdu['vm_image'] for vnfd in vnfds
+                for vdu in vnfd.get('virtual_deployment_units') or []
+                if vdu.get('vm_image') and validators.url(vdu['vm_image'])]
+        if not urls:
+            return
+
+        log.debug("Probing {} remote VDU image(s)".format(len(urls)))
+        with span('probe_remote_images', images=len(urls)):
+            reachable = self._probe.probe(urls)
+        if self._remote_md5:
+            with span('fetch_remote_images'):
+                self._probe.fetch_hashes([url for url in reachable
+                                          if reachable[url]])
+
+    def __process_pool__(self):
+        """
+        Create a pool of processes to parse and validate descriptors.
+        Each process holds its own validator.
+        """
+        return ProcessPoolExecutor(max_workers=self._workers)
 
     def generate_vnfd_entry(self, base_path, vnf):
         """
@@ -582,40 +1052,35 @@ class Packager(object):
         :param vnf: The VNF reference path
         :return: The package content entries.
         """
+        return self.generate_vnfd_entries([(base_path, vnf)]) or None
 
-        # Locate VNFD
-        vnfd_list = [file for file in os.listdir(base_path)
-                     if os.path.isfile(os.path.join(base_path, file)) and
-                     file.endswith(self._project.descriptor_extension)]
-
-        # Validate number of Yaml files
-        check = len(vnfd_list)
-        if check == 0:
-            log.warning("Missing VNF descriptor file in path '{}'. "
-                        "A descriptor with '{}' extension should be "
-                        "in this path"
-                        .format(base_path,
-                                self._project.descriptor_extension))
-            return
-
-        elif check > 1:
-            log.warning("Multiple YAML descriptors found in '{}'. "
-                        "Ignoring path.".format(os.path.basename(base_path)))
-            return
+    def plan_vnfd_entry(self, base_path, vnf, vnfd_filename, vnfd,
+                        images=None):
+        """
+        Determine the contents of a specific VNF to be added to the
+        package, i.e. its descriptor and VDU image files.
+        The VNF is registered as packaged and the artifact
+        dependencies of its remote images are added.
 
+        :param base_path: The path where the VNF file is located
+        :param vnf: The VNF reference path
+        :param vnfd_filename: The VNF descriptor file name
+        :param vnfd: The VNF descriptor content
+        :param images: if the VNF descriptor is given in memory, mapping
+                       of its local vm_image references to files or
+                       directories. The descriptor is then packaged from
+                       its content and base_path is ignored
+        :return: list of (source file, package content entry, is
+                 descriptor) tuples. The package content entries are
+                 missing their md5 field.
+        """
+        if images is None:
+            vnfd_path = os.path.join(os.path.basename(base_path),
+                                     vnfd_filename)
+            vnfd_src = os.path.join(base_path, vnfd_filename)
         else:
-            with open(os.path.join(base_path, vnfd_list[0]), 'r') as _file:
-                vnfd = yaml.load(_file)
-
-        vnfd_path = os.path.join(os.path.basename(base_path), vnfd_list[0])
-
-        # Validate VNFD
-        log.debug("Validating VNF descriptor file='{}'".format(vnfd_path))
-        if not self._validator.validate_function(os.path.join(base_path,
-                                                              vnfd_list[0])):
-            log.exception("Failed to validate VNF descriptor '{}'"
-                          .format(vnfd_path))
-            return
+            vnfd_path = vnfd_filename
+            vnfd_src = vnfd
 
         # Check if this VNF exists in the ns_vnf registry.
         # If does not, cancel its packaging
@@ -626,21 +1091,12 @@ class Packager(object):
                         .format(get_vnf_id(vnfd), vnfd_path))
             return
 
-        pce = []
-        # Create fd location
-        fd_path = os.path.join(self._workdir, "function_descriptors")
-        os.makedirs(fd_path, exist_ok=True)
-
-        # Copy the descriptor file
-        fd = os.path.join(fd_path, vnfd_list[0])
-        self.copy_descriptor_file(os.path.join(base_path, vnfd_list[0]), fd)
-
         # Generate VNFD Entry
+        contents = []
         pce_fd = dict()
-        pce_fd["content-type"] = "application/sonata.function_descriptor"
-        pce_fd["name"] = "/function_descriptors/{}".format(vnfd_list[0])
-        pce_fd["md5"] = generate_hash(fd)
-        pce.append(pce_fd)
+        pce_fd["content-type"] = CT_FUNCTION_DESCRIPTOR
+        pce_fd["name"] = "/function_descriptors/{}".format(vnfd_filename)
+        contents.append((vnfd_src, pce_fd, True))
 
         if 'virtual_deployment_units' in vnfd:
             vdu_list = [vdu for vdu in vnfd['virtual_deployment_units']
@@ -653,11 +1109,8 @@ class Packager(object):
                 vdu_image_path = vdu['vm_image']
 
                 if validators.url(vdu_image_path):  # Check if is URL/URI.
-                    try:
-                        # Check if the image URL exists with a short Timeout
-                        requests.head(vdu_image_path, timeout=1)
-
-                    except (requests.Timeout, requests.ConnectionError):
+                    # Check if the image URL exists (probed beforehand)
+                    if not self._probe.exists(vdu_image_path):
                         log.warning("Failed to verify the "
                                     "existence of vm_image '{}'"
                                     .format(vdu['vm_image']))
@@ -668,11 +1121,14 @@ class Packager(object):
                         vendor=vnfd['vendor'],
                         version=vnfd['version'],
                         url=vdu['vm_image'],
-                        md5='02236f2ae558018ed14b5222ef1bd9f1')
-                    # TODO: remote url must provide md5? This is dummy!
+                        md5=self.__remote_image_md5__(vdu_image_path))
 
                     continue
 
+                elif images is not None:  # given local file or dir
+                    bd = images.get(vdu_image_path, '')
+                    img_base, img_file = os.path.split(bd)
+
                 else:  # Check for URL local (e.g. file:///...)
                     ptokens = pathlib.Path(vdu_image_path).parts
                     if ptokens[0] == 'file:':  # URL to local file
@@ -680,12 +1136,13 @@ class Packager(object):
 
                     else:  # regular filename/path
                         bd = os.path.join(base_path, vdu['vm_image'])
+                    img_base, img_file = base_path, vdu['vm_image']
 
-                if os.path.exists(bd):  # local File or local Dir
+                if bd and os.path.exists(bd):  # local File or local Dir
 
                     if os.path.isfile(bd):
-                        pce.append(self.__pce_img_gen__(
-                            base_path, vnf, vdu, vdu['vm_image'],
+                        contents.append(self.__pce_img_gen__(
+                            img_base, vnf, vdu, img_file,
                             dir_p='', dir_o=''))
 
                     elif os.path.isdir(bd):
@@ -695,7 +1152,7 @@ class Packager(object):
                             for f in files:
                                 if dir_o.startswith(os.path.sep):
                                     dir_o = dir_o[1:]
-                                pce.append(self.__pce_img_gen__(
+                                contents.append(self.__pce_img_gen__(
                                     root, vnf, vdu, f,
                                     dir_p=dir_p, dir_o=dir_o))
 
@@ -703,8 +1160,166 @@ class Packager(object):
                     log.debug("Referenced vm_image is docker '{}'"
                               .format(vdu['vm_image']))
 
+        return contents
+
+    def __remote_image_md5__(self, url):
+        """
+        Obtain the MD5 of a remote image. Unless enabled, remote images are
+        not downloaded and a placeholder MD5 is used.
+        """
+        if self._remote_md5 and self._probe.exists(url):
+            md5 = self._probe.fetch_hash(url)
+            if md5:
+                return md5
+            log.warning("Unable to compute the MD5 of vm_image '{}'. "
+                        "Using a placeholder.".format(url))
+
+        # TODO: remote url must provide md5? This is dummy!
+        return DUMMY_MD5
+
+    def add_contents(self, contents):
+        """
+        Add the planned contents to the package.
+        :param contents: list of (source file, package content entry, is
+                         descriptor) tuples
+        :return: The package content entries, with their md5 field.
+        """
+        pce = []
+        for src, entry, descriptor in contents:
+            if not descriptor and entry["name"] in self._duplicates:
+                # deduplicated artifact, packaged once generated
+                pce.append(entry)
+                continue
+            entry["md5"] = self.add_descriptor(src, entry) \
+                if descriptor else self.add_artifact(src, entry)
+            pce.append(entry)
+
         return pce
 
+    def add_descriptor(self, src_descriptor, pce):
+        """
+        Add a descriptor file to the package, at the location given by its
+        package content entry.
+        :param src_descriptor: path of the descriptor file
+        :param pce: package content entry of the descriptor
+        :return: MD5 hash of the packaged descriptor, None if it will only
+                 be added when the package is generated
+        """
+        if self._pending is not None:
+            self._pending.append((src_descriptor, pce, True))
+            return
+
+        return self.__write_descriptor__(src_descriptor, pce)
+
+    def add_artifact(self, src, pce):
+        """
+        Add an artifact file (e.g. a VDU image) to the package, at the
+        location given by its package content entry.
+        :param src: path of the artifact file
+        :param pce: package content entry of the artifact
+        :return: MD5 hash of the artifact, None if it will only be added
+                 when the package is generated
+        """
+        if self._pending is not None:
+            self._pending.append((src, pce, False))
+            return
+
+        return self.__write_artifact__(src, pce)
+
+    def __write_pending__(self):
+        """
+        Write the collected contents to the package archive, sorted by
+        name, and set the md5 of their package content entries.
+        """
+        for src, pce, descriptor in sorted(self._pending,
+                                           key=lambda c: c[1]["name"]):
+            pce["md5"] = self.__write_descriptor__(src, pce) \
+                if descriptor else self.__write_artifact__(src, pce)
+        self._pending = []
+
+    def __write_descriptor__(self, src_descriptor, pce):
+        if self._archive:
+            # descriptors given in memory are not read from a file
+            path = src_descriptor if isinstance(src_descriptor, str) \
+                else None
+            with span('descriptor', path=path, entry=pce["name"]):
+                data = self.dump_descriptor_file(src_descriptor)
+                md5 = hashlib.md5(data).hexdigest()
+            if self.__reuse_previous__(pce, md5):
+                return md5
+
+            with span('zip', len(data), entry=pce["name"]):
+                return self._archive.write_bytes(pce["name"], data,
+                                                 pce["content-type"])
+
+        with span('descriptor', path=src_descriptor, entry=pce["name"]):
+            return self.copy_descriptor_file(
+                src_descriptor, self.__workdir_path__(pce["name"]))
+
+    def __write_artifact__(self, src, pce):
+        # only hash beforehand if the previous package has the entry
+        if self._previous and self._previous.has_entry(pce["name"]):
+            with span('hash', path=src, entry=pce["name"]):
+                md5 = generate_hash(src, cache=self._hash_cache)
+            if self.__reuse_previous__(pce, md5):
+                return md5
+
+        if self._archive:
+            with span('zip', path=src, entry=pce["name"]):
+                return self._archive.write_file(
+                    pce["name"], src, pce["content-type"],
+                    cache=self._hash_cache)
+
+        # copy (or link) and hash the artifact in a single pass
+        with span('copy', path=src, entry=pce["name"],
+                  mode=self._copy_mode):
+            return copy_hash(src, self.__workdir_path__(pce["name"]),
+                             mode=self._copy_mode, cache=self._hash_cache)
+
+    def __reuse_previous__(self, pce, md5):
+        """
+        Copy the member of a package content entry from the previous
+        package, if its content is unchanged.
+        :return: True if the member was copied
+        """
+        if not self._previous:
+            return False
+
+        zinfo = self._previous.lookup(pce["name"], md5)
+        if not zinfo:
+            return False
+
+        with span('reuse', zinfo.compress_size, entry=pce["name"]):
+            self._archive.copy_member(self._previous, zinfo)
+        self._reused.append(pce["name"])
+        return True
+
+    def __workdir_path__(self, name):
+        """
+        Obtain the workdir path of a package content entry name, creating
+        its parent directories.
+        """
+        path = os.path.join(self._workdir, *name.strip('/').split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    @staticmethod
+    def dump_descriptor_file(src_descriptor):
+        """
+        Parse a descriptor file and serialize its digested content.
+        :param src_descriptor: path of the descriptor file, or its
+                               (already parsed) content
+        :return: serialized descriptor (bytes)
+        """
+        if isinstance(src_descriptor, dict):
+            vnf_content = src_descriptor
+        else:
+            with open(src_descriptor, "r") as vnfd_file:
+                vnf_content = yaml.load(vnfd_file)
+
+        return yaml.dump(vnf_content, default_flow_style=False)\
+            .encode('utf-8')
+
     @staticmethod
     def copy_descriptor_file(src_descriptor, dst_descriptor):
         """
@@ -713,13 +1328,14 @@ class Packager(object):
         a new file and writes in it the digested content.
         :param src_descriptor:
         :param dst_descriptor:
-        :return:
+        :return: MD5 hash of the written descriptor file
         """
-        with open(src_descriptor, "r") as vnfd_file:
-            vnf_content = yaml.load(vnfd_file)
+        # hash the written content, instead of reading the file back
+        data = Packager.dump_descriptor_file(src_descriptor)
+        with open(dst_descriptor, "wb") as vnfd_file:
+            vnfd_file.write(data)
 
-        with open(dst_descriptor, "w") as vnfd_file:
-            vnfd_file.write(yaml.dump(vnf_content, default_flow_style=False))
+        return hashlib.md5(data).hexdigest()
 
     def __pce_img_gen__(self, bd, vnf, vdu, f, dir_p='', dir_o=''):
         pce = dict()
@@ -729,23 +1345,21 @@ class Packager(object):
 
         pce["content-type"] = "application/sonata.{}_files".format(img_format)
         pce["name"] = "/{}_files/{}{}/{}".format(img_format, vnf, dir_p, f)
-        pce["md5"] = self.__pce_img_gen_fc__(img_format, vnf, f, bd, dir_o)
-
-        return pce
 
-    def __pce_img_gen_fc__(self, img_format, vnf, f, root, dir_o=''):
-        fd_path = os.path.join("{}_files".format(img_format), vnf, dir_o)
-        fd_path = os.path.join(self._workdir, fd_path)
-        os.makedirs(fd_path, exist_ok=True)
-        fd = os.path.join(fd_path, f)
-        shutil.copyfile(os.path.join(root, f), fd)
-        return generate_hash(fd)
+        return os.path.join(bd, f), pce, False
 
-    def generate_package(self, name):
+    @performance
+    def generate_package(self, name, output=None):
         """
         Generate the final package version.
         :param name: The name of the final version of the package,
         the project name will be used if no name provided
+        :param output: path of the package file, by default the package
+                       name in the destination path. Packages of in-memory
+                       descriptors can also be written to a writable
+                       file-like object, not necessarily seekable
+        :return: path of the generated package file (or the given
+                 file-like object), None if unsuccessful
         """
 
         # Validate all needed information
@@ -755,12 +1369,121 @@ class Packager(object):
             exit(1)
 
         if not name:
-            name = self._package_descriptor['vendor'] + "." + \
-                self._package_descriptor['name'] + "." + \
-                self._package_descriptor['version']
+            name = get_package_name(self._package_descriptor)
 
         # Generate package file
-        zip_name = os.path.join(self._dst_path, name + '.son')
+        stream = output is not None and not isinstance(output, str)
+        if stream and self._nsd is None:
+            raise ValueError("Only packages of in-memory descriptors can be "
+                             "written to a file-like object")
+        zip_name = output if output and not stream else \
+            os.path.join(self._dst_path, name + '.son')
+
+        if self._nsd is not None and not self._archive:
+            # in-memory descriptors, the contents are written now
+            self.__open_output__(output if stream else zip_name)
+
+        if self._archive:
+            if self._pending:
+                self.__write_pending__()
+            self.__write_duplicates__()
+
+            # the manifest is written last, from the collected entries
+            manifest = yaml.dump(self._package_descriptor,
+                                 default_flow_style=False).encode('utf-8')
+            with span('zip', len(manifest), entry=MANIFEST_NAME):
+                self._archive.write_bytes(MANIFEST_NAME, manifest,
+                                          CT_PACKAGE_DESCRIPTOR)
+                self._archive.close()
+            members = self._archive.members
+            if self._previous:
+                self._previous.close()
+                log.info("Reused {} of {} entries from previous package "
+                         "'{}'{}".format(
+                             len(self._reused),
+                             len(self._package_descriptor['package_content']),
+                             self._previous.filename,
+                             ''.join('\n  - ' + name
+                                     for name in self._reused)))
+            if stream:
+                # the package cannot be read back, only its state is
+                if not self.__validate_package__(None, members):
+                    return
+                log.info("Package generated successfully.")
+                return output
+            os.replace(self._archive.filename, zip_name)
+        else:
+            self.__write_duplicates__()
+            with span('zip_workdir', path=zip_name):
+                members = self.__zip_workdir__(zip_name)
+
+        # Validate PD
+        if not self.__validate_package__(zip_name, members):
+            return
+
+        with span('hash', path=zip_name, entry=zip_name):
+            package_md5 = generate_hash(zip_name, cache=self._hash_cache)
+        log.info("Package generated successfully.\nFile: {}\nMD5: {}\n"
+                 .format(os.path.abspath(zip_name), package_md5))
+        return zip_name
+
+    def __open_output__(self, output):
+        """
+        Create the package archive of in-memory descriptors.
+        :param output: path of the package file or file-like object
+        """
+        if not isinstance(output, str):
+            self._archive = self.__package_archive__(output)
+            return
+
+        # partial archive, renamed once the package is generated
+        dst = os.path.dirname(output)
+        if dst and not os.path.isdir(dst):
+            os.makedirs(dst)
+        self._archive = self.__package_archive__(
+            os.path.join(dst, self._workdir + '.son'))
+        atexit.register(self.__remove_archive__)
+
+    def __validate_package__(self, zip_name, members):
+        """
+        Validate the generated package. The package descriptor and the
+        members written (with their CRCs) are handed to the validator,
+        instead of reading the package back and hashing its contents
+        again.
+        :param zip_name: path of the package file, None if written to a
+                         file-like object
+        :param members: metadata (ZipInfo) of the members written
+        :return: True if valid, None otherwise
+        """
+        log.debug("Validating Package")
+        with span('validate_package', path=zip_name):
+            valid = self._validator.validate_generated_package(
+                self._package_descriptor, members, package=zip_name)
+        if not valid:
+            log.debug("Failed to validate Package Descriptor. "
+                      "Aborting package creation.")
+            self._package_descriptor = None
+            return
+        return True
+
+    def cleanup(self):
+        """
+        Remove the temporary files of this packager, i.e. its working
+        directory or partial package archive. Otherwise, they are only
+        removed on exit.
+        """
+        if os.path.isdir(self._workdir):
+            shutil.rmtree(self._workdir, ignore_errors=True)
+        self.__remove_archive__()
+
+    def __zip_workdir__(self, zip_name):
+        """
+        Create the package file from the contents of the working directory.
+        :return: metadata (ZipInfo) of the members written
+        """
+        if self._reproducible or self._level is not None or self._levels:
+            return self.__zip_workdir_compressed__(zip_name)
+
         with closing(zipfile.ZipFile(zip_name, 'w')) as pck:
             for base, dirs, files in os.walk(self._workdir):
                 for file_name in files:
@@ -770,18 +1493,35 @@ class Packager(object):
 
                     if not full_path == zip_name:
                         pck.write(full_path, relative_path)
+        return pck.infolist()
 
-        # Validate PD
-        log.debug("Validating Package")
-        if not self._validator.validate_package(zip_name):
-            log.debug("Failed to validate Package Descriptor. "
-                      "Aborting package creation.")
-            self._package_descriptor = None
-            return
-
-        package_md5 = generate_hash(zip_name)
-        log.info("Package generated successfully.\nFile: {}\nMD5: {}\n"
-                 .format(os.path.abspath(zip_name), package_md5))
+    def __zip_workdir_compressed__(self, zip_name):
+        """
+        Create the package file from the contents of the working directory,
+        compressed according to their content type. Reproducible packages
+        have their entries sorted by name, with the manifest last.
+        :return: metadata (ZipInfo) of the members written
+        """
+        pcs = self._package_descriptor['package_content']
+        content_types = {pce['name'].lstrip('/'): pce['content-type']
+                         for pce in pcs}
+        content_types[MANIFEST_NAME] = CT_PACKAGE_DESCRIPTOR
+
+        files = []
+        for base, dirs, names in os.walk(self._workdir):
+            for file_name in names:
+                full_path = os.path.join(base, file_name)
+                relative_path = \
+                    full_path[len(self._workdir) + len(os.sep):]
+                files.append((relative_path.replace(os.sep, '/'), full_path))
+
+        if self._reproducible:
+            files.sort(key=lambda f: (f[0] == MANIFEST_NAME, f[0]))
+
+        with self.__package_archive__(zip_name) as pck:
+            for name, full_path in files:
+                pck.write_file(name, full_path, content_types.get(name))
+        return pck.members
 
     def register_ns_vnf(self, vnf_id):
         """
@@ -891,6 +1631,84 @@ class Packager(object):
         self._sealed = False
 
 
+def load_function_descriptor(base_path, descriptor_extension, validator):
+    """
+    Locate, load and validate the function descriptor of a VNF folder.
+    :param base_path: The path where the VNF file is located
+    :param descriptor_extension: extension of descriptor files
+    :param validator: Validator object
+    :return: tuple (descriptor filename, descriptor content),
+             None if unsuccessful
+    """
+    # Locate VNFD
+    vnfd_list = [file for file in os.listdir(base_path)
+                 if os.path.isfile(os.path.join(base_path, file)) and
+                 file.endswith(descriptor_extension)]
+
+    # Validate number of Yaml files
+    check = len(vnfd_list)
+    if check == 0:
+        log.warning("Missing VNF descriptor file in path '{}'. "
+                    "A descriptor with '{}' extension should be "
+                    "in this path"
+                    .format(base_path, descriptor_extension))
+        return
+
+    elif check > 1:
+        log.warning("Multiple YAML descriptors found in '{}'. "
+                    "Ignoring path.".format(os.path.basename(base_path)))
+        return
+
+    else:
+        vnfd_file = os.path.join(base_path, vnfd_list[0])
+        with span('parse', path=vnfd_file), open(vnfd_file, 'r') as _file:
+            vnfd = yaml.load(_file)
+
+    vnfd_path = os.path.join(os.path.basename(base_path), vnfd_list[0])
+
+    # Validate VNFD
+    log.debug("Validating VNF descriptor file='{}'".format(vnfd_path))
+    with span('validate', path=vnfd_file):
+        valid = validator.validate_function(vnfd_file)
+    if not valid:
+        log.exception("Failed to validate VNF descriptor '{}'"
+                      .format(vnfd_path))
+        return
+
+    return vnfd_list[0], vnfd
+
+
+# Validator of a packaging worker process, created on first use
+_worker_validator = None
+
+
+def _get_worker_validator(workspace):
+    global _worker_validator
+    if not _worker_validator:
+        _worker_validator = Validator(workspace=workspace)
+        _worker_validator.configure(syntax=True, integrity=False,
+                                    topology=False)
+    return _worker_validator
+
+
+def _validate_function_worker(args):
+    workspace, vnfd_filename = args
+    return _get_worker_validator(workspace).validate_function(vnfd_filename)
+
+
+def _load_vnfd_worker(args):
+    workspace, base_path, descriptor_extension = args
+    return load_function_descriptor(base_path, descriptor_extension,
+                                    _get_worker_validator(workspace))
+
+
+def get_package_name(gds):
+    """
+    Obtain the default package name, from its general description.
+    """
+    return gds['vendor'] + "." + gds['name'] + "." + gds['version']
+
+
 def get_vnf_id(vnfd):
     return get_vnf_id_full(vnfd['vendor'], vnfd['name'], vnfd['version'])
 
@@ -916,6 +1734,47 @@ def __validate_directory__(paths):
     return True
 
 
+def __previous_package__(args, gds):
+    """
+    Obtain the previous package of an incremental build.
+    :param args: parsed arguments
+    :param gds: general description of the package being generated
+    """
+    if args.incremental is not True:
+        return args.incremental
+
+    try:
+        name = args.name if args.name else get_package_name(gds)
+    except (KeyError, TypeError):
+        log.warning("Unable to determine the previous package name. "
+                    "Generating a full package.")
+        return
+
+    return os.path.join(args.destination if args.destination else '.',
+                        name + '.son')
+
+
+def __compress_levels__(values):
+    """
+    Parse the compression levels of the command line arguments.
+    :param values: list of '[CONTENT_TYPE=]LEVEL' strings
+    :return: (default level, dictionary of levels by content type), None
+             if not specified
+    """
+    level = None
+    levels = dict()
+    for value in values or []:
+        content_type, _, lvl = value.rpartition('=')
+        if not lvl.isdigit() or int(lvl) > 9:
+            log.error("Invalid compression level '{}'".format(value))
+            exit(1)
+        if content_type:
+            levels[content_type] = int(lvl)
+        else:
+            level = int(lvl)
+    return level, levels if levels else None
+
+
 def main():
     import argparse
 
@@ -948,6 +1807,28 @@ def main():
         action="store_true",
         required=False
     )
+
+    exclusive_parser.add_argument(
+        "--batch",
+        dest="batch",
+        metavar="DIR|LIST",
+        help="Create the packages of multiple projects of the same "
+             "workspace: the projects in the specified directory, or "
+             "listed (one per line) in the specified file. Projects are "
+             "packaged concurrently according to '--workers' and a "
+             "summary is printed at the end.",
+        required=False
+    )
+
+    exclusive_parser.add_argument(
+        "--inspect",
+        dest="inspect",
+        metavar="PACKAGE",
+        help="Show the general description and the contents of an "
+             "existing package (sizes, compression and MD5 hashes), "
+             "without extracting it",
+        required=False
+    )
     parser.add_argument(
         "--service",
         dest="service",
@@ -976,8 +1857,112 @@ def main():
         help="create the package with the specific name",
         required=False)
 
+    parser.add_argument(
+        "--direct",
+        dest="direct",
+        action="store_true",
+        help="stream the package contents directly into the package file, "
+             "instead of assembling them in a temporary directory",
+        required=False)
+
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="number of VNFs processed concurrently. VNF descriptors are "
+             "validated by a pool of processes and their artifacts are "
+             "packaged by a pool of threads. With '--batch', number of "
+             "projects packaged concurrently. Default: 1",
+        required=False)
+
+    parser.add_argument(
+        "--incremental",
+        dest="incremental",
+        nargs='?',
+        const=True,
+        metavar="PREVIOUS",
+        help="reuse the unchanged contents of a previously generated "
+             "package, copying them without recompression. If PREVIOUS "
+             "is not specified, the package being generated is used. "
+             "Implies '--direct'",
+        required=False)
+
+    parser.add_argument(
+        "--reproducible",
+        dest="reproducible",
+        action="store_true",
+        help="generate a reproducible package: the same contents always "
+             "result in the same package file (and MD5). Entries are "
+             "sorted, with fixed timestamps and permissions",
+        required=False)
+
+    parser.add_argument(
+        "--remote-md5",
+        dest="remote_md5",
+        action="store_true",
+        help="download the VDU images referenced by URL to compute their "
+             "MD5 for the artifact dependencies section. By default, a "
+             "placeholder MD5 is used",
+        required=False)
+
+    parser.add_argument(
+        "--copy-mode",
+        dest="copy_mode",
+        choices=COPY_MODES,
+        default=COPY,
+        help="how VDU image artifacts are placed in the package working "
+             "directory. 'hardlink' and 'reflink' avoid copying the image "
+             "data and fall back to 'copy' if not supported by the "
+             "filesystem. Default: '{}'".format(COPY),
+        required=False)
+
+    parser.add_argument(
+        "--compress-level",
+        dest="compress_level",
+        action="append",
+        metavar="[CONTENT_TYPE=]LEVEL",
+        help="compression level (0-9) of the package contents of the "
+             "given content type, e.g. "
+             "'application/sonata.qcow2_files=1'. Level 0 stores the "
+             "contents uncompressed. Without content type, level of all "
+             "the remaining compressed contents. May be repeated. "
+             "Large contents are compressed in parallel according to "
+             "'--workers'. Without '--direct', contents are only "
+             "compressed if a level is specified",
+        required=False)
+
+    parser.add_argument(
+        "--dedupe",
+        dest="dedupe",
+        action="store_true",
+        help="read and compress identical artifacts (e.g. VDU images "
+             "shared by multiple VNFs) only once. Repeated artifacts are "
+             "still packaged, their members copied from the member of the "
+             "first one",
+        required=False)
+
+    parser.add_argument(
+        "--perf-report",
+        dest="perf_report",
+        metavar="FILE",
+        help="write a JSON performance report of the packaging stages "
+             "(parsing, validation, copy, hashing, compression, ...) to "
+             "the specified file, with their durations, bytes processed "
+             "and throughput",
+        required=False)
+
     args = parser.parse_args()
 
+    if args.inspect:
+        try:
+            print(inspect_package(args.inspect))
+        except (OSError, zipfile.BadZipFile, KeyError, yaml.YAMLError) as e:
+            log.error("Unable to inspect package '{}': {}"
+                      .format(args.inspect, e))
+            exit(1)
+        return
+
     if args.workspace:
         ws_root = args.workspace
     else:
@@ -986,9 +1971,50 @@ def main():
     # Obtain Workspace object
     workspace = Workspace.__create_from_descriptor__(ws_root)
 
+    with ExitStack() as stack:
+        if args.perf_report:
+            report = PerfReport()
+            # written once the report is no longer active, even on failure
+            stack.callback(report.write, args.perf_report)
+            stack.enter_context(report.activate())
+
+        __generate__(args, workspace, ws_root)
+
+
+def __generate__(args, workspace, ws_root):
+    """
+    Generate the package(s) requested by the command line arguments.
+    """
     prj_root = args.project if args.project else os.getcwd()
+    level, levels = __compress_levels__(args.compress_level)
+    options = PackageOptions(copy_mode=args.copy_mode, direct=args.direct,
+                             workers=args.workers,
+                             incremental=args.incremental is True,
+                             reproducible=args.reproducible,
+                             remote_md5=args.remote_md5, dedupe=args.dedupe,
+                             level=level, levels=levels)
+
+    if args.batch:
+        from son.package.batch import BatchPackager, list_projects, summary
+
+        if args.name or args.incremental not in (None, True):
+            log.error("The arguments '--name' and '--incremental PREVIOUS' "
+                      "are not applicable to batch packaging.")
+            exit(1)
+
+        projects = list_projects(args.batch)
+        if not projects:
+            log.error("No projects found in '{}'".format(args.batch))
+            exit(1)
+
+        batch = BatchPackager(workspace, dst_path=args.destination,
+                              options=options)
+        results = batch.package_all(projects)
+        print(summary(results))
+        if not all(r.success for r in results):
+            exit(1)
 
-    if args.project:
+    elif args.project:
 
         # Validate given arguments
         path_ids = dict()
@@ -999,7 +2025,10 @@ def main():
 
         project = Project.__create_from_descriptor__(workspace, prj_root)
 
-        pck = Packager(workspace, project=project, dst_path=args.destination)
+        previous = __previous_package__(
+            args, project.project_config.get('package'))
+        pck = Packager(workspace, project=project, dst_path=args.destination,
+                       options=options, previous=previous)
         pck.generate_package(args.name)
 
     elif args.custom:
@@ -1010,5 +2039,7 @@ def main():
             exit(1)
 
         pck = Packager(workspace, services=args.service,
-                       functions=args.function, dst_path=args.destination)
+                       functions=args.function, dst_path=args.destination,
+                       options=options,
+                       previous=__previous_package__(args, CUSTOM_PACKAGE))
         pck.generate_package(args.name)
@@ -0,0 +1,263 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+"""
+Structured performance report of the packaging stages.
+
+A report is a tree of spans. Each span measures the duration of a stage
+and, optionally, the number of bytes it processed. Spans are opened with
+span() and nest according to the calling thread: a span is a child of
+the innermost span open in the same thread. Spans are only recorded while
+a report is active (see PerfReport.activate), otherwise span() has no
+effect. Callables dispatched to thread pools are wrapped with
+propagate(), so that their spans are children of the dispatching span.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class Span(object):
+
+    def __init__(self, name, parent=None, size=None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.children = []
+        self.start = time.perf_counter()
+        self.end = None
+        self._bytes = size or 0
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    @property
+    def bytes(self):
+        """
+        Bytes processed by this span and all its children.
+        """
+        with self._lock:
+            children = list(self.children)
+        return self._bytes + sum(child.bytes for child in children)
+
+    def add_bytes(self, size):
+        with self._lock:
+            self._bytes += size
+
+    def child(self, name, size=None, **attributes):
+        span = Span(name, parent=self, size=size, **attributes)
+        with self._lock:
+            self.children.append(span)
+        return span
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    def to_dict(self, origin=None):
+        """
+        Serialize the span tree.
+        :param origin: start time of the report, span start times are
+                       relative to it
+        :return: dictionary
+        """
+        origin = self.start if origin is None else origin
+        size = self.bytes
+        span = dict(name=self.name,
+                    start=round(self.start - origin, 6),
+                    duration=round(self.duration, 6))
+        if self.attributes:
+            span['attributes'] = self.attributes
+        if size:
+            span['bytes'] = size
+            span['mb_per_s'] = throughput(size, self.duration)
+        if self.children:
+            span['children'] = [child.to_dict(origin)
+                                for child in self.children]
+        return span
+
+
+class _NullSpan(object):
+    """
+    Span returned when no report is active. Discards everything.
+    """
+
+    def add_bytes(self, size):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class PerfReport(object):
+    """
+    Performance report of a packaging run.
+    """
+
+    def __init__(self, name='son-package'):
+        self._root = Span(name)
+
+    @property
+    def root(self):
+        return self._root
+
+    @contextmanager
+    def activate(self):
+        """
+        Record the spans opened by the calling thread (and propagated to
+        other threads) in this report, until the context exits.
+        """
+        _push(self._root)
+        try:
+            yield self
+        finally:
+            _pop()
+            self._root.finish()
+
+    def stages(self):
+        """
+        Aggregate the spans by name. Durations are cumulative, i.e. spans
+        running concurrently in multiple threads are summed.
+        :return: dictionary mapping each span name to its count,
+                 duration, bytes and throughput
+        """
+        stages = dict()
+        pending = list(self._root.children)
+        while pending:
+            span = pending.pop()
+            pending.extend(span.children)
+            stage = stages.setdefault(span.name,
+                                      dict(count=0, duration=0, bytes=0))
+            stage['count'] += 1
+            stage['duration'] += span.duration
+            stage['bytes'] += span.bytes
+
+        for stage in stages.values():
+            stage['duration'] = round(stage['duration'], 6)
+            stage['mb_per_s'] = throughput(stage['bytes'], stage['duration'])
+        return stages
+
+    def to_dict(self):
+        return dict(report=self._root.to_dict(), stages=self.stages())
+
+    def write(self, filename):
+        """
+        Write the report to a JSON file.
+        :param filename: path of the report file
+        """
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+        log.info("Performance report written to '{}'".format(filename))
+
+
+@contextmanager
+def span(name, size=None, path=None, **attributes):
+    """
+    Measure a stage as a child of the current span of the calling thread.
+    :param name: name of the stage
+    :param size: number of bytes processed by the stage, more can be added
+                 with add_bytes() of the yielded span
+    :param path: file processed by the stage, its size is added to the
+                 bytes processed once the stage completes. The file is
+                 not accessed if no report is active
+    :param attributes: additional information of the stage, e.g. the
+                       name of the VNF being processed
+    :return: the new span, or a span that records nothing if no report
+             is active
+    """
+    parent = current_span()
+    if parent is None:
+        yield NULL_SPAN
+        return
+
+    child = parent.child(name, size=size, **attributes)
+    _push(child)
+    try:
+        yield child
+    finally:
+        _pop()
+        child.finish()
+        if path is not None and os.path.isfile(path):
+            child.add_bytes(os.path.getsize(path))
+
+
+def current_span():
+    """
+    Obtain the innermost span open in the calling thread.
+    :return: Span object, None if no report is active
+    """
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def propagate(func):
+    """
+    Wrap a callable to be executed in another thread, so that its spans
+    are children of the current span of the calling thread.
+    :param func: callable
+    :return: wrapped callable
+    """
+    parent = current_span()
+    if parent is None:
+        return func
+
+    def wrapper(*args, **kwargs):
+        _push(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _pop()
+
+    return wrapper
+
+
+def throughput(size, duration):
+    """
+    Obtain the throughput, in MB/s, of processing a number of bytes.
+    """
+    if not duration:
+        return None
+    return round(size / duration / 1024 / 1024, 3)
+
+
+def _push(span):
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    _local.stack.append(span)
+
+
+def _pop():
+    _local.stack.pop()
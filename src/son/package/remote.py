@@ -0,0 +1,198 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import hashlib
+import logging
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from son.package.md5 import MAX_CHUNK_SIZE
+
+log = logging.getLogger(__name__)
+
+
+class RemoteArtifactProbe(object):
+    """
+    Probe of remote artifacts, e.g. VDU images referenced by URL.
+    Multiple URLs are resolved concurrently over a pooled HTTP session.
+    Results are kept for a limited time (TTL), so that the same URL is
+    not probed again by the packager and the validator.
+    """
+
+    DEFAULT_TTL = 300
+    DEFAULT_TIMEOUT = 1
+    DEFAULT_DOWNLOAD_TIMEOUT = 30
+    DEFAULT_WORKERS = 8
+
+    def __init__(self, ttl=DEFAULT_TTL, timeout=DEFAULT_TIMEOUT,
+                 download_timeout=DEFAULT_DOWNLOAD_TIMEOUT,
+                 workers=DEFAULT_WORKERS):
+        """
+        Initialize the probe.
+        :param ttl: time (seconds) to keep probe results
+        :param timeout: timeout (seconds) of probe requests
+        :param download_timeout: timeout (seconds) of download requests,
+                                 while waiting for data
+        :param workers: maximum number of concurrent requests
+        """
+        self._ttl = ttl
+        self._timeout = timeout
+        self._download_timeout = download_timeout
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._results = dict()
+        self._hashes = dict()
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def probe(self, urls):
+        """
+        Verify the existence of multiple remote artifacts, concurrently.
+        :param urls: list of URLs
+        :return: dictionary mapping each URL to True if reachable,
+                 False otherwise
+        """
+        return self.__resolve__(urls, self._results, self.__head__)
+
+    def exists(self, url):
+        """
+        Verify the existence of a remote artifact.
+        :param url: URL of the artifact
+        :return: True if reachable, False otherwise
+        """
+        return self.probe([url])[url]
+
+    def fetch_hashes(self, urls):
+        """
+        Download multiple remote artifacts, concurrently, and compute
+        their MD5 hashes. Contents are streamed and never stored.
+        :param urls: list of URLs
+        :return: dictionary mapping each URL to its MD5 hex digest,
+                 None if the artifact could not be downloaded
+        """
+        return self.__resolve__(urls, self._hashes, self.__download_hash__)
+
+    def fetch_hash(self, url):
+        """
+        Download a remote artifact and compute its MD5 hash.
+        :param url: URL of the artifact
+        :return: MD5 hex digest, None if it could not be downloaded
+        """
+        return self.fetch_hashes([url])[url]
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._hashes.clear()
+
+    def __resolve__(self, urls, results, func):
+        """
+        Obtain the results of multiple URLs from the given cache,
+        resolving the missing or expired ones concurrently.
+        """
+        now = time.time()
+        resolved = dict()
+        with self._lock:
+            for url in urls:
+                entry = results.get(url)
+                if entry and now - entry[0] < self._ttl:
+                    resolved[url] = entry[1]
+
+        missing = [url for url in set(urls) if url not in resolved]
+        if len(missing) == 1:
+            values = [func(missing[0])]
+        elif missing:
+            with ThreadPoolExecutor(
+                    max_workers=min(self._workers, len(missing))) as ex:
+                values = list(ex.map(func, missing))
+        else:
+            values = []
+
+        with self._lock:
+            for url, value in zip(missing, values):
+                results[url] = (now, value)
+                resolved[url] = value
+
+        return resolved
+
+    def __head__(self, url):
+        try:
+            self._session.head(url, timeout=self._timeout)
+            return True
+
+        except (requests.Timeout, requests.ConnectionError):
+            log.debug("Failed to reach remote artifact '{}'".format(url))
+            return False
+
+    def __download_hash__(self, url):
+        log.debug("Downloading remote artifact '{}' to compute its MD5"
+                  .format(url))
+        hash = hashlib.md5()
+        try:
+            response = self._session.get(url, stream=True,
+                                         timeout=self._download_timeout)
+            try:
+                response.raise_for_status()
+                for chunk in response.iter_content(MAX_CHUNK_SIZE):
+                    hash.update(chunk)
+            finally:
+                response.close()
+
+        except requests.RequestException as e:
+            log.warning("Failed to download remote artifact '{}': {}"
+                        .format(url, e))
+            return
+
+        return hash.hexdigest()
+
+
+class ProbeManager(object):
+
+    def __init__(self):
+        self._probe = None
+        self._lock = threading.Lock()
+
+    def get_probe(self):
+        with self._lock:
+            if not self._probe:
+                self._probe = RemoteArtifactProbe()
+            return self._probe
+
+
+RemoteArtifactProbe.manager = ProbeManager()
+
+
+def get_probe():
+    """
+    Obtain the remote artifact probe shared by all callers in the process.
+    :return: RemoteArtifactProbe object
+    """
+    return RemoteArtifactProbe.manager.get_probe()
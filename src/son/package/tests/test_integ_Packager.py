@@ -24,8 +24,20 @@
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.sonata-nfv.eu).
 
+import copy
+import hashlib
+import io
+import os
+import shutil
+import tempfile
 import unittest
-from son.package.package import Packager
+import yaml
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from son.package.package import Packager, PackageOptions
+from son.package.archive import PackageArchive
+from son.package.batch import BatchPackager, BatchResult, summary
 from son.workspace.workspace import Workspace
 from son.workspace.workspace import Project
 
@@ -65,3 +77,341 @@ class IntPDTester(unittest.TestCase):
         pfd.pop('package')
         gsd = self.pck.package_gds(pfd)
         self.assertEqual(gsd, None)
+
+
+class IntProjectPackagingTester(unittest.TestCase):
+
+    NUM_VNFS = 4
+
+    __pfd__ = {
+        'version': '0.5',
+        'package': {
+            'version': '0.1',
+            'name': 'sonata-parallel-sample',
+            'vendor': 'eu.sonata',
+            'maintainer': 'Name, Company, Contact',
+            'description': 'Parallel packaging sample',
+        },
+        'descriptor_extension': 'yml'
+    }
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+        # permissive schemas, loaded from the local schema master
+        schemas = os.path.join(self.root, 'schemas')
+        os.makedirs(schemas)
+        for name in ('pd', 'nsd', 'vnfd'):
+            with open(os.path.join(schemas, name + '-schema.yml'), 'w') as f:
+                yaml.dump({'type': 'object'}, f)
+
+        self.ws = Workspace(os.path.join(self.root, 'ws'))
+        self.ws.config['schemas_local_master'] = schemas
+        self.ws.config['schemas_remote_master'] = 'invalid/'
+
+        prj_root = os.path.join(self.root, 'prj')
+        self.prj = Project(self.ws, prj_root,
+                           config=IntProjectPackagingTester.__pfd__)
+        os.makedirs(os.path.join(prj_root, 'sources', 'nsd'))
+
+        functions = []
+        for i in range(self.NUM_VNFS):
+            name = 'vnf{}'.format(i)
+            vnf_dir = os.path.join(prj_root, 'sources', 'vnf', name)
+            os.makedirs(os.path.join(vnf_dir, 'cfg'))
+            with open(os.path.join(vnf_dir, 'image.qcow2'), 'wb') as f:
+                f.write(os.urandom(100000))
+            with open(os.path.join(vnf_dir, 'cfg', 'vnf.conf'), 'w') as f:
+                f.write(name)
+            self.dump(os.path.join(vnf_dir, name + '.yml'), {
+                'vendor': 'eu.sonata', 'name': name, 'version': '0.1',
+                'virtual_deployment_units': [
+                    {'id': 'vdu01', 'vm_image': 'image.qcow2',
+                     'vm_image_format': 'qcow2'},
+                    {'id': 'vdu02', 'vm_image': 'cfg',
+                     'vm_image_format': 'raw'}]})
+            functions.append({'vnf_id': name, 'vnf_vendor': 'eu.sonata',
+                              'vnf_name': name, 'vnf_version': '0.1'})
+
+        self.dump(os.path.join(prj_root, 'sources', 'nsd', 'nsd.yml'),
+                  {'vendor': 'eu.sonata', 'name': 'ns', 'version': '0.1',
+                   'network_functions': functions})
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    @staticmethod
+    def dump(filename, content):
+        with open(filename, 'w') as f:
+            yaml.dump(content, f)
+
+    def package(self, workers=1, dst='out', previous=None, direct=True,
+                reproducible=False, dedupe=False):
+        dst = os.path.join(self.root, dst)
+        options = PackageOptions(direct=direct, workers=workers,
+                                 reproducible=reproducible, dedupe=dedupe)
+        pck = Packager(self.ws, project=self.prj, dst_path=dst,
+                       options=options, previous=previous)
+        pck.generate_package('package')
+        return pck, os.path.join(dst, 'package.son')
+
+    def test_parallel_equals_serial(self):
+        """
+        The package descriptor and contents of a parallel build
+        are the same of a serial build.
+        """
+        serial, serial_file = self.package(1, 'serial')
+        parallel, parallel_file = self.package(4, 'parallel')
+
+        self.assertIsNotNone(serial.package_descriptor)
+        self.assertEqual(len(serial.package_descriptor['package_content']),
+                         1 + 3 * self.NUM_VNFS)
+        self.assertEqual(serial.package_descriptor,
+                         parallel.package_descriptor)
+
+        with zipfile.ZipFile(serial_file) as s_zip, \
+                zipfile.ZipFile(parallel_file) as p_zip:
+            self.assertEqual(
+                sorted((i.filename, i.CRC) for i in s_zip.infolist()),
+                sorted((i.filename, i.CRC) for i in p_zip.infolist()))
+
+    def test_incremental(self):
+        """
+        An incremental build only rebuilds the changed contents
+        and results in the same package of a full build.
+        """
+        _, filename = self.package()
+        with open(os.path.join(self.prj.project_root, 'sources', 'vnf',
+                               'vnf1', 'image.qcow2'), 'wb') as f:
+            f.write(os.urandom(1000))
+
+        incremental, filename = self.package(previous=filename)
+        full, full_filename = self.package(dst='full')
+
+        self.assertEqual(incremental.package_descriptor,
+                         full.package_descriptor)
+        self.assertEqual(len(incremental.reused_entries),
+                         len(full.package_descriptor['package_content']) - 1)
+        self.assertNotIn('/qcow2_files/vnf1/image.qcow2',
+                         incremental.reused_entries)
+
+        with zipfile.ZipFile(filename) as i_zip, \
+                zipfile.ZipFile(full_filename) as f_zip:
+            self.assertIsNone(i_zip.testzip())
+            self.assertEqual(
+                sorted((i.filename, i.CRC) for i in i_zip.infolist()),
+                sorted((i.filename, i.CRC) for i in f_zip.infolist()))
+
+    def test_reproducible(self):
+        """
+        Reproducible builds of the same contents result in the same
+        package file, regardless of the packaging mode and timestamps.
+        """
+        packages = [self.package(dst='direct', reproducible=True)[1],
+                    self.package(dst='workdir', direct=False,
+                                 reproducible=True)[1]]
+
+        image = os.path.join(self.prj.project_root, 'sources', 'vnf',
+                             'vnf2', 'image.qcow2')
+        os.utime(image, (0, 0))
+        packages.append(self.package(4, dst='parallel',
+                                     reproducible=True)[1])
+
+        digests = set()
+        for package in packages:
+            with open(package, 'rb') as f:
+                digests.add(hashlib.md5(f.read()).hexdigest())
+        self.assertEqual(len(digests), 1)
+
+        with zipfile.ZipFile(packages[0]) as pck:
+            names = pck.namelist()
+            self.assertEqual(names[-1], 'META-INF/MANIFEST.MF')
+            self.assertEqual(names[:-1], sorted(names[:-1]))
+
+    def test_batch(self):
+        """
+        A batch packages multiple projects concurrently, reusing the same
+        validator, with the same contents of individual builds.
+        """
+        prj_root = os.path.join(self.root, 'prj2')
+        shutil.copytree(self.prj.project_root, prj_root)
+        config = copy.deepcopy(IntProjectPackagingTester.__pfd__)
+        config['package']['name'] = 'sonata-batch-sample'
+        projects = [self.prj, Project(self.ws, prj_root, config=config),
+                    os.path.join(self.root, 'missing')]
+
+        batch = BatchPackager(self.ws, dst_path=os.path.join(self.root, 'b'),
+                              options=PackageOptions(workers=2, direct=True))
+        results = batch.package_all(projects)
+        self.assertEqual([r.success for r in results], [True, True, False])
+        self.assertNotEqual(results[0].package, results[1].package)
+        self.assertEqual(results[0].size, os.path.getsize(results[0].package))
+
+        # each thread has its own schema validator
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            other = ex.submit(lambda: batch.schema_validator).result()
+        self.assertIs(batch.schema_validator, batch.schema_validator)
+        self.assertIs(batch.validator.schema_validator,
+                      batch.schema_validator)
+        self.assertIsNot(other, batch.schema_validator)
+
+        # the total time is the wall-clock time of concurrent projects
+        table = summary([BatchResult('a', start=0, duration=2, error='-'),
+                         BatchResult('b', start=1, duration=2, error='-')])
+        self.assertEqual(float(table.splitlines()[-1].split()[-1]), 3)
+
+        # the validator of a thread is reused by the next project
+        results = BatchPackager(self.ws, dst_path=os.path.join(self.root, 's'),
+                                options=PackageOptions(direct=True)) \
+            .package_all(projects[:2])
+        self.assertTrue(all(r.success for r in results))
+
+        # same contents of an individual build, except the manifest
+        _, filename = self.package()
+        for result in results:
+            with zipfile.ZipFile(filename) as s_zip, \
+                    zipfile.ZipFile(result.package) as b_zip:
+                self.assertEqual(
+                    sorted((i.filename, i.CRC) for i in s_zip.infolist()
+                           if i.filename != 'META-INF/MANIFEST.MF'),
+                    sorted((i.filename, i.CRC) for i in b_zip.infolist()
+                           if i.filename != 'META-INF/MANIFEST.MF'))
+
+    def test_dedupe(self):
+        """
+        Identical artifacts are still packaged, the repeated ones being
+        copied from the member of the first one in direct mode, or linked
+        to its file in the working directory.
+        """
+        vnf_dir = os.path.join(self.prj.project_root, 'sources', 'vnf')
+        for vnf in ('vnf1', 'vnf3'):
+            shutil.copy(os.path.join(vnf_dir, 'vnf0', 'image.qcow2'),
+                        os.path.join(vnf_dir, vnf, 'image.qcow2'))
+        names = ['/qcow2_files/{}/image.qcow2'.format(vnf)
+                 for vnf in ('vnf0', 'vnf1', 'vnf3')]
+
+        for dst, direct, workers in (('direct', True, 4),
+                                     ('workdir', False, 1)):
+            with patch.object(PackageArchive, 'write_file', autospec=True,
+                              side_effect=PackageArchive.write_file) as wf:
+                pck, filename = self.package(workers, dst=dst,
+                                             direct=direct, dedupe=True)
+            pcs = {pce['name']: pce
+                   for pce in pck.package_descriptor['package_content']}
+            for name in names:
+                self.assertNotIn('sealed', pcs[name])
+                self.assertEqual(pcs[name]['md5'], pcs[names[0]]['md5'])
+            if direct:
+                written = [c[0][1] for c in wf.call_args_list]
+                self.assertIn(names[0], written)
+                self.assertNotIn(names[1], written)
+                self.assertNotIn(names[2], written)
+
+            with zipfile.ZipFile(filename) as pck_zip:
+                self.assertIsNone(pck_zip.testzip())
+                self.assertEqual(len(pck_zip.namelist()), len(pcs) + 1)
+                data = [pck_zip.read(name.lstrip('/')) for name in names]
+            self.assertEqual(data[1], data[0])
+            self.assertEqual(data[2], data[0])
+
+    def test_in_memory(self):
+        """
+        Packages of descriptors given in memory have the same contents of
+        a project build, written to a file or to a file-like object.
+        """
+        src = os.path.join(self.prj.project_root, 'sources')
+        with open(os.path.join(src, 'nsd', 'nsd.yml')) as f:
+            nsd = yaml.load(f)
+        vnfds = []
+        images = dict()
+        for i in range(self.NUM_VNFS):
+            name = 'vnf{}'.format(i)
+            with open(os.path.join(src, 'vnf', name, name + '.yml')) as f:
+                vnfds.append(yaml.load(f))
+            images[name] = {
+                'image.qcow2': os.path.join(src, 'vnf', name, 'image.qcow2'),
+                'cfg': os.path.join(src, 'vnf', name, 'cfg')}
+
+        def package(output=None):
+            pck = Packager(self.ws, dst_path=os.path.join(self.root, 'mem'),
+                           nsd=nsd, vnfds=vnfds, images=images,
+                           description=self.__pfd__['package'])
+            return pck, pck.generate_package('package', output=output)
+
+        def members(package):
+            with zipfile.ZipFile(package) as pck:
+                self.assertIsNone(pck.testzip())
+                return sorted((i.filename, i.CRC) for i in pck.infolist()
+                              if not i.filename.startswith(
+                                  ('META-INF', 'service_descriptors')))
+
+        mem, filename = package()
+        self.assertEqual(filename,
+                         os.path.join(self.root, 'mem', 'package.son'))
+        self.assertEqual(os.listdir(os.path.join(self.root, 'mem')),
+                         ['package.son'])
+        self.assertEqual(mem.package_descriptor['entry_service_template'],
+                         '/service_descriptors/ns.yml')
+        self.assertEqual(len(mem.package_descriptor['package_content']),
+                         1 + 3 * self.NUM_VNFS)
+
+        _, project_file = self.package()
+        self.assertEqual(members(filename), members(project_file))
+
+        # seekable and non-seekable file-like objects
+        class Stream(io.RawIOBase):
+            def __init__(self):
+                self.data = io.BytesIO()
+
+            def writable(self):
+                return True
+
+            def write(self, b):
+                return self.data.write(b)
+
+        for output in (io.BytesIO(), Stream()):
+            _, result = package(output)
+            self.assertIs(result, output)
+            data = output.getvalue() if isinstance(output, io.BytesIO) \
+                else output.data.getvalue()
+            self.assertEqual(members(io.BytesIO(data)), members(filename))
+            with zipfile.ZipFile(io.BytesIO(data)) as pck:
+                self.assertEqual(
+                    {i.flag_bits & 0x08 for i in pck.infolist()},
+                    {0 if isinstance(output, io.BytesIO) else 0x08})
+
+    def test_in_memory_catalogue(self):
+        """
+        VNFs referenced by a service descriptor given in memory, but not
+        given themselves, are packaged from the workspace catalogue.
+        """
+        src = os.path.join(self.prj.project_root, 'sources')
+        with open(os.path.join(src, 'nsd', 'nsd.yml')) as f:
+            nsd = yaml.load(f)
+        vnfds = []
+        images = dict()
+        for i in range(self.NUM_VNFS - 1):
+            name = 'vnf{}'.format(i)
+            with open(os.path.join(src, 'vnf', name, name + '.yml')) as f:
+                vnfds.append(yaml.load(f))
+            images[name] = {
+                'image.qcow2': os.path.join(src, 'vnf', name, 'image.qcow2'),
+                'cfg': os.path.join(src, 'vnf', name, 'cfg')}
+
+        name = 'vnf{}'.format(self.NUM_VNFS - 1)
+        shutil.copytree(os.path.join(src, 'vnf', name),
+                        os.path.join(self.ws.workspace_root,
+                                     self.ws.vnf_catalogue_dir,
+                                     'eu.sonata.{}.0.1'.format(name)))
+
+        pck = Packager(self.ws, dst_path=os.path.join(self.root, 'mem'),
+                       nsd=nsd, vnfds=vnfds, images=images,
+                       description=self.__pfd__['package'])
+        filename = pck.generate_package('package')
+
+        self.assertEqual(filename,
+                         os.path.join(self.root, 'mem', 'package.son'))
+        self.assertEqual(len(pck.package_descriptor['package_content']),
+                         1 + 3 * self.NUM_VNFS)
+        with zipfile.ZipFile(filename) as package:
+            self.assertIsNone(package.testzip())
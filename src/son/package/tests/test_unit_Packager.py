@@ -28,7 +28,7 @@ import unittest
 from unittest.mock import patch
 from unittest.mock import Mock
 from unittest import mock
-from son.package.package import Packager
+from son.package.package import Packager, PackageOptions
 from son.workspace.workspace import Workspace
 from son.workspace.workspace import Project
 
@@ -118,3 +118,30 @@ class UnitCreatePackageTests(unittest.TestCase):
         prj_config['name'] = 'sonata - project - sample'
 
         self.assertTrue(packager.package_gds(prj_config))
+
+    def test_package_options(self):
+        """
+        Test the build options given to the packager
+        """
+        workspace = Workspace("ws/root", ws_name="ws_test", log_level='debug')
+        project = Project(workspace, 'prj/path')
+
+        options = PackageOptions(direct=True, workers=4, reproducible=True)
+        packager = Packager(workspace=workspace, project=project,
+                            generate_pd=False, options=options)
+        self.assertTrue(packager._direct)
+        self.assertEqual(packager._workers, 4)
+        self.assertEqual(packager._pending, [])
+
+        # changed copies leave the original options untouched
+        single = options.replace(workers=1)
+        self.assertEqual(single.workers, 1)
+        self.assertTrue(single.reproducible)
+        self.assertEqual(options.workers, 4)
+        self.assertRaises(TypeError, options.replace, unknown=True)
+
+        # default options
+        packager = Packager(workspace=workspace, project=project,
+                            generate_pd=False)
+        self.assertFalse(packager._direct)
+        self.assertIsNone(packager._pending)
@@ -0,0 +1,421 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import yaml
+import zipfile
+from unittest.mock import patch
+from son.package import archive
+from son.package.archive import PackageArchive, PackageReader, \
+    compression_for, compression_level, inspect_package, verify_archive
+from son.package.cache import HashCache
+
+
+class UnitPackageArchiveTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.image = os.path.join(self.root, 'image.qcow2')
+        self.image_data = os.urandom(200000)
+        with open(self.image, 'wb') as f:
+            f.write(self.image_data)
+        self.filename = os.path.join(self.root, 'test.son')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_compression_policy(self):
+        self.assertEqual(compression_for(archive.CT_SERVICE_DESCRIPTOR,
+                                         '/service_descriptors/nsd.yml'),
+                         zipfile.ZIP_DEFLATED)
+        self.assertEqual(compression_for('application/sonata.qcow2_files',
+                                         '/qcow2_files/vnf/image'),
+                         zipfile.ZIP_STORED)
+        self.assertEqual(compression_for('application/sonata.raw_files',
+                                         '/raw_files/vnf/image.tar.gz'),
+                         zipfile.ZIP_STORED)
+        self.assertEqual(compression_for('application/sonata.raw_files',
+                                         '/raw_files/vnf/config.cfg'),
+                         zipfile.ZIP_DEFLATED)
+
+        policy = {'application/sonata.raw_files': zipfile.ZIP_STORED}
+        self.assertEqual(compression_for('application/sonata.raw_files',
+                                         '/raw_files/vnf/config.cfg',
+                                         policy),
+                         zipfile.ZIP_STORED)
+
+    def test_compression_level(self):
+        levels = {'application/sonata.qcow2_files': 1,
+                  archive.CT_SERVICE_DESCRIPTOR: 0}
+        self.assertEqual(compression_level('application/sonata.qcow2_files',
+                                           '/qcow2_files/vnf/image.qcow2',
+                                           levels=levels),
+                         (zipfile.ZIP_DEFLATED, 1))
+        self.assertEqual(compression_level(archive.CT_SERVICE_DESCRIPTOR,
+                                           '/service_descriptors/nsd.yml',
+                                           levels=levels),
+                         (zipfile.ZIP_STORED, 0))
+        self.assertEqual(compression_level('application/sonata.raw_files',
+                                           '/raw_files/vnf/config.cfg',
+                                           levels=levels, level=9),
+                         (zipfile.ZIP_DEFLATED, 9))
+
+    def test_write(self):
+        """ Streamed entries are readable and their hashes are correct """
+        descriptor = b'name: sonata\n' * 100
+        cache = HashCache()
+        with PackageArchive(self.filename) as pck:
+            md5_d = pck.write_bytes('/service_descriptors/nsd.yml',
+                                    descriptor,
+                                    archive.CT_SERVICE_DESCRIPTOR)
+            md5_i = pck.write_file('/qcow2_files/vnf/image.qcow2',
+                                   self.image,
+                                   'application/sonata.qcow2_files',
+                                   cache=cache)
+            pck.write_bytes(archive.MANIFEST_NAME, b'manifest',
+                            archive.CT_PACKAGE_DESCRIPTOR)
+
+        self.assertEqual(md5_d, hashlib.md5(descriptor).hexdigest())
+        self.assertEqual(md5_i, hashlib.md5(self.image_data).hexdigest())
+        self.assertEqual(cache.get(self.image), md5_i)
+
+        with zipfile.ZipFile(self.filename) as pck:
+            self.assertIsNone(pck.testzip())
+            self.assertEqual(pck.namelist(),
+                             ['service_descriptors/nsd.yml',
+                              'qcow2_files/vnf/image.qcow2',
+                              archive.MANIFEST_NAME])
+            self.assertEqual(pck.read('service_descriptors/nsd.yml'),
+                             descriptor)
+            self.assertEqual(pck.read('qcow2_files/vnf/image.qcow2'),
+                             self.image_data)
+            infos = pck.infolist()
+            self.assertEqual(infos[0].compress_type, zipfile.ZIP_DEFLATED)
+            self.assertLess(infos[0].compress_size, len(descriptor))
+            self.assertEqual(infos[1].compress_type, zipfile.ZIP_STORED)
+
+    def test_copy_member(self):
+        """ Members of a previous package are copied as they are """
+        descriptor = b'name: sonata\n' * 100
+        with PackageArchive(self.filename) as pck:
+            md5_d = pck.write_bytes('/service_descriptors/nsd.yml',
+                                    descriptor,
+                                    archive.CT_SERVICE_DESCRIPTOR)
+            md5_i = pck.write_file('/qcow2_files/vnf/image.qcow2',
+                                   self.image,
+                                   'application/sonata.qcow2_files')
+            manifest = {'package_content': [
+                {'name': '/service_descriptors/nsd.yml', 'md5': md5_d},
+                {'name': '/qcow2_files/vnf/image.qcow2', 'md5': md5_i}]}
+            pck.write_bytes(archive.MANIFEST_NAME,
+                            yaml.dump(manifest).encode('utf-8'),
+                            archive.CT_PACKAGE_DESCRIPTOR)
+
+        index = archive.PackageIndex(self.filename)
+        self.assertEqual(len(index), 2)
+        self.assertIsNone(index.lookup('/qcow2_files/vnf/image.qcow2', '0'))
+        self.assertIsNone(index.lookup('/other', md5_i))
+
+        filename = os.path.join(self.root, 'copy.son')
+        with PackageArchive(filename) as pck:
+            for name, md5 in (('/service_descriptors/nsd.yml', md5_d),
+                              ('/qcow2_files/vnf/image.qcow2', md5_i)):
+                pck.copy_member(index, index.lookup(name, md5))
+        index.close()
+
+        with zipfile.ZipFile(filename) as pck, \
+                zipfile.ZipFile(self.filename) as orig:
+            self.assertIsNone(pck.testzip())
+            self.assertEqual(pck.read('service_descriptors/nsd.yml'),
+                             descriptor)
+            self.assertEqual(pck.read('qcow2_files/vnf/image.qcow2'),
+                             self.image_data)
+            self.assertEqual(
+                pck.getinfo('service_descriptors/nsd.yml').compress_size,
+                orig.getinfo('service_descriptors/nsd.yml').compress_size)
+
+    def test_zip64_header(self):
+        """
+        Members over the zip limits have Zip64 local headers, written
+        directly or through ZipFile.open()
+        """
+        data = os.urandom(3000)
+        for internals, block_size, direct in (
+                (archive.ZIP_INTERNALS, 1024, True),
+                (archive.ZIP_INTERNALS, archive.COMPRESS_BLOCK_SIZE, False),
+                (('missing',), 1024, False)):
+            with patch('zipfile.ZIP64_LIMIT', 1000), \
+                    patch.object(archive, 'ZIP_INTERNALS', internals), \
+                    patch.object(archive, 'COMPRESS_BLOCK_SIZE', block_size), \
+                    patch.object(PackageArchive, '__write_direct__',
+                                 autospec=True,
+                                 side_effect=PackageArchive.__write_direct__
+                                 ) as write_direct:
+                with PackageArchive(self.filename) as pck:
+                    md5 = pck.write_bytes('/raw_files/vnf/data', data,
+                                          'application/sonata.raw_files')
+
+                with zipfile.ZipFile(self.filename) as pck:
+                    self.assertIsNone(pck.testzip())
+                    self.assertEqual(pck.read('raw_files/vnf/data'), data)
+                    info = pck.getinfo('raw_files/vnf/data')
+                    self.assertEqual(info.file_size, len(data))
+                    self.assertEqual(info.compress_type,
+                                     zipfile.ZIP_DEFLATED)
+
+            self.assertEqual(write_direct.called, direct)
+            self.assertEqual(md5, hashlib.md5(data).hexdigest())
+            with open(self.filename, 'rb') as f:
+                header = struct.unpack(archive.LOCAL_HEADER_FORMAT,
+                                       f.read(archive.LOCAL_HEADER_SIZE))
+                f.seek(header[-2], os.SEEK_CUR)
+                extra = f.read(header[-1])
+            # Zip64 extended information extra field
+            self.assertEqual(struct.unpack('<H', extra[:2])[0], 0x0001)
+
+    def test_without_zip_internals(self):
+        """ Members are written through ZipFile.open() as a fallback """
+        descriptor = b'name: sonata\n' * 100
+        with PackageArchive(self.filename) as pck:
+            md5_i = pck.write_file('/qcow2_files/vnf/image.qcow2',
+                                   self.image,
+                                   'application/sonata.qcow2_files')
+            manifest = {'package_content': [
+                {'name': '/qcow2_files/vnf/image.qcow2', 'md5': md5_i}]}
+            pck.write_bytes(archive.MANIFEST_NAME,
+                            yaml.dump(manifest).encode('utf-8'),
+                            archive.CT_PACKAGE_DESCRIPTOR)
+
+        index = archive.PackageIndex(self.filename)
+        filename = os.path.join(self.root, 'copy.son')
+        with patch.object(archive, 'ZIP_INTERNALS', ('missing',)):
+            with PackageArchive(filename) as pck:
+                md5_d = pck.write_bytes('/service_descriptors/nsd.yml',
+                                        descriptor,
+                                        archive.CT_SERVICE_DESCRIPTOR)
+                pck.copy_member(index, index.lookup(
+                    '/qcow2_files/vnf/image.qcow2', md5_i))
+        index.close()
+
+        self.assertEqual(md5_d, hashlib.md5(descriptor).hexdigest())
+        with zipfile.ZipFile(filename) as pck:
+            self.assertIsNone(pck.testzip())
+            self.assertEqual(pck.read('service_descriptors/nsd.yml'),
+                             descriptor)
+            self.assertEqual(pck.read('qcow2_files/vnf/image.qcow2'),
+                             self.image_data)
+            infos = pck.infolist()
+            self.assertEqual(infos[0].compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(infos[1].compress_type, zipfile.ZIP_STORED)
+
+    def test_reproducible(self):
+        """ Timestamps of reproducible archives are fixed """
+        os.environ['SOURCE_DATE_EPOCH'] = '1500000000'
+        try:
+            self.assertEqual(archive.reproducible_date_time(),
+                             (2017, 7, 14, 2, 40, 0))
+        finally:
+            del os.environ['SOURCE_DATE_EPOCH']
+
+        with PackageArchive(self.filename, reproducible=True) as pck:
+            pck.write_file('/qcow2_files/vnf/image.qcow2', self.image)
+        with zipfile.ZipFile(self.filename) as pck:
+            info = pck.getinfo('qcow2_files/vnf/image.qcow2')
+            self.assertEqual(info.date_time, archive.REPRODUCIBLE_DATE_TIME)
+            self.assertEqual(info.external_attr >> 16, archive.ENTRY_MODE)
+
+    def test_parallel_compression(self):
+        """
+        Large members are deflated in blocks, with the same result
+        regardless of the number of workers
+        """
+        data = (b'vnf image ' * 200000 + os.urandom(100000)) * 2
+        with open(self.image, 'wb') as f:
+            f.write(data)
+        levels = {'application/sonata.qcow2_files': 1}
+
+        digests = set()
+        for workers in (1, 4):
+            filename = os.path.join(self.root, '{}.son'.format(workers))
+            with PackageArchive(filename, reproducible=True, levels=levels,
+                                workers=workers) as pck:
+                md5 = pck.write_file('/qcow2_files/vnf/image.qcow2',
+                                     self.image,
+                                     'application/sonata.qcow2_files')
+            self.assertEqual(md5, hashlib.md5(data).hexdigest())
+
+            with zipfile.ZipFile(filename) as pck:
+                self.assertIsNone(pck.testzip())
+                self.assertEqual(pck.read('qcow2_files/vnf/image.qcow2'),
+                                 data)
+                info = pck.getinfo('qcow2_files/vnf/image.qcow2')
+                self.assertEqual(info.compress_type, zipfile.ZIP_DEFLATED)
+                self.assertLess(info.compress_size, len(data) // 4)
+            with open(filename, 'rb') as f:
+                digests.add(hashlib.md5(f.read()).hexdigest())
+
+        self.assertEqual(len(digests), 1)
+
+    def test_reader(self):
+        """ Manifest and descriptors are read without the image data """
+        descriptor = yaml.dump({'name': 'sonata'}).encode('utf-8')
+        with PackageArchive(self.filename) as pck:
+            md5_d = pck.write_bytes('/function_descriptors/vnfd.yml',
+                                    descriptor,
+                                    archive.CT_FUNCTION_DESCRIPTOR)
+            md5_i = pck.write_file('/qcow2_files/vnf/image.qcow2',
+                                   self.image,
+                                   'application/sonata.qcow2_files')
+            manifest = {'name': 'package', 'package_content': [
+                {'name': '/function_descriptors/vnfd.yml', 'md5': md5_d,
+                 'content-type': archive.CT_FUNCTION_DESCRIPTOR},
+                {'name': '/qcow2_files/vnf/image.qcow2', 'md5': md5_i,
+                 'content-type': 'application/sonata.qcow2_files'},
+                {'name': '/qcow2_files/other/image.qcow2', 'md5': md5_i,
+                 'content-type': 'application/sonata.qcow2_files',
+                 'sealed': False}]}
+            pck.write_bytes(archive.MANIFEST_NAME,
+                            yaml.dump(manifest).encode('utf-8'),
+                            archive.CT_PACKAGE_DESCRIPTOR)
+
+        # corrupt the image data, which must not be read
+        with zipfile.ZipFile(self.filename) as pck:
+            offset = pck.getinfo('qcow2_files/vnf/image.qcow2').header_offset
+        with open(self.filename, 'r+b') as f:
+            f.seek(offset + 1000)
+            f.write(b'\0' * 1000)
+
+        with PackageReader(self.filename) as reader:
+            self.assertEqual(reader.manifest, manifest)
+            self.assertEqual(reader.descriptors,
+                             ['/function_descriptors/vnfd.yml'])
+            self.assertEqual(
+                reader.descriptor('/function_descriptors/vnfd.yml'),
+                {'name': 'sonata'})
+            self.assertIsNone(reader.descriptor('/missing.yml'))
+
+            entries = reader.entries()
+            self.assertEqual(entries[1]['size'], len(self.image_data))
+            self.assertEqual(entries[1]['compress_type'], zipfile.ZIP_STORED)
+            self.assertEqual(entries[1]['md5'], md5_i)
+            self.assertFalse(entries[2]['sealed'])
+            self.assertIsNone(entries[2]['size'])
+
+        text = inspect_package(self.filename)
+        self.assertIn('/qcow2_files/vnf/image.qcow2', text)
+        self.assertIn('not packaged', text)
+        self.assertIn('total (3 members)', text)
+
+    def test_duplicate_member(self):
+        """ Members are duplicated from the data written in the archive """
+        descriptor = b'name: sonata\n' * 100
+        with PackageArchive(self.filename) as pck:
+            pck.write_file('/raw_files/vnf0/image', self.image,
+                           'application/sonata.raw_files')
+            pck.write_bytes('/service_descriptors/nsd.yml', descriptor,
+                            archive.CT_SERVICE_DESCRIPTOR)
+            self.assertTrue(pck.duplicate_member(
+                '/raw_files/vnf1/image',
+                '/raw_files/vnf0/image'))
+            self.assertFalse(pck.duplicate_member(
+                '/raw_files/vnf2/image', '/missing'))
+
+        with zipfile.ZipFile(self.filename) as pck:
+            self.assertIsNone(pck.testzip())
+            self.assertEqual(pck.namelist(),
+                             ['raw_files/vnf0/image',
+                              'service_descriptors/nsd.yml',
+                              'raw_files/vnf1/image'])
+            self.assertEqual(pck.read('raw_files/vnf1/image'),
+                             self.image_data)
+            self.assertEqual(pck.read('service_descriptors/nsd.yml'),
+                             descriptor)
+            infos = pck.infolist()
+            self.assertEqual(infos[2].compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(infos[2].compress_size, infos[0].compress_size)
+
+        # the data of archives written to streams cannot be read back
+        with open(self.filename, 'wb') as f, PackageArchive(f) as pck:
+            pck.write_bytes('/service_descriptors/nsd.yml', descriptor,
+                            archive.CT_SERVICE_DESCRIPTOR)
+            self.assertFalse(pck.duplicate_member(
+                '/service_descriptors/copy.yml',
+                '/service_descriptors/nsd.yml'))
+
+    def test_reader_md5_extract(self):
+        """ Members are hashed in place and extracted selectively """
+        with PackageArchive(self.filename, level=6) as pck:
+            pck.write_bytes(archive.MANIFEST_NAME, b'name: package',
+                            archive.CT_PACKAGE_DESCRIPTOR)
+            md5_i = pck.write_file('/qcow2_files/vnf/image.qcow2',
+                                   self.image,
+                                   'application/sonata.qcow2_files')
+
+        dst = os.path.join(self.root, 'extracted')
+        with PackageReader(self.filename) as reader:
+            self.assertEqual(reader.md5('/qcow2_files/vnf/image.qcow2'),
+                             md5_i)
+            reader.extract(dst, [archive.MANIFEST_NAME, '/missing.yml'])
+
+        self.assertEqual(os.listdir(dst), ['META-INF'])
+        self.assertTrue(os.path.isfile(
+            os.path.join(dst, archive.MANIFEST_NAME)))
+
+    def test_verify_archive(self):
+        """ Archives on disk are verified against the members written """
+        with PackageArchive(self.filename) as pck:
+            pck.write_bytes(archive.MANIFEST_NAME, b'name: package',
+                            archive.CT_PACKAGE_DESCRIPTOR)
+            pck.write_file('/qcow2_files/vnf/image.qcow2', self.image,
+                           'application/sonata.qcow2_files')
+        members = pck.members
+        verify_archive(self.filename, members)
+
+        # members not written, or written differently
+        self.assertRaises(zipfile.BadZipFile, verify_archive,
+                          self.filename, members[:1])
+        other = zipfile.ZipInfo(members[1].filename)
+        other.CRC = members[1].CRC ^ 1
+        self.assertRaises(zipfile.BadZipFile, verify_archive,
+                          self.filename, [members[0], other])
+
+        # corrupted local header
+        with open(self.filename, 'r+b') as f:
+            f.seek(members[1].header_offset + 14)
+            f.write(b'\0\0\0\0')
+        self.assertRaises(zipfile.BadZipFile, verify_archive,
+                          self.filename, members)
+
+        # truncated archive
+        with open(self.filename, 'r+b') as f:
+            f.truncate(members[1].header_offset + 1000)
+        self.assertRaises(zipfile.BadZipFile, verify_archive,
+                          self.filename, members)
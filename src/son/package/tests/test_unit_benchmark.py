@@ -0,0 +1,86 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+from son.package.benchmark import generate_workspace, generate_project, \
+    run_benchmark, compare, parse_size
+
+
+class UnitBenchmarkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_generate_project(self):
+        ws = generate_workspace(os.path.join(self.root, 'ws'))
+        prj = generate_project(ws, os.path.join(self.root, 'prj'), vnfs=2,
+                               vdus=2, images=3, image_size=1000)
+
+        images = [os.path.join(base, f)
+                  for base, _, files in os.walk(prj.vnfd_root)
+                  for f in files if f.endswith('.raw')]
+        self.assertEqual(len(images), 2 * 2 * 3)
+        self.assertTrue(all(os.path.getsize(f) == 1000 for f in images))
+
+        # same seed, same contents
+        other = generate_project(ws, os.path.join(self.root, 'other'),
+                                 vnfs=1, vdus=1, images=1, image_size=1000)
+        with open(os.path.join(other.vnfd_root, 'vnf0', 'vdu0.qcow2'),
+                  'rb') as f1, \
+                open(os.path.join(prj.vnfd_root, 'vnf0', 'vdu0',
+                                  'vdu0-img0.raw'), 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    def test_run_and_compare(self):
+        results = run_benchmark(self.root, scenarios=['direct', 'workdir'],
+                                vnfs=2, image_size=10000, repeat=1)
+        self.assertEqual(sorted(results['scenarios']), ['direct', 'workdir'])
+        for scenario in results['scenarios'].values():
+            run = scenario['runs'][0]
+            self.assertGreater(run['size'], 2 * 10000)
+            self.assertGreater(run['total'], 0)
+            self.assertIn('validate_package', run['stages'])
+            self.assertIn('validate_package', scenario['median']['stages'])
+
+        self.assertFalse(any(row[5] for row in compare(results, results)))
+
+        slower = copy.deepcopy(results)
+        slower['scenarios']['direct']['median']['total'] += 1
+        regressions = [row for row in compare(results, slower) if row[5]]
+        self.assertEqual([row[:2] for row in regressions],
+                         [('direct', 'total')])
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size('512'), 512)
+        self.assertEqual(parse_size('8k'), 8 * 1024)
+        self.assertEqual(parse_size('1.5M'), 3 * 512 * 1024)
@@ -0,0 +1,127 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import os
+import shutil
+import tempfile
+import unittest
+from son.package.cache import HashCache, PersistentCache
+from son.package.md5 import generate_hash
+
+
+class UnitHashCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.file = os.path.join(self.root, 'img')
+        with open(self.file, 'wb') as f:
+            f.write(b'sonata')
+        self.cache_file = os.path.join(self.root, 'cache.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_hit_and_invalidation(self):
+        """ Cached hashes are reused until the file changes """
+        cache = HashCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return generate_hash(self.file)
+
+        h1 = cache.get(self.file, compute)
+        self.assertEqual(cache.get(self.file, compute), h1)
+        self.assertEqual(len(calls), 1)
+
+        with open(self.file, 'wb') as f:
+            f.write(b'sonata-nfv')
+        os.utime(self.file, ns=(0, 0))
+        self.assertNotEqual(cache.get(self.file, compute), h1)
+        self.assertEqual(len(calls), 2)
+
+    def test_generate_hash_cache(self):
+        cache = HashCache()
+        h = generate_hash(self.file, cache=cache)
+        self.assertEqual(cache.get(self.file), h)
+        self.assertEqual(generate_hash(self.root, cache=cache),
+                         generate_hash(self.root))
+
+    def test_eviction(self):
+        cache = HashCache(max_entries=2)
+        for i in range(3):
+            f = os.path.join(self.root, 'f{}'.format(i))
+            with open(f, 'w') as _file:
+                _file.write(str(i))
+            cache.put(f, str(i))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(os.path.join(self.root, 'f0')))
+
+    def test_persistence(self):
+        cache = HashCache(self.cache_file)
+        h = cache.get(self.file, lambda: generate_hash(self.file))
+        cache.save()
+        self.assertTrue(os.path.isfile(self.cache_file))
+
+        cache = HashCache(self.cache_file)
+        self.assertEqual(cache.get(self.file), h)
+
+    def test_invalid_cache_file(self):
+        with open(self.cache_file, 'w') as f:
+            f.write('not json')
+        cache = HashCache(self.cache_file)
+        self.assertEqual(len(cache), 0)
+
+    def test_persistent_cache(self):
+        """ Entries are reloaded in their order of use, of their version """
+
+        class TreeCache(PersistentCache):
+            CACHE_VERSION = 2
+
+            @staticmethod
+            def _dump_entry(key, entry):
+                return [key, entry]
+
+            @staticmethod
+            def _load_entry(item):
+                return item[0], item[1]
+
+        cache = TreeCache(self.cache_file, max_entries=2)
+        with cache._lock:
+            for key in ('a', 'b', 'c'):
+                cache._store(key, {'key': key})
+            cache._lookup('b')
+        cache.save()
+        self.assertFalse(os.path.exists(self.cache_file + '.tmp'))
+
+        cache = TreeCache(self.cache_file, max_entries=2)
+        self.assertEqual(list(cache._entries.items()),
+                         [('c', {'key': 'c'}), ('b', {'key': 'b'})])
+        cache = TreeCache(self.cache_file, max_entries=1)
+        self.assertEqual(list(cache._entries), ['b'])
+
+        TreeCache.CACHE_VERSION = 3
+        self.assertEqual(len(TreeCache(self.cache_file)), 0)
@@ -0,0 +1,124 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from son.package import md5
+
+
+def reference_hash(p):
+    """ Previous (sequential, 128 byte chunk) implementation """
+    if os.path.isfile(p):
+        h = hashlib.md5()
+        with open(p, 'rb') as f:
+            for chunk in iter(lambda: f.read(128), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    hashes = []
+    for root, dirs, files in os.walk(p):
+        for f in sorted(files):
+            hashes.append(reference_hash(os.path.join(root, f)))
+        for d in sorted(dirs):
+            hashes.append(reference_hash(os.path.join(root, d)))
+        break
+    return md5._reduce_hash(hashes)
+
+
+class UnitHashTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, 'a', 'b'))
+        os.makedirs(os.path.join(self.root, 'c'))
+        contents = {'f1': b'', 'a/f2': b'x' * 1000,
+                    'a/b/f3': os.urandom(300000), 'c/f4': b'sonata'}
+        for name, data in contents.items():
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_file_hash(self):
+        """ File digests match the previous implementation """
+        for name in ('f1', 'a/f2', 'a/b/f3'):
+            f = os.path.join(self.root, name)
+            self.assertEqual(md5.generate_hash(f), reference_hash(f))
+            self.assertEqual(md5.generate_hash(f, cs=128), reference_hash(f))
+
+    def test_file_hash_mmap(self):
+        """ The mmap fast path produces the same digest """
+        f = os.path.join(self.root, 'a/b/f3')
+        with patch('son.package.md5.MMAP_THRESHOLD', 1):
+            self.assertEqual(md5.generate_hash(f, cs=4096),
+                             reference_hash(f))
+
+    def test_file_digest(self):
+        """ Any hashlib algorithm, streamed with bounded buffers """
+        f = os.path.join(self.root, 'a/b/f3')
+        with open(f, 'rb') as fh:
+            expected = hashlib.sha256(fh.read()).digest()
+        self.assertEqual(md5.file_digest(f), expected)
+        self.assertEqual(md5.file_digest(f, cs=128), expected)
+
+    def test_path_hash(self):
+        """ Directory digests match, both sequential and in parallel """
+        self.assertEqual(md5.generate_hash(self.root, workers=1),
+                         reference_hash(self.root))
+        self.assertEqual(md5.generate_hash(self.root, workers=4),
+                         reference_hash(self.root))
+
+    def test_chunk_size(self):
+        self.assertEqual(md5.chunk_size(10), md5.MIN_CHUNK_SIZE)
+        self.assertEqual(md5.chunk_size(1 << 40), md5.MAX_CHUNK_SIZE)
+        self.assertEqual(md5.chunk_size(1 << 40, cs=128), 128)
+
+    def test_copy_hash(self):
+        """ Copied (or linked) files have the same content and digest """
+        src = os.path.join(self.root, 'a/b/f3')
+        for mode in md5.COPY_MODES:
+            dst = os.path.join(self.root, 'copy-' + mode)
+            self.assertEqual(md5.copy_hash(src, dst, mode=mode),
+                             reference_hash(src))
+            self.assertEqual(reference_hash(dst), reference_hash(src))
+
+        self.assertRaises(ValueError, md5.copy_hash, src,
+                          os.path.join(self.root, 'x'), mode='move')
+
+    def test_copy_hash_link_fallback(self):
+        """ Failing links fall back to a regular copy """
+        src = os.path.join(self.root, 'a/f2')
+        dst = os.path.join(self.root, 'copy')
+        with patch('os.link', side_effect=OSError(18, 'Cross-device link')):
+            self.assertEqual(md5.copy_hash(src, dst, mode=md5.HARDLINK),
+                             reference_hash(src))
+        self.assertEqual(os.stat(dst).st_nlink, 1)
+        self.assertEqual(reference_hash(dst), reference_hash(src))
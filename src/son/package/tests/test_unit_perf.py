@@ -0,0 +1,102 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from son.package.perf import PerfReport, span, propagate, current_span, \
+    NULL_SPAN
+
+
+class UnitPerfReportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_inactive(self):
+        """ Spans are not recorded without an active report """
+        with span('stage', path='/non/existent') as s:
+            self.assertIs(s, NULL_SPAN)
+        self.assertIsNone(current_span())
+
+    def test_nested_spans(self):
+        filename = os.path.join(self.root, 'img')
+        with open(filename, 'wb') as f:
+            f.write(b'0' * 1000)
+
+        report = PerfReport()
+        with report.activate():
+            with span('vnf', vnf='vnf0'):
+                with span('copy', path=filename):
+                    pass
+                with span('zip', 500) as s:
+                    s.add_bytes(100)
+        self.assertIsNone(current_span())
+
+        vnf = report.to_dict()['report']['children'][0]
+        self.assertEqual(vnf['attributes'], {'vnf': 'vnf0'})
+        self.assertEqual(vnf['bytes'], 1600)
+        self.assertEqual([(c['name'], c['bytes']) for c in vnf['children']],
+                         [('copy', 1000), ('zip', 600)])
+
+        stages = report.stages()
+        self.assertEqual(stages['zip']['count'], 1)
+        self.assertEqual(stages['copy']['bytes'], 1000)
+
+    def test_propagate(self):
+        """ Spans of pool threads are children of the dispatching span """
+        report = PerfReport()
+
+        def work(i):
+            with span('item', i=i):
+                return i
+
+        with report.activate(), span('pool'):
+            with ThreadPoolExecutor(max_workers=4) as ex:
+                self.assertEqual(list(ex.map(propagate(work), range(8))),
+                                 list(range(8)))
+
+        pool = report.root.children[0]
+        self.assertEqual(len(pool.children), 8)
+        self.assertEqual(report.stages()['item']['count'], 8)
+
+    def test_write(self):
+        report = PerfReport()
+        with report.activate(), span('stage', 1024):
+            pass
+
+        filename = os.path.join(self.root, 'report.json')
+        report.write(filename)
+        with open(filename) as f:
+            content = json.load(f)
+        self.assertEqual(content['report']['name'], 'son-package')
+        self.assertEqual(content['stages']['stage']['bytes'], 1024)
@@ -0,0 +1,88 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import hashlib
+import unittest
+from unittest.mock import patch, Mock
+import requests
+from son.package.remote import RemoteArtifactProbe
+
+
+class UnitRemoteArtifactProbeTests(unittest.TestCase):
+
+    URLS = ['http://images.sonata-nfv.eu/vnf{}.qcow2'.format(i)
+            for i in range(4)]
+
+    def setUp(self):
+        self.probe = RemoteArtifactProbe(ttl=60)
+
+    def test_probe(self):
+        """ URLs are probed once and the results are cached """
+        def head(url, timeout):
+            if url == self.URLS[0]:
+                raise requests.ConnectionError()
+
+        with patch.object(self.probe._session, 'head',
+                          side_effect=head) as m_head:
+            results = self.probe.probe(self.URLS)
+            self.assertEqual(m_head.call_count, len(self.URLS))
+            self.assertFalse(results[self.URLS[0]])
+            self.assertTrue(all(results[url] for url in self.URLS[1:]))
+
+            self.assertTrue(self.probe.exists(self.URLS[1]))
+            self.assertEqual(m_head.call_count, len(self.URLS))
+
+    @patch('son.package.remote.time')
+    def test_probe_ttl(self, m_time):
+        """ Expired results are probed again """
+        m_time.time.return_value = 1000
+        with patch.object(self.probe._session, 'head') as m_head:
+            self.probe.exists(self.URLS[0])
+            m_time.time.return_value = 1030
+            self.probe.exists(self.URLS[0])
+            self.assertEqual(m_head.call_count, 1)
+
+            m_time.time.return_value = 1061
+            self.probe.exists(self.URLS[0])
+            self.assertEqual(m_head.call_count, 2)
+
+    def test_fetch_hash(self):
+        """ Remote artifacts are hashed while being downloaded """
+        chunks = [b'sonata', b'-', b'nfv']
+        response = Mock()
+        response.iter_content.return_value = iter(chunks)
+
+        with patch.object(self.probe._session, 'get',
+                          return_value=response) as m_get:
+            self.assertEqual(self.probe.fetch_hash(self.URLS[0]),
+                             hashlib.md5(b''.join(chunks)).hexdigest())
+            self.assertTrue(m_get.call_args[1]['stream'])
+            response.close.assert_called_once_with()
+
+        response.raise_for_status.side_effect = requests.HTTPError()
+        with patch.object(self.probe._session, 'get',
+                          return_value=response):
+            self.assertIsNone(self.probe.fetch_hash(self.URLS[1]))
@@ -31,18 +31,17 @@ import copy
 import time
 from termcolor import colored
 from tabulate import tabulate
-from son.profile.helper import read_yaml, write_yaml, relative_path, ensure_dir
+from son.profile.helper import read_yaml, relative_path, ensure_dir
 from son.profile.generator import ServiceConfigurationGenerator
-from son.workspace.project import Project
 from son.workspace.workspace import Workspace
 from son.package.package import Packager
+from son.package.batch import BatchPackager
 
 
 LOG = logging.getLogger(__name__)
 
 # working directories created in "output_path"
 SON_BASE_DIR = ".tmp_base_service"  # temp folder with input package contents
-SON_GEN_SERVICES = ".tmp_gen_services"  # temp folder holding the unpacked generated services
 
 class SonataServiceConfigurationGenerator(ServiceConfigurationGenerator):
     """
@@ -110,6 +109,8 @@ class SonataServiceConfigurationGenerator(ServiceConfigurationGenerator):
         the given experiment configurations.
         """
         n = base_service_obj.copy()
+        # generated services are packed from memory, not from a project
+        n.metadata.pop("project_disk_path", None)
         #n.manifest["name"] += "-{}".format(ec.run_id)
         n.metadata["run_id"] = ec.run_id
         n.metadata["exname"] = ec.name
@@ -329,9 +330,15 @@ class SonataServiceConfigurationGenerator(ServiceConfigurationGenerator):
         return: dict<run_id: package_path>
         """
         r = dict()
+        # one batch packager for all services: reuses workspace, schemas and validator
+        batch = None
+        workspace = Workspace.__create_from_descriptor__(workspace_dir)
+        if workspace is not None:
+            workspace.log_level = "DEBUG" if self.args.verbose else "INFO"
+            batch = BatchPackager(workspace, dst_path=output_path)
         for i, s in service_objs.items():
             r[i] = dict()
-            r[i]["sonfile"] = s.pack(output_path, self.args.verbose, workspace_dir=workspace_dir)
+            r[i]["sonfile"] = s.pack(output_path, self.args.verbose, workspace_dir=workspace_dir, batch=batch)
             r[i]["experiment_configuration"] = s.metadata.get("ec")
             self.generated_services[i] = s  # keep a pointformat(len(r), output_path))
         return r
@@ -407,7 +414,6 @@ class SonataService(object):
         m = dict()
         m["run_id"] = -1
         m["exname"] = None
-        m["project_disk_path"] = None
         m["package_disk_path"] = None
         return m
 
@@ -480,44 +486,25 @@ class SonataService(object):
         LOG.debug("Copy: {}".format(self))
         return copy.deepcopy(self)
 
-    def _write(self, output_path):
-        """
-        Write this SONATA service project structure to disk. This includes
-        all descriptors etc. The generated files can be used as input to
-        the SONATA packaging tool.
-        """
-        path = os.path.join(output_path, SON_GEN_SERVICES, self.pkg_name)
-        # update package path to reflect new location
-        self.metadata["project_disk_path"] = path
-        # create output folder
-        ensure_dir(path)
-        # write project yml
-        write_yaml(os.path.join(path, "project.yml"), self.pd)
-        # write nsd
-        nsd_dir = os.path.join(path, "sources/nsd")
-        ensure_dir(nsd_dir)
-        write_yaml(os.path.join(nsd_dir,  "%s.yml" % self.nsd.get("name")), self.nsd)
-        # write all vnfds
-        vnf_dir = os.path.join(path, "sources/vnf")
-        for vnfd in self.vnfd_list:
-            d = os.path.join(vnf_dir, vnfd.get("name"))
-            ensure_dir(d)
-            write_yaml(os.path.join(d, "%s.yml" % vnfd.get("name")), vnfd)
-        LOG.debug("Wrote: {} to {}".format(self, path))
-        return path
-    
-    def pack(self, output_path, verbose=False, workspace_dir=Workspace.DEFAULT_WORKSPACE_DIR):
+    def pack(self, output_path, verbose=False, workspace_dir=Workspace.DEFAULT_WORKSPACE_DIR, batch=None):
         """
         Creates a *.son file of this service object.
-        First writes the normal project structure to disk (to be used with packaging tool)
+        The descriptors are packaged directly from memory, without writing a project structure to disk.
+        If a BatchPackager is given, its workspace, schemas and validator are reused.
         """
         start_time = time.time()
-        tmp_path = self._write(output_path)
         pkg_path = os.path.join(output_path, self.pkg_name) + ".son"
         LOG.warning(pkg_path)
         self.metadata["package_disk_path"] = pkg_path
         # be sure the target directory exists
         ensure_dir(output_path)
+        if batch is not None:
+            result = batch.package_descriptors(
+                self.nsd, self.vnfd_list, self.pkg_name, description=self.pd["package"])
+            if not result.success:
+                LOG.error("Packager couldn't package service: %r. Abort." % self)
+                exit(1)
+            return self._packed(pkg_path, start_time)
         # obtain workspace
         # TODO have workspace dir as command line argument
         workspace = Workspace.__create_from_descriptor__(workspace_dir)
@@ -526,14 +513,15 @@ class SonataService(object):
             exit(1)
         # force verbosity of external tools if required
         workspace.log_level = "DEBUG" if verbose else "INFO"
-        # obtain project
-        project = Project.__create_from_descriptor__(workspace, tmp_path)
-        if project is None:
-            LOG.error("Packager couldn't load service project: %r. Abort." % tmp_path)
-            exit(1)
         # initialize and run packager
-        pck = Packager(workspace, project, dst_path=output_path)
-        pck.generate_package(self.pkg_name)
+        pck = Packager(workspace, dst_path=output_path, nsd=self.nsd,
+                       vnfds=self.vnfd_list, description=self.pd["package"])
+        if not pck.package_descriptor or not pck.generate_package(self.pkg_name):
+            LOG.error("Packager couldn't package service: %r. Abort." % self)
+            exit(1)
+        return self._packed(pkg_path, start_time)
+
+    def _packed(self, pkg_path, start_time):
         self.metadata["package_disk_size"] = os.path.getsize(pkg_path)
         self.metadata["package_generation_time"] = time.time() - start_time
         LOG.debug("Packed: {} to {}".format(self, pkg_path))
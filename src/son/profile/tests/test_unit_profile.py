@@ -161,6 +161,7 @@ class UnitSonataGeneratorTests(unittest.TestCase):
         for k, v in gen.items():
             self.assertGreaterEqual(k, 0)
             self.assertGreaterEqual(v.metadata.get("run_id"), 0)
+            self.assertNotIn("project_disk_path", v.metadata)
         ## 2. test embedding (based on template NSD)
         for k, v in gen.items():
             self.assertIsNotNone(v.nsd)
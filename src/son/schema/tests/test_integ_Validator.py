@@ -27,8 +27,13 @@
 import unittest
 import pkg_resources
 import os
+import shutil
+import tempfile
+import yaml
 from requests.exceptions import HTTPError, MissingSchema
-from son.schema.validator import load_local_schema, load_remote_schema
+from son.schema.validator import SchemaValidator, load_local_schema, \
+    load_remote_schema
+from son.workspace.workspace import Workspace
 
 
 class IntLoadSchemaTests(unittest.TestCase):
@@ -58,6 +63,57 @@ class IntLoadSchemaTests(unittest.TestCase):
         schema = load_local_schema(schema_f)
         self.assertIsInstance(schema, dict)
 
+    def test_schema_validator_reuse(self):
+        """ Test if schema validators are built once and reused """
+        workspace = Workspace('.', log_level='info')
+        workspace.config['schemas_local_master'] = \
+            pkg_resources.resource_filename(__name__, "son-schema")
+        validator = SchemaValidator(workspace, preload=True)
+
+        vnfd = SchemaValidator.SCHEMA_FUNCTION_DESCRIPTOR
+        vnfd_validator = validator.load_validator(vnfd)
+        self.assertIsNotNone(vnfd_validator)
+
+        self.assertIsNone(validator.validate({'name': 'vnf'}, vnfd))
+        self.assertIn("required property", validator.error_msg)
+        self.assertIsNone(validator.validate({}, vnfd))
+        self.assertIs(validator.load_validator(vnfd), vnfd_validator)
+
+    def test_get_descriptor_types(self):
+        """ Test if descriptor types are inferred from their keys """
+        workspace = Workspace('.', log_level='info')
+        workspace.config['schemas_local_master'] = \
+            pkg_resources.resource_filename(__name__, "son-schema")
+        validator = SchemaValidator(workspace, preload=True)
+
+        nsd = {'descriptor_version': '1.0', 'vendor': 'eu.sonata-nfv',
+               'name': 'ns', 'version': '0.1'}
+        vnfd = dict(nsd, name='vnf', virtual_deployment_units=[
+            {'id': 'vdu1', 'resource_requirements': {
+                'cpu': {'vcpus': 1}, 'memory': {'size': 1}}}])
+        pd = {'descriptor_version': '1.0', 'package_group': 'eu.sonata-nfv',
+              'package_name': 'package', 'package_version': '0.1'}
+        invalid = dict(nsd, network_functions='vnf')
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.makedirs(os.path.join(root, 'sources'))
+        for name, descriptor in [('nsd.yml', nsd), ('pd.yml', pd),
+                                 ('sources/vnfd.yml', vnfd),
+                                 ('invalid.yml', invalid),
+                                 ('other.txt', nsd)]:
+            with open(os.path.join(root, name), 'w') as f:
+                yaml.dump(descriptor, f)
+
+        self.assertEqual(validator.get_descriptor_types(root, 'yml'), {
+            os.path.join(root, 'nsd.yml'):
+                SchemaValidator.SCHEMA_SERVICE_DESCRIPTOR,
+            os.path.join(root, 'pd.yml'):
+                SchemaValidator.SCHEMA_PACKAGE_DESCRIPTOR,
+            os.path.join(root, 'sources', 'vnfd.yml'):
+                SchemaValidator.SCHEMA_FUNCTION_DESCRIPTOR,
+            os.path.join(root, 'invalid.yml'): None})
+
     def test_load_invalid_remote_template_unavailable(self):
         """
         Test if it raises a HTTP error with a valid
@@ -29,12 +29,13 @@ import coloredlogs
 import validators
 import os
 import yaml
-import jsonschema
 import requests
 from requests.exceptions import RequestException
 
 from jsonschema import SchemaError
-from jsonschema import ValidationError
+from jsonschema import FormatChecker
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 
 log = logging.getLogger(__name__)
 
@@ -46,6 +47,15 @@ class SchemaValidator(object):
     SCHEMA_SERVICE_DESCRIPTOR = 'NSD'
     SCHEMA_FUNCTION_DESCRIPTOR = 'VNFD'
 
+    # Keys that discriminate the type of a descriptor, checked in order
+    DESCRIPTOR_TYPE_KEYS = (
+        (SCHEMA_PACKAGE_DESCRIPTOR, ('package_content', 'package_name',
+                                     'entry_service_template')),
+        (SCHEMA_FUNCTION_DESCRIPTOR, ('virtual_deployment_units',)),
+        (SCHEMA_SERVICE_DESCRIPTOR, ('network_functions',
+                                     'forwarding_graphs')),
+    )
+
     def __init__(self, workspace, preload=False):
         # Assign parameters
         coloredlogs.install(level=workspace.log_level)
@@ -61,6 +71,9 @@ class SchemaValidator(object):
         # Keep a library of loaded schemas to avoid re-loading
         self._schemas_library = dict()
 
+        # Validators of the loaded schemas, built once per schema
+        self._validators = dict()
+
         self._error_msg = ''
 
         # if preload, load local cached schema files
@@ -202,23 +215,42 @@ class SchemaValidator(object):
 
         log.error("Failed to load schema '{}'".format(template))
 
+    def load_validator(self, template, reload=False):
+        """
+        Obtain the validator of a schema template. The schema is checked
+        and its validator (with its format checker and reference resolver)
+        is built only once, when the schema is loaded, and reused for all
+        validations against it.
+
+        :param template: schema template id
+        :param reload: Force the reload of the schema
+        :return: jsonschema validator object, None if the schema could not
+                 be loaded
+        :raise SchemaError: if the schema is invalid
+        """
+        schema = self.load_schema(template, reload=reload)
+        if schema is None:
+            return
+
+        validator = self._validators.get(template)
+        if validator is None or validator.schema is not schema:
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            validator = cls(schema, format_checker=FormatChecker())
+            self._validators[template] = validator
+        return validator
+
     def validate(self, descriptor, schema_id):
         """
-        Validate a descriptor against a schema template
-        :param descriptor:
-        :param schema_id:
-        :return:
+        Validate a descriptor against a schema template.
+        All errors are collected in a single pass, the most relevant one
+        being reported in error_msg.
+        :param descriptor: descriptor dictionary
+        :param schema_id: schema template id
+        :return: True if valid, None otherwise
         """
         try:
-            jsonschema.validate(descriptor, self.load_schema(schema_id))
-            return True
-
-        except ValidationError as e:
-            log.error("Failed to validate Descriptor against schema '{}'"
-                      .format(schema_id))
-            self.error_msg = e.message
-            log.error(e.message)
-            return
+            validator = self.load_validator(schema_id)
 
         except SchemaError as e:
             log.error("Invalid Schema '{}'".format(schema_id))
@@ -226,32 +258,84 @@ class SchemaValidator(object):
             log.debug(e)
             return
 
+        if validator is None:
+            self.error_msg = "Failed to load schema '{}'".format(schema_id)
+            return
+
+        errors = list(validator.iter_errors(descriptor))
+        if not errors:
+            return True
+
+        log.error("Failed to validate Descriptor against schema '{}'"
+                  .format(schema_id))
+        error = best_match(errors)
+        self.error_msg = error.message
+        log.error(error.message)
+        for other in errors:
+            if other is not error:
+                log.debug("Validation error at '{}': {}".format(
+                    '/'.join(str(p) for p in other.absolute_path),
+                    other.message))
+        return
+
     def get_descriptor_type(self, descriptor):
         """
         This function obtains the type of a descriptor.
-        Its methodology is based on trial-error, since it
-        attempts to validate the descriptor against the
-        available schema templates until a success is achieved
+        The type is inferred from the keys that discriminate each type of
+        descriptor (see DESCRIPTOR_TYPE_KEYS), descriptors without any of
+        them being service descriptors. The inferred type is confirmed by
+        a single validation against its schema template.
+        :param descriptor: descriptor dictionary
+        :return: schema template id, None if the descriptor is not valid
         """
-        # Gather schema templates ids
-        templates = {self.SCHEMA_PACKAGE_DESCRIPTOR,
-                     self.SCHEMA_SERVICE_DESCRIPTOR,
-                     self.SCHEMA_FUNCTION_DESCRIPTOR}
+        if not isinstance(descriptor, dict):
+            return
 
-        # Cycle through templates until a success validation is return
-        for schema_id in templates:
-            try:
-                jsonschema.validate(descriptor, self.load_schema(schema_id))
-                return schema_id
+        schema_id = self.SCHEMA_SERVICE_DESCRIPTOR
+        for template, keys in self.DESCRIPTOR_TYPE_KEYS:
+            if any(key in descriptor for key in keys):
+                schema_id = template
+                break
+
+        try:
+            validator = self.load_validator(schema_id)
 
-            except ValidationError:
+        except SchemaError as error_detail:
+            log.error("Invalid Schema '{}'".format(schema_id))
+            log.debug(error_detail)
+            return
 
-                continue
+        if validator is not None and validator.is_valid(descriptor):
+            return schema_id
 
-            except SchemaError as error_detail:
-                log.error("Invalid Schema '{}'".format(schema_id))
-                log.debug(error_detail)
-                return
+    def get_descriptor_types(self, path, extension=None):
+        """
+        Obtain the type of all descriptor files in a directory tree.
+        :param path: directory to search for descriptor files
+        :param extension: extension of descriptor files. If not specified,
+                          the default extension of the workspace is used
+        :return: dictionary mapping each descriptor file to its schema
+                 template id, None if the file is not a valid descriptor
+        """
+        if not extension:
+            extension = self._workspace.default_descriptor_extension
+
+        types = dict()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for filename in sorted(files):
+                if not filename.endswith(extension):
+                    continue
+                filename = os.path.join(root, filename)
+                try:
+                    with open(filename, 'r') as descriptor_f:
+                        descriptor = yaml.load(descriptor_f)
+                except (OSError, yaml.YAMLError) as e:
+                    log.warning("Failed to read descriptor file '{}': {}"
+                                .format(filename, e))
+                    descriptor = None
+                types[filename] = self.get_descriptor_type(descriptor)
+        return types
 
 
 def write_local_schema(schemas_root, filename, schema):
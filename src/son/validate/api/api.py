@@ -10,6 +10,7 @@ import urllib.parse as urlparse
 import shutil
 import time
 from son.package.md5 import generate_hash
+from son.package.cache import get_cache
 from flask import Flask, request
 from flask_cache import Cache
 from flask_cors import CORS
@@ -297,7 +298,8 @@ def gen_validation_key(path):
     val_hash = hashlib.md5()
 
     # generate path hash
-    val_hash.update(str(generate_hash(os.path.abspath(path)))
+    val_hash.update(str(generate_hash(os.path.abspath(path),
+                                      cache=get_cache()))
                     .encode('utf-8'))
 
     # validation event config must also be included
@@ -0,0 +1,67 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import copy
+import logging
+from son.package.cache import PersistentCache
+
+log = logging.getLogger(__name__)
+
+
+class ValidationCache(PersistentCache):
+    """
+    Persistent cache of validation results.
+    Entries are keyed on a validation key, built by the validator from the
+    content of the validated descriptors, the validation flags, the loaded
+    schemas and the event configuration (see Validator). Each entry holds
+    the result of a validation and the events it logged.
+    """
+
+    CACHE_VERSION = 1
+    CACHE_NAME = 'validation cache'
+    DEFAULT_MAX_ENTRIES = 1024
+
+    def get(self, key):
+        """
+        Obtain a cached validation.
+        :param key: validation key
+        :return: tuple (result, events), None if not cached
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                return
+            return entry[0], copy.deepcopy(entry[1])
+
+    def put(self, key, result, events):
+        """
+        Store a validation.
+        :param key: validation key
+        :param result: result of the validation
+        :param events: events logged by the validation, mapped by their key
+        """
+        with self._lock:
+            self._store(key, [result, copy.deepcopy(events)])
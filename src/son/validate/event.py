@@ -2,7 +2,9 @@ import yaml
 import logging
 import os
 import pkg_resources
+import threading
 import uuid
+from contextlib import contextmanager
 
 log = logging.getLogger(__name__)
 
@@ -14,30 +16,88 @@ class EventLogger(object):
         self._log = logging.getLogger(name)
         self._events = dict()
 
+        # events captured by each thread, see capture()
+        self._local = threading.local()
+
         # load events config
         self._eventdict = self.load_eventcfg()
 
     @property
     def errors(self):
         return list(filter(lambda event: event['level'] == 'error',
-                           self._events.values()))
+                           self.events.values()))
 
     @property
     def warnings(self):
         return list(filter(lambda event: event['level'] == 'warning',
-                    self._events.values()))
+                    self.events.values()))
+
+    @property
+    def events(self):
+        """
+        Logged events, mapped by their key. Within a capture, the events
+        captured by the calling thread.
+        """
+        captures = getattr(self._local, 'captures', None)
+        return captures[-1] if captures else self._events
+
+    @property
+    def eventcfg(self):
+        """
+        Configured level of each event code.
+        """
+        return self._eventdict
 
     def reset(self):
-        self._events.clear()
+        self.events.clear()
         self._eventdict = self.load_eventcfg()
 
+    def clear(self):
+        """
+        Discard the logged events, keeping the events configuration.
+        """
+        self.events.clear()
+
+    @contextmanager
+    def capture(self):
+        """
+        Capture the events logged by the calling thread, apart from the
+        events of other threads, e.g. to report the events of each task of
+        a pool of threads. Captured events are not added to the events of
+        this logger, see merge().
+        :return: dictionary of the captured events, mapped by their key
+        """
+        if not hasattr(self._local, 'captures'):
+            self._local.captures = []
+        events = dict()
+        self._local.captures.append(events)
+        try:
+            yield events
+        finally:
+            self._local.captures.pop()
+
+    def merge(self, events):
+        """
+        Add the events logged by another event logger, e.g. of a worker
+        process. The details of events already logged are appended to
+        them. Events are not logged again.
+        :param events: logged events, mapped by their key (see events)
+        """
+        current = self.events
+        for key, event in events.items():
+            if key in current:
+                current[key]['detail'].extend(event['detail'])
+            else:
+                current[key] = dict(event, detail=list(event['detail']))
+
     def log(self, header, msg, source_id, event_code, event_id=None,
             detail_event_id=None):
         level = self._eventdict[event_code]
         key = self.get_key(source_id, event_code, level)
+        events = self.events
 
-        if key not in self._events.keys():
-            event = self._events[key] = dict()
+        if key not in events.keys():
+            event = events[key] = dict()
             event['source_id'] = source_id
             event['event_code'] = event_code
             event['level'] = level
@@ -54,7 +114,7 @@ class EventLogger(object):
                 pass
 
         else:
-            event = self._events[key]
+            event = events[key]
 
         if not msg:
             return
@@ -0,0 +1,323 @@
+#  Copyright (c) 2015 SONATA-NFV, UBIWHERE
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, UBIWHERE
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+
+import atexit
+import logging
+import os
+import threading
+import time
+from son.package.cache import PersistentCache
+from son.package.md5 import generate_hash
+from son.validate import event
+from son.validate.util import read_descriptor_file, descriptor_id
+
+log = logging.getLogger(__name__)
+evtlog = event.get_logger('validator.events')
+
+
+class DescriptorIndex(PersistentCache):
+    """
+    Persistent index of the descriptors of directory trees, resolving
+    descriptor ids ('vendor.name.version') to files.
+    Each indexed file is stored with its modification time (ns), size,
+    content hash and descriptor id, and each directory of a tree with its
+    modification time. A tree is only walked again when one of its
+    directories is modified, i.e. when files are added, removed or
+    renamed. Resolving an indexed descriptor id only checks the file it
+    is indexed to: modified files are parsed again, unless their content
+    hash is unchanged. Files that are not valid descriptors are indexed
+    with the events logged when parsing them, which are reported again
+    whenever the descriptors of the tree are listed, instead of parsing
+    them again.
+    The entries of the index are the directory trees.
+    """
+
+    CACHE_VERSION = 3
+    CACHE_NAME = 'descriptor index'
+    DEFAULT_MAX_ENTRIES = 64
+
+    # Directories modified less than this before being walked may be
+    # modified again within the resolution of their modification time,
+    # they are walked again on the next lookup
+    RACY_INTERVAL = 2
+
+    def __init__(self, filename=None, max_trees=None):
+        """
+        Initialize the descriptor index.
+        :param filename: file where the index is persisted. If not
+                         specified, the index is kept in memory only
+        :param max_trees: maximum number of indexed directory trees, by
+                          default DEFAULT_MAX_ENTRIES
+        """
+        super().__init__(filename, max_trees)
+
+    def descriptors(self, path, extension):
+        """
+        Obtain the descriptors of a directory tree, updating its index.
+        :param path: directory to search for descriptors
+        :param extension: extension of descriptor files
+        :return: dictionary of descriptor filenames, mapped by descriptor
+                 id (see read_descriptor_files)
+        """
+        with self._lock:
+            tree = self._tree(path, extension)
+            if not self._scan(path, extension, tree):
+                self._refresh(path, tree)
+            self._replay(tree)
+            descriptors = {did: os.path.join(path, name)
+                           for did, name in tree['ids'].items()}
+
+        log.debug("Indexed {0} descriptors in '{1}'"
+                  .format(len(descriptors), path))
+        return descriptors
+
+    def resolve(self, path, extension, did):
+        """
+        Obtain the file of a descriptor. Only the indexed file of the
+        descriptor is checked for modifications. The directory tree is
+        only checked if the descriptor is not found.
+        Files that are not valid descriptors are not reported.
+        :param path: directory to search for the descriptor
+        :param extension: extension of descriptor files
+        :param did: descriptor id, in the format 'vendor.name.version'
+        :return: descriptor filename, None if not found
+        """
+        with self._lock:
+            tree = self._tree(path, extension)
+            name = tree['ids'].get(did)
+            if name:
+                self._update(path, tree, name)
+                self._reindex(tree)
+                if tree['ids'].get(did) != name:
+                    name = None
+            if not name:
+                # new descriptors, or modified in place
+                if not self._scan(path, extension, tree):
+                    self._refresh(path, tree)
+                name = tree['ids'].get(did)
+
+            return os.path.join(path, name) if name else None
+
+    def _tree(self, path, extension):
+        """
+        Obtain the index of a directory tree:
+        - dirs: modification time of each directory, None if unknown
+        - files: index entry of each file, see _update_entry()
+        - ids: file of each descriptor id
+        Directories and files are indexed by their path relative to the
+        tree.
+        """
+        key = os.path.abspath(path) + os.pathsep + extension
+        tree = self._lookup(key)
+        if tree is None:
+            tree = dict(dirs=dict(), files=dict(), ids=dict())
+            self._store(key, tree)
+        return tree
+
+    def _scan(self, path, extension, tree):
+        """
+        Walk a directory tree, if any of its directories was modified,
+        updating the index entries of its files.
+        :return: True if the tree was walked
+        """
+        if tree['dirs'] and all(
+                mtime is not None and mtime == self._mtime(os.path.join(
+                    path, name)) for name, mtime in tree['dirs'].items()):
+            return False
+
+        racy = (time.time() - self.RACY_INTERVAL) * 1e9
+        dirs = dict()
+        names = []
+        for root, _, files in os.walk(path):
+            mtime = self._mtime(root)
+            dirs[os.path.relpath(root, path)] = \
+                mtime if mtime is not None and mtime < racy else None
+            names += [os.path.relpath(os.path.join(root, file), path)
+                      for file in files if file.endswith(extension)]
+        tree['dirs'] = dirs
+
+        for name in set(tree['files']) - set(names):
+            del tree['files'][name]
+            tree['ids'] = None
+        for name in names:
+            self._update(path, tree, name)
+        self._reindex(tree)
+        self._modified = True
+        return True
+
+    def _refresh(self, path, tree):
+        """
+        Update the index entries of all the files of a directory tree,
+        without walking it.
+        """
+        for name in list(tree['files']):
+            self._update(path, tree, name)
+        self._reindex(tree)
+
+    def _update(self, path, tree, name):
+        """
+        Update the index entry of a file of a directory tree. Its
+        descriptor id is only indexed by _reindex().
+        """
+        file = os.path.join(path, name)
+        entry = tree['files'].get(name)
+        try:
+            updated = self._update_entry(file, entry)
+        except OSError:
+            # removed, the tree is walked again on the next lookup
+            updated = None
+            tree['dirs'] = dict()
+            tree['files'].pop(name, None)
+
+        if updated is not None and updated is not entry:
+            tree['files'][name] = updated
+        if updated is not entry:
+            tree['ids'] = None
+            self._modified = True
+
+    @staticmethod
+    def _reindex(tree):
+        """
+        Map the descriptor ids of a directory tree to their files, if
+        any of its index entries was updated.
+        """
+        if tree['ids'] is not None:
+            return
+
+        tree['ids'] = dict()
+        for name, entry in tree['files'].items():
+            did = entry[3]
+            if not did:
+                continue
+            if did in tree['ids']:
+                log.error("Duplicate descriptor in files: '{0}' <==> '{1}'"
+                          .format(name, tree['ids'][did]))
+                continue
+            tree['ids'][did] = name
+
+    @staticmethod
+    def _replay(tree):
+        """
+        Report the events of the files of a directory tree that are not
+        valid descriptors.
+        """
+        for entry in tree['files'].values():
+            if entry[4]:
+                evtlog.merge(entry[4])
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return
+
+    @staticmethod
+    def _update_entry(file, entry):
+        """
+        Obtain the up to date index entry of a file.
+        :param file: descriptor filename
+        :param entry: current entry [mtime_ns, size, hash, id, events] of
+                      the file, None if not indexed. The events are the
+                      ones logged when parsing files that are not valid
+                      descriptors
+        :return: the current entry if unchanged, a new entry otherwise
+        :raise OSError: if the file cannot be read
+        """
+        st = os.stat(file)
+        if entry and entry[:2] == [st.st_mtime_ns, st.st_size]:
+            return entry
+
+        md5 = generate_hash(file)
+        if entry and entry[2] == md5:
+            return [st.st_mtime_ns, st.st_size, md5] + entry[3:]
+
+        # the events are reported by _replay(), on each listing
+        previous = dict(evtlog.events)
+        evtlog.clear()
+        try:
+            content = read_descriptor_file(file)
+            events = dict(evtlog.events)
+        finally:
+            evtlog.clear()
+            evtlog.merge(previous)
+
+        did = descriptor_id(content) if content else None
+        return [st.st_mtime_ns, st.st_size, md5, did,
+                None if did else events]
+
+    @staticmethod
+    def _dump_entry(key, entry):
+        return [key, entry]
+
+    @staticmethod
+    def _load_entry(item):
+        return item[0], item[1]
+
+
+class DescriptorIndexManager(object):
+
+    def __init__(self):
+        self._indexes = dict()
+        self._lock = threading.Lock()
+
+    def get_index(self, filename=None):
+        with self._lock:
+            if filename not in self._indexes:
+                index = self._indexes[filename] = DescriptorIndex(filename)
+                atexit.register(index.save)
+
+            return self._indexes[filename]
+
+
+DescriptorIndex.manager = DescriptorIndexManager()
+
+
+def get_index(filename=None):
+    """
+    Obtain the descriptor index persisted in the given file. The same
+    index object is shared by all callers in the process and is saved on
+    exit.
+    :param filename: index filename. If None, a process-wide in-memory
+                     index is returned
+    :return: DescriptorIndex object
+    """
+    return DescriptorIndex.manager.get_index(filename)
+
+
+def get_workspace_index(workspace):
+    """
+    Obtain the descriptor index of a workspace. The index is only
+    persisted if the workspace exists on disk.
+    :param workspace: SONATA workspace object
+    :return: DescriptorIndex object
+    """
+    if workspace and os.path.isfile(os.path.join(
+            workspace.workspace_root, workspace.__descriptor_name__)):
+        return get_index(os.path.join(workspace.workspace_root,
+                                      workspace.__descriptor_index_name__))
+
+    return get_index()
@@ -28,10 +28,10 @@ import os
 import logging
 import networkx as nx
 import validators
-import requests
 from collections import OrderedDict
 from son.validate.util import descriptor_id, read_descriptor_file
 from son.validate import event
+from son.package.remote import get_probe
 
 log = logging.getLogger(__name__)
 evtlog = event.get_logger('validator.events')
@@ -84,17 +84,19 @@ class DescriptorStorage(object):
             return
         return self.services[sid]
 
-    def create_package(self, descriptor_file):
+    def create_package(self, descriptor_file, content=None):
         """
         Create and store a package based on the provided descriptor filename.
         If a package is already stored with the same id, it will return the
         stored package.
         :param descriptor_file: package descriptor filename
+        :param content: package descriptor dictionary, if already loaded.
+                        The descriptor file is not read in this case
         :return: created package object or, if id exists, the stored package.
         """
-        if not os.path.isfile(descriptor_file):
+        if content is None and not os.path.isfile(descriptor_file):
             return
-        new_package = Package(descriptor_file)
+        new_package = Package(descriptor_file, content=content)
         if new_package.id in self._packages:
             return self._packages[new_package.id]
 
@@ -286,7 +288,7 @@ class VBridge:
 
 
 class Descriptor(Node):
-    def __init__(self, descriptor_file):
+    def __init__(self, descriptor_file, content=None):
         """
         Initialize a generic descriptor object.
         This object inherits the node object.
@@ -295,14 +297,21 @@ class Descriptor(Node):
             - content: descriptor dictionary
             - filename: filename of the descriptor
         :param descriptor_file: filename of the descriptor
+        :param content: descriptor dictionary, if already loaded. The
+                        descriptor file is not read in this case
         """
         self._id = None
         self._content = None
         self._filename = None
-        self.filename = descriptor_file
+        if content is None:
+            self.filename = descriptor_file
+        else:
+            self._filename = descriptor_file
+            self.content = content
         super().__init__(self.id)
         self._complete_graph = None
         self._graph = None
+        self._topology_graphs = {}
         self._vlinks = {}
         self._vbridges = {}
 
@@ -407,6 +416,18 @@ class Descriptor(Node):
     def complete_graph(self, value):
         self._complete_graph = value
 
+    def clear_topology_graphs(self):
+        """
+        Discard the memoized topology graphs of the descriptor. This is
+        done whenever connection points, links or associated descriptors
+        are added.
+        """
+        self._topology_graphs.clear()
+
+    def add_connection_point(self, cp):
+        self.clear_topology_graphs()
+        return super().add_connection_point(cp)
+
     def load_connection_points(self):
         """
         Load connection points of the descriptor.
@@ -456,6 +477,7 @@ class Descriptor(Node):
                 return
 
         self._vbridges[vb_id] = VBridge(vb_id, cp_refs)
+        self.clear_topology_graphs()
         return True
 
     def add_vlink(self, vl_id, cp_refs):
@@ -495,6 +517,7 @@ class Descriptor(Node):
                 return
 
         self._vlinks[vl_id] = VLink(vl_id, cp_refs[0], cp_refs[1])
+        self.clear_topology_graphs()
         return True
 
     def load_virtual_links(self):
@@ -543,12 +566,13 @@ class Descriptor(Node):
 
 class Package(Descriptor):
 
-    def __init__(self, descriptor_file):
+    def __init__(self, descriptor_file, content=None):
         """
         Initialize a package object. This inherits the descriptor object.
         :param descriptor_file: descriptor filename
+        :param content: descriptor dictionary, if already loaded
         """
-        super().__init__(descriptor_file)
+        super().__init__(descriptor_file, content=content)
 
     @property
     def entry_service_file(self):
@@ -688,11 +712,34 @@ class Service(Descriptor):
 
         self._functions[func.id] = func
         self._vnf_id_map[vnf_id] = func.id
+        self.clear_topology_graphs()
+
+    @property
+    def complete_graph(self):
+        """
+        GraphML representation (list of lines) of the complete topology
+        graph of the service, i.e. VDU level with bridges. It is generated
+        on first access, once the topology graph of the service is built.
+        """
+        if self._complete_graph is None and self.graph is not None:
+            graph = self.build_topology_graph(level=3, bridges=True,
+                                              vdu_inner_connections=False)
+            self._complete_graph = list(nx.generate_graphml(
+                graph, encoding='utf-8', prettyprint=True))
+        return self._complete_graph
+
+    @complete_graph.setter
+    def complete_graph(self, value):
+        self._complete_graph = value
 
     def build_topology_graph(self, level=1, bridges=False,
                              vdu_inner_connections=True):
         """
         Build the network topology graph of the service.
+        Graphs are memoized per combination of arguments, the graphs of the
+        associated functions being shared by all levels. The returned graph
+        must not be modified. Memoized graphs are discarded when the
+        service is modified, but not when its associated functions are.
         :param level: indicates the granulariy of the graph
                     0: service level (does not show VNF interfaces)
                     1: service level (with VNF interfaces) - default
@@ -705,6 +752,14 @@ class Service(Descriptor):
         """
         assert 0 <= level <= 3  # level must be 0, 1, 2, 3
 
+        key = (level, bridges, vdu_inner_connections)
+        if key not in self._topology_graphs:
+            self._topology_graphs[key] = self._build_topology_graph(
+                level, bridges, vdu_inner_connections)
+        return self._topology_graphs[key]
+
+    def _build_topology_graph(self, level, bridges,
+                              vdu_inner_connections):
         graph = nx.Graph()
 
         def_node_attrs = {'label': '',
@@ -1081,6 +1136,7 @@ class Function(Descriptor):
             return
 
         self._units[unit.id] = unit
+        self.clear_topology_graphs()
 
     def load_units(self):
         """
@@ -1093,20 +1149,22 @@ class Function(Descriptor):
                       .format(self.id))
             return
 
+        # Check vm image URLs, all at once
+        # only perform a check if vm_image is a URL
+        vdu_images = get_probe().probe(
+            [vdu['vm_image'] for vdu in self.content[
+                'virtual_deployment_units']
+             if validators.url(vdu['vm_image'])])
+
         for vdu in self.content['virtual_deployment_units']:
             unit = Unit(vdu['id'])
             self.associate_unit(unit)
 
-            # Check vm image URLs
-            # only perform a check if vm_image is a URL
             vdu_image_path = vdu['vm_image']
-            if validators.url(vdu_image_path):  # Check if is URL/URI.
-                try:
-                    # Check if the image URL is accessible
-                    # within a short time interval
-                    requests.head(vdu_image_path, timeout=1)
-
-                except (requests.Timeout, requests.ConnectionError):
+            if vdu_image_path in vdu_images:  # Check if is URL/URI.
+                # Check if the image URL was accessible
+                # within a short time interval
+                if not vdu_images[vdu_image_path]:
 
                     evtlog.log("VDU image not found",
                                "Failed to verify the existence of VDU image at"
@@ -1120,6 +1178,7 @@ class Function(Descriptor):
         """
         Load connection points of the units of the function.
         """
+        self.clear_topology_graphs()
         for vdu in self.content['virtual_deployment_units']:
             if vdu['id'] not in self.units.keys():
                 log.error("Unit id='{0}' is not associated with function "
@@ -1137,6 +1196,9 @@ class Function(Descriptor):
                              vdu_inner_connections=True):
         """
         Build the network topology graph of the function.
+        Graphs are memoized per combination of arguments and discarded
+        when the function is modified. The returned graph must not be
+        modified.
         :param bridges: indicates if bridges should be included in the graph
         :param parent_id: identify the parent service of this function
         :param level: indicates the granularity of the graph
@@ -1145,6 +1207,14 @@ class Function(Descriptor):
         :param vdu_inner_connections: indicates whether VDU connection points
                                       should be internally connected
         """
+        key = (bridges, parent_id, level, vdu_inner_connections)
+        if key not in self._topology_graphs:
+            self._topology_graphs[key] = self._build_topology_graph(
+                bridges, parent_id, level, vdu_inner_connections)
+        return self._topology_graphs[key]
+
+    def _build_topology_graph(self, bridges, parent_id, level,
+                              vdu_inner_connections):
         graph = nx.Graph()
 
         def_node_attrs = {'label': '',
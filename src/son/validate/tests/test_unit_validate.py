@@ -27,8 +27,15 @@
 import unittest
 import os
 import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 import socket
 from son.validate.validate import Validator
+from son.validate.cache import ValidationCache
+from son.validate.storage import DescriptorStorage
+from son.validate.index import DescriptorIndex, evtlog
+from son.validate.util import read_descriptor_files, list_files
 from son.workspace.workspace import Workspace, Project
 from son.validate.event import EventLogger
 from Crypto.PublicKey import RSA
@@ -330,6 +337,280 @@ class UnitValidateTests(unittest.TestCase):
         validator.validate_function(functions_path)
         self.assertGreater(validator.error_count, 0)
 
+    def test_validate_function_parallel(self):
+        """
+        Tests the concurrent validation of multiple SONATA functions,
+        whose report must be the same of a sequential validation.
+        """
+        functions_path = os.path.join(SAMPLES_DIR, 'functions',
+                                      'invalid_syntax')
+
+        reports = dict()
+        for workers in (1, 2):
+            for keep_going in (False, True):
+                validator = Validator()
+                validator.configure(syntax=True, integrity=False,
+                                    topology=False, workers=workers,
+                                    keep_going=keep_going)
+                self.assertIsNone(validator.validate_function(functions_path))
+                reports[(workers, keep_going)] = validator.errors
+
+        self.assertEqual(reports[(1, False)], reports[(2, False)])
+        self.assertEqual(reports[(1, True)], reports[(2, True)])
+        self.assertEqual(len(reports[(1, False)]), 1)
+        self.assertEqual(len(reports[(1, True)]), 3)
+
+    def test_validate_cached(self):
+        """
+        Tests the validation of SONATA functions and services answered from
+        the validation cache, which must be invalidated when a validated
+        descriptor or a referenced function descriptor changes, but not
+        when an unreferenced function descriptor changes.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        functions_path = os.path.join(tmp_dir, 'functions')
+        shutil.copytree(os.path.join(SAMPLES_DIR, 'functions',
+                                     'invalid_syntax'), functions_path)
+        service_path = os.path.join(SAMPLES_DIR, 'services',
+                                    'invalid_topology.yml')
+        cache_file = os.path.join(tmp_dir, 'cache.json')
+
+        def validate(path, **kwargs):
+            cache = ValidationCache(cache_file)
+            validator = Validator()
+            validator.configure(cache=cache, **kwargs)
+            if os.path.isdir(path):
+                result = validator.validate_function(path)
+            else:
+                result = validator.validate_service(path)
+            cache.save()
+            return result, validator, len(cache)
+
+        result, validator, entries = validate(
+            functions_path, syntax=True, integrity=False, topology=False,
+            keep_going=True)
+        self.assertIsNone(result)
+        self.assertEqual(entries, 3)
+        self.assertEqual(len(validator.storage.functions), 3)
+        errors = validator.errors
+
+        # unchanged functions are answered from the cache
+        result, validator, entries = validate(
+            functions_path, syntax=True, integrity=False, topology=False,
+            keep_going=True)
+        self.assertIsNone(result)
+        self.assertEqual(entries, 3)
+        self.assertEqual(len(validator.storage.functions), 0)
+        self.assertEqual(validator.errors, errors)
+
+        # other validation flags are not answered from the cache
+        self.assertEqual(validate(functions_path, syntax=True,
+                                  integrity=True, topology=False,
+                                  keep_going=True)[2], 6)
+
+        # changed functions are validated again
+        vnfd_file = sorted(os.listdir(functions_path))[0]
+        with open(os.path.join(functions_path, vnfd_file), 'a') as _file:
+            _file.write('\n# modified\n')
+        result, validator, entries = validate(
+            functions_path, syntax=True, integrity=False, topology=False,
+            keep_going=True)
+        self.assertEqual(entries, 7)
+        self.assertEqual(len(validator.storage.functions), 1)
+        self.assertEqual(validator.errors, errors)
+
+        # services are validated again when a referenced function changes
+        result, validator, entries = validate(service_path,
+                                              dpath=functions_path)
+        errors = validator.errors
+        self.assertEqual(validate(service_path, dpath=functions_path)[2],
+                         entries)
+        self.assertEqual(validator.errors, errors)
+        with open(os.path.join(functions_path, 'other-vnfd.yml'), 'w') as f:
+            f.write('vendor: "eu.sonata-nfv"\nname: "other-vnf"\n'
+                    'version: "0.1"\n')
+        self.assertEqual(validate(service_path, dpath=functions_path)[2],
+                         entries)
+        with open(os.path.join(functions_path, vnfd_file), 'a') as _file:
+            _file.write('# modified again\n')
+        self.assertEqual(validate(service_path, dpath=functions_path)[2],
+                         entries + 1)
+
+        # services referring to missing functions are not cached
+        self.assertEqual(validate(os.path.join(SAMPLES_DIR, 'services',
+                                               'invalid_integrity.yml'),
+                                  dpath=functions_path)[2], entries + 1)
+
+        # services whose graphs are exported are validated again
+        with patch.object(Validator, '_validate_service', autospec=True,
+                          side_effect=Validator._validate_service) as vs:
+            result, validator, cached = validate(
+                service_path, dpath=functions_path, graphs_dir=tmp_dir)
+        self.assertEqual(vs.call_count, 1)
+        self.assertEqual(cached, entries + 1)
+        self.assertEqual(validator.errors, errors)
+
+    def test_validate_cached_package(self):
+        """
+        Tests the validation cache of the members of packages, extracted to
+        a different temporary directory on each validation, which must be
+        keyed on their path relative to the package directory.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        cache = ValidationCache()
+
+        def validate(package_dir):
+            shutil.copytree(os.path.join(SAMPLES_DIR, 'functions',
+                                         'invalid_syntax'),
+                            os.path.join(package_dir, 'function_descriptors'))
+            # its events refer to the service descriptor file
+            service_path = os.path.join(package_dir, 'service.yml')
+            with open(service_path, 'w') as _file:
+                _file.write('name: [sonata\n')
+
+            validator = Validator()
+            validator.configure(cache=cache, dpath=os.path.join(
+                package_dir, 'function_descriptors'))
+            validator._package_root = package_dir
+            validator.validate_service(service_path)
+            return validator
+
+        validator = validate(os.path.join(tmp_dir, 'package1'))
+        self.assertEqual(len(cache), 1)
+        events = repr(validator.errors + validator.warnings)
+        self.assertIn('package1', events)
+
+        validator = validate(os.path.join(tmp_dir, 'package2'))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(repr(validator.errors + validator.warnings),
+                         events.replace('package1', 'package2'))
+
+    def test_topology_graph_memoized(self):
+        """
+        Tests the memoization of the topology graphs of a SONATA function,
+        which must be discarded when the function is modified.
+        """
+        storage = DescriptorStorage()
+        func = storage.create_function(os.path.join(
+            SAMPLES_DIR, 'functions', 'valid', 'firewall-vnfd.yml'))
+        self.assertTrue(func.load_units())
+        self.assertTrue(func.load_unit_connection_points())
+        self.assertTrue(func.load_connection_points())
+        func.load_virtual_links()
+
+        graph = func.build_topology_graph(bridges=True)
+        self.assertIs(func.build_topology_graph(bridges=True), graph)
+        self.assertIsNot(func.build_topology_graph(bridges=False), graph)
+
+        self.assertTrue(func.add_vlink('memo-vlink', ['memo-u', 'memo-v']))
+        updated = func.build_topology_graph(bridges=True)
+        self.assertIsNot(updated, graph)
+        self.assertTrue(updated.has_edge('memo-u', 'memo-v'))
+        self.assertFalse(graph.has_edge('memo-u', 'memo-v'))
+
+    def test_descriptor_index(self):
+        """
+        Tests the resolution of function descriptors by a persistent
+        descriptor index, which must only parse new or modified files and
+        only walk modified directories.
+        """
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        functions_path = os.path.join(tmp_dir, 'functions')
+        shutil.copytree(os.path.join(SAMPLES_DIR, 'functions', 'valid'),
+                        functions_path)
+        broken_file = os.path.join(functions_path, 'broken.yml')
+        with open(broken_file, 'w') as _file:
+            _file.write('vendor: [eu.sonata-nfv\n')
+        # directories modified long enough ago to be trusted
+        past = time.time() - 60
+        os.utime(functions_path, (past, past))
+        index_file = os.path.join(tmp_dir, 'index.json')
+
+        evtlog.clear()
+        index = DescriptorIndex(index_file)
+        descriptors = index.descriptors(functions_path, 'yml')
+        self.assertEqual(descriptors, read_descriptor_files(
+            list_files(functions_path, 'yml')))
+        self.assertEqual(len(descriptors), 3)
+        evtlog.clear()
+        index.save()
+
+        # unchanged files are resolved from the persisted index, without
+        # walking the directory, and invalid files are reported again
+        index = DescriptorIndex(index_file)
+        with patch('son.validate.index.read_descriptor_file') as read, \
+                patch('son.validate.index.os.walk') as walk:
+            self.assertEqual(index.resolve(functions_path, 'yml',
+                                           'eu.sonata-nfv.iperf-vnf.0.2'),
+                             descriptors['eu.sonata-nfv.iperf-vnf.0.2'])
+            self.assertEqual(evtlog.events, {})
+            self.assertEqual(index.descriptors(functions_path, 'yml'),
+                             descriptors)
+            self.assertFalse(read.called)
+            self.assertFalse(walk.called)
+        self.assertEqual([e['source_id'] for e in evtlog.events.values()],
+                         [broken_file])
+        evtlog.clear()
+
+        # modified and removed files are updated in the index
+        iperf_file = descriptors['eu.sonata-nfv.iperf-vnf.0.2']
+        with open(iperf_file, 'r') as _file:
+            content = _file.read()
+        with open(iperf_file, 'w') as _file:
+            _file.write(content.replace('version: "0.2"',
+                                        'version: "0.4"', 1))
+        self.assertEqual(index.resolve(functions_path, 'yml',
+                                       'eu.sonata-nfv.iperf-vnf.0.4'),
+                         iperf_file)
+        os.remove(descriptors['eu.sonata-nfv.tcpdump-vnf.0.2'])
+
+        updated = index.descriptors(functions_path, 'yml')
+        self.assertEqual(sorted(updated), ['eu.sonata-nfv.firewall-vnf.0.3',
+                                           'eu.sonata-nfv.iperf-vnf.0.4'])
+        self.assertIsNone(index.resolve(functions_path, 'yml',
+                                        'eu.sonata-nfv.iperf-vnf.0.2'))
+
+        # the least recently used trees are evicted
+        index = DescriptorIndex(index_file, max_trees=2)
+        for name in ('a', 'b'):
+            os.mkdir(os.path.join(tmp_dir, name))
+            os.utime(os.path.join(tmp_dir, name), (past, past))
+            index.descriptors(os.path.join(tmp_dir, name), 'yml')
+        index.save()
+        self.assertEqual(len(index), 2)
+        index = DescriptorIndex(index_file, max_trees=1)
+        self.assertEqual(len(index), 1)
+        with patch('son.validate.index.os.walk') as walk:
+            index.descriptors(os.path.join(tmp_dir, 'b'), 'yml')
+            self.assertFalse(walk.called)
+
+    def test_event_capture(self):
+        """
+        Tests the capture of the events logged by concurrent threads,
+        apart from each other and from the events of the logger.
+        """
+        logger = EventLogger('test.capture')
+
+        def log(source_id):
+            with logger.capture() as events:
+                logger.log("Invalid descriptor", "Invalid", source_id,
+                           'evt_invalid_descriptor')
+                return dict(events), logger.events is events
+
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            results = list(ex.map(log, ['a', 'b']))
+        for source_id, (events, captured) in zip(['a', 'b'], results):
+            self.assertTrue(captured)
+            self.assertEqual([e['source_id'] for e in events.values()],
+                             [source_id])
+        self.assertEqual(logger.events, {})
+
+        logger.merge(results[0][0])
+        self.assertEqual(len(logger.errors), 1)
+
     def test_event_config_cli(self):
         """
         Tests the custom event configuration meant to be used with the CLI
@@ -32,34 +32,53 @@ import uuid
 import coloredlogs
 import networkx as nx
 import zipfile
-import time
 import shutil
-import atexit
+import tempfile
 import errno
+import hashlib
+import json
 import yaml
+from concurrent.futures import ProcessPoolExecutor
 from son.validate import event
-from contextlib import closing
+from son.package.archive import PackageReader, MANIFEST_NAME, \
+    verify_archive
+from son.package.cache import get_workspace_cache
 from son.package.md5 import generate_hash
 from son.schema.validator import SchemaValidator
 from son.workspace.workspace import Workspace, Project
 from son.validate.storage import DescriptorStorage
-from son.validate.util import read_descriptor_files, list_files, strip_root, \
-    build_descriptor_id
+from son.validate.cache import ValidationCache
+from son.validate.index import get_index, get_workspace_index
+from son.validate.util import list_files, strip_root, build_descriptor_id
 from Crypto.PublicKey import RSA
 from Crypto.Hash import SHA256
 
 log = logging.getLogger(__name__)
 evtlog = event.get_logger('validator.events')
 
+# Members of a package extracted to validate it: all of them, only the
+# package, service and function descriptors, or none
+PKG_EXTRACT_ALL = 'all'
+PKG_EXTRACT_DESCRIPTORS = 'descriptors'
+PKG_EXTRACT_NONE = 'none'
+PKG_EXTRACT_MODES = (PKG_EXTRACT_ALL, PKG_EXTRACT_DESCRIPTORS,
+                     PKG_EXTRACT_NONE)
+
+# Placeholder of the (temporary) directory of an extracted package, in
+# the validation cache keys and the cached events of its members
+PACKAGE_ROOT = '<package>'
+
 
 class Validator(object):
 
-    def __init__(self, workspace=None):
+    def __init__(self, workspace=None, schema_validator=None):
         """
         Initialize the Validator.
         A workspace may be provided for an easy parameter configuration,
         such as location and extension of descriptors, verbosity level, etc.
         :param workspace: SONATA workspace object
+        :param schema_validator: SchemaValidator object to reuse (e.g. the
+                                 one of a packager), created if None
         """
         self._workspace = workspace
         self._syntax = True
@@ -80,6 +99,29 @@ class Validator(object):
         self._pkg_signature = None
         self._pkg_pubkey = None
 
+        # members of packages extracted for validation
+        self._pkg_extract = PKG_EXTRACT_DESCRIPTORS
+
+        # validation of multiple functions: number of worker processes and
+        # whether to continue after an invalid function
+        self._workers = 1
+        self._keep_going = False
+
+        # cache of validation results, disabled if None
+        self._cache = None
+        self._cache_salt = None
+        self._hash_cache = get_workspace_cache(self._workspace)
+
+        # index of function descriptors, resolving their ids to files
+        self._index = get_workspace_index(self._workspace)
+
+        # directory of the package being validated, if extracted
+        self._package_root = None
+
+        # directory to export the service topology graphs (GraphML) to,
+        # disabled if None
+        self._graphs_dir = None
+
         # configure logs
         coloredlogs.install(level=self._log_level)
 
@@ -87,7 +129,8 @@ class Validator(object):
         self._storage = DescriptorStorage()
 
         # syntax validation
-        self._schema_validator = SchemaValidator(self._workspace, preload=True)
+        self._schema_validator = schema_validator if schema_validator else \
+            SchemaValidator(self._workspace, preload=True)
 
         # reset event logger
         evtlog.reset()
@@ -118,6 +161,13 @@ class Validator(object):
         """
         return len(self.warnings)
 
+    @property
+    def schema_validator(self):
+        """
+        Provides the schema validator, with its library of loaded schemas.
+        """
+        return self._schema_validator
+
     @property
     def storage(self):
         """
@@ -125,6 +175,16 @@ class Validator(object):
         """
         return self._storage
 
+    def reset(self):
+        """
+        Discard the resources stored by previous validations, allowing the
+        validator (and its loaded schemas) to be reused for unrelated
+        descriptors, e.g. across multiple projects.
+        """
+        self._storage = DescriptorStorage()
+        self._fwgraphs = dict()
+        self.source_id = None
+
     @property
     def dpath(self):
         return self._dpath
@@ -135,7 +195,8 @@ class Validator(object):
 
     def configure(self, syntax=None, integrity=None, topology=None,
                   dpath=None, dext=None, debug=None, pkg_signature=None,
-                  pkg_pubkey=None):
+                  pkg_pubkey=None, pkg_extract=None, workers=None,
+                  keep_going=None, cache=None, graphs_dir=None):
         """
         Configure parameters for validation. It is recommended to call this
         function before performing a validation.
@@ -147,6 +208,17 @@ class Validator(object):
         :param debug: increase verbosity level of logger
         :param pkg_signature: String package signature to be validated
         :param pkg_pubkey: String package public key to verify signature
+        :param pkg_extract: members of packages to extract for validation,
+                            one of PKG_EXTRACT_MODES
+        :param workers: number of processes validating the functions of a
+                        directory concurrently
+        :param keep_going: continue validating the functions of a directory
+                           after an invalid one, reporting all of them
+        :param cache: ValidationCache object answering the validation of
+                      unchanged services and functions, or False to
+                      disable it
+        :param graphs_dir: directory to export the topology graphs of
+                           validated services to, or False to disable it
         """
         # assign parameters
         if syntax is not None:
@@ -169,6 +241,19 @@ class Validator(object):
             self._pkg_signature = pkg_signature
         if pkg_pubkey is not None:
             self._pkg_pubkey = pkg_pubkey
+        if pkg_extract is not None:
+            if pkg_extract not in PKG_EXTRACT_MODES:
+                raise ValueError("Invalid package extraction mode '{}'"
+                                 .format(pkg_extract))
+            self._pkg_extract = pkg_extract
+        if workers is not None:
+            self._workers = max(1, workers)
+        if keep_going is not None:
+            self._keep_going = keep_going
+        if cache is not None:
+            self._cache = cache if cache is not False else None
+        if graphs_dir is not None:
+            self._graphs_dir = graphs_dir if graphs_dir else None
 
     def _assert_configuration(self):
         """
@@ -177,6 +262,7 @@ class Validator(object):
         interrupted with the appropriate error.
         This is an internal function which must be invoked only by:
             - 'validate_package'
+            - 'validate_generated_package'
             - 'validate_project'
             - 'validate_service'
             - 'validate_function'
@@ -184,7 +270,8 @@ class Validator(object):
         # ensure this function is called by specific functions
         caller = inspect.stack()[1][3]
         if caller != 'validate_function' and caller != 'validate_service' and \
-           caller != 'validate_project' and caller != 'validate_package':
+           caller != 'validate_project' and caller != 'validate_package' and \
+           caller != 'validate_generated_package':
             log.error("Cannot assert a correct configuration. Validation "
                       "scope couldn't be determined. Aborting")
             return
@@ -204,7 +291,8 @@ class Validator(object):
             log.error("Nothing to validate. Aborting.")
             return
 
-        if caller == 'validate_package':
+        if caller == 'validate_package' or \
+                caller == 'validate_generated_package':
             pass
 
         elif caller == 'validate_project':
@@ -230,6 +318,11 @@ class Validator(object):
         Validate a SONATA package.
         By default, it performs the following validations: syntax, integrity
         and network topology.
+        The package is read in place: only the members required by the
+        validation (see 'pkg_extract' of configure) are extracted, to a
+        private temporary directory removed once the validation completes.
+        The MD5 hashes of the remaining members, e.g. VDU images, are
+        verified by streaming them from the package.
         :param package: SONATA package filename
         :return: True if all validations were successful, False otherwise
         """
@@ -247,47 +340,184 @@ class Validator(object):
                        'evt_package_format_invalid')
             return
 
-        package_dir = '.' + str(time.time())
-        with closing(zipfile.ZipFile(package, 'r')) as pkg:
-            # extract package contents
-            pkg.extractall(package_dir)
+        with PackageReader(package) as reader:
+            # validate package file structure
+            if not self._validate_package_struct(
+                    [m.filename for m in reader.members]):
+                evtlog.log("Invalid package structure",
+                           "Invalid SONATA package structure '{}'"
+                           .format(package),
+                           self.source_id,
+                           'evt_package_struct_invalid')
+                return
+
+            # validate package signature (optional)
+            if (self._pkg_signature and self._pkg_pubkey) and (
+                    not self.validate_package_signature(package,
+                                                        self._pkg_signature,
+                                                        self._pkg_pubkey)):
+                evtlog.log("Invalid package signature",
+                           "Invalid signature of package '{}'"
+                           .format(package),
+                           self.source_id,
+                           'evt_package_signature_invalid')
+                return
 
-            # set folder for deletion when program exits
-            atexit.register(shutil.rmtree, package_dir)
+            if self._pkg_extract == PKG_EXTRACT_NONE:
+                return self._validate_package_contents(reader)
+
+            # the extracted descriptors are only indexed in memory, the
+            # temporary directory is not worth persisting
+            package_dir = tempfile.mkdtemp(prefix='son-validate-')
+            index = self._index
+            self._index = get_index()
+            self._package_root = package_dir
+            try:
+                reader.extract(package_dir,
+                               self._package_extract_members(reader))
+                return self._validate_package_contents(reader, package_dir)
+            finally:
+                self._index = index
+                self._package_root = None
+                shutil.rmtree(package_dir, ignore_errors=True)
+
+    def validate_generated_package(self, descriptor, members, package=None):
+        """
+        Validate a package just generated, from the state handed over by
+        its builder (e.g. the packager), instead of reading it back: its
+        package descriptor and the members written, along with their CRCs.
+        The package file is only verified to hold the members written,
+        from its central directory and local headers, i.e. without reading
+        their data. The integrity validation is limited to the references
+        of the package descriptor to the members.
+        :param descriptor: package descriptor dictionary
+        :param members: metadata (ZipInfo) of the members written
+        :param package: SONATA package filename. If None (e.g. the package
+                        was written to a stream), it is not verified
+        :return: True if all validations were successful, None otherwise
+        """
+        if not self._assert_configuration():
+            return
+
+        self.source_id = package
+        pd_filename = os.path.join(package or '', MANIFEST_NAME)
+        log.info("Validating generated package '{0}'".format(
+            os.path.abspath(package) if package else pd_filename))
+
+        if package:
+            try:
+                verify_archive(package, members)
+            except (OSError, zipfile.BadZipFile) as e:
+                evtlog.log("Invalid package format",
+                           "Invalid SONATA package '{}': {}"
+                           .format(package, e),
+                           self.source_id,
+                           'evt_package_format_invalid')
+                return
 
-        # validate package file structure
-        if not self._validate_package_struct(package_dir):
+        names = [m.filename for m in members]
+        if not self._validate_package_struct(names):
             evtlog.log("Invalid package structure",
-                       "Invalid SONATA package structure '{}'".format(package),
+                       "Invalid SONATA package structure '{}'"
+                       .format(package),
                        self.source_id,
                        'evt_package_struct_invalid')
             return
 
-        # validate package signature (optional)
-        if (self._pkg_signature and self._pkg_pubkey) and (
-                not self.validate_package_signature(package,
-                                                    self._pkg_signature,
-                                                    self._pkg_pubkey)):
-            evtlog.log("Invalid package signature",
-                       "Invalid signature of package '{}'".format(package),
-                       self.source_id,
-                       'evt_package_signature_invalid')
+        package = self._create_package(pd_filename, descriptor)
+        if not package:
+            return
+
+        if self._syntax and not self._validate_package_syntax(package):
             return
 
-        pd_filename = os.path.join(package_dir, 'META-INF', 'MANIFEST.MF')
-        package = self._storage.create_package(pd_filename)
-        if not package.id:
+        if self._integrity and \
+                not self._validate_package_members(package, names):
+            return
+
+        return True
+
+    def _validate_package_contents(self, reader, package_dir=None):
+        """
+        Validate the syntax and integrity of an opened package.
+        :param reader: PackageReader of the package
+        :param package_dir: directory of the extracted members, None if
+                            nothing was extracted
+        :return: True if all validations were successful, None otherwise
+        """
+        if package_dir:
+            package = self._storage.create_package(
+                os.path.join(package_dir, MANIFEST_NAME))
+        else:
+            package = self._package_from_reader(reader)
+        if not package or not package.id:
             return
 
         if self._syntax and not self._validate_package_syntax(package):
             return
 
-        if self._integrity and \
-                not self._validate_package_integrity(package, package_dir):
+        if self._integrity and not self._validate_package_integrity(
+                package, reader, package_dir):
             return
 
         return True
 
+    def _package_extract_members(self, reader):
+        """
+        Select the members of a package to extract, according to the
+        configured extraction mode.
+        :param reader: PackageReader of the package
+        :return: list of member names
+        """
+        names = [m.filename for m in reader.members]
+        if self._pkg_extract == PKG_EXTRACT_ALL:
+            return names
+
+        members = [n for n in names if n.split('/', 1)[0] in
+                   ('META-INF', 'service_descriptors',
+                    'function_descriptors')]
+        try:
+            members.extend(reader.descriptors)
+        except yaml.YAMLError:
+            # reported once the package descriptor is loaded
+            pass
+        return members
+
+    def _package_from_reader(self, reader):
+        """
+        Create the package object of a package that is not extracted, from
+        the package descriptor read in place.
+        :param reader: PackageReader of the package
+        :return: package object, None if the descriptor is invalid
+        """
+        pd_filename = os.path.join(reader.filename, MANIFEST_NAME)
+        try:
+            content = reader.manifest
+        except yaml.YAMLError as exc:
+            evtlog.log("Invalid descriptor",
+                       "Error parsing descriptor file: {0}".format(exc),
+                       pd_filename,
+                       'evt_invalid_descriptor')
+            return
+
+        return self._create_package(pd_filename, content)
+
+    def _create_package(self, pd_filename, content):
+        """
+        Create the package object of a package descriptor already loaded.
+        :param pd_filename: filename of the package descriptor
+        :param content: package descriptor dictionary
+        :return: package object, None if the descriptor is invalid
+        """
+        if not isinstance(content, dict) or 'vendor' not in content or \
+                'name' not in content or 'version' not in content:
+            log.warning("Invalid SONATA descriptor file: '{0}'. Missing "
+                        "'vendor', 'name' or 'version'. Ignoring."
+                        .format(pd_filename))
+            return
+
+        return self._storage.create_package(pd_filename, content=content)
+
     def validate_project(self, project):
         """
         Validate a SONATA project.
@@ -342,6 +572,49 @@ class Validator(object):
         log.info("... syntax: {0}, integrity: {1}, topology: {2}"
                  .format(self._syntax, self._integrity, self._topology))
 
+        # the topology graphs are only exported by an actual validation
+        if self._topology and self._graphs_dir:
+            return self._validate_service(nsd_file)
+
+        # the referenced functions are searched in dpath
+        references = self._service_references(nsd_file) \
+            if self._dpath and (self._integrity or self._topology) else []
+
+        return self._validate_cached(
+            nsd_file, lambda: self._validate_service(nsd_file), references)
+
+    def _service_references(self, nsd_file):
+        """
+        Resolve the function descriptors referenced by a service through
+        the descriptor index, i.e. the files its validation depends on.
+        The service descriptor is parsed quietly, its issues are reported
+        by the validation itself.
+        :param nsd_file: service descriptor filename
+        :return: list of function descriptor filenames, None for the ones
+                 that are not found
+        """
+        try:
+            with open(nsd_file, 'r') as _file:
+                content = yaml.load(_file)
+        except (OSError, yaml.YAMLError):
+            return []
+        if not isinstance(content, dict):
+            return []
+
+        references = []
+        for func in content.get('network_functions') or []:
+            try:
+                fid = build_descriptor_id(func['vnf_vendor'],
+                                          func['vnf_name'],
+                                          func['vnf_version'])
+            except (KeyError, TypeError):
+                references.append(None)
+                continue
+            references.append(
+                self._index.resolve(self._dpath, self._dext, fid))
+        return references
+
+    def _validate_service(self, nsd_file):
         service = self._storage.create_service(nsd_file)
         if not service:
             evtlog.log("Invalid service descriptor",
@@ -379,16 +652,26 @@ class Validator(object):
         if os.path.isdir(vnfd_path):
             log.info("Validating functions in path '{0}'".format(vnfd_path))
 
-            vnfd_files = list_files(vnfd_path, self._dext)
+            vnfd_files = sorted(list_files(vnfd_path, self._dext))
+            if self._workers > 1 and len(vnfd_files) > 1:
+                return self._validate_functions_parallel(vnfd_files)
+
+            valid = True
             for vnfd_file in vnfd_files:
                 if not self.validate_function(vnfd_file):
-                    return
-            return True
+                    if not self._keep_going:
+                        return
+                    valid = False
+            return valid or None
 
         log.info("Validating function '{0}'".format(vnfd_path))
         log.info("... syntax: {0}, integrity: {1}, topology: {2}"
                  .format(self._syntax, self._integrity, self._topology))
 
+        return self._validate_cached(
+            vnfd_path, lambda: self._validate_function(vnfd_path))
+
+    def _validate_function(self, vnfd_path):
         func = self._storage.create_function(vnfd_path)
         if not func:
             evtlog.log("Invalid function descriptor",
@@ -408,15 +691,188 @@ class Validator(object):
 
         return True
 
-    def _validate_package_struct(self, package_dir):
+    def _validate_functions_parallel(self, vnfd_files):
+        """
+        Validate multiple functions concurrently, by a pool of processes.
+        The events logged by the workers are merged in the order of the
+        function descriptor files, i.e. the report is the same of a
+        sequential validation, regardless of the number of workers.
+        :param vnfd_files: list of function descriptor filenames
+        :return: True if all validations were successful, None otherwise
+        """
+        config = dict(syntax=self._syntax, integrity=self._integrity,
+                      topology=self._topology, dext=self._dext)
+
+        # functions answered from the cache are not submitted
+        keys = [self._validation_key(vnfd_file) for vnfd_file in vnfd_files]
+        cached = [self._cache_get(key) if key else None for key in keys]
+
+        valid = True
+        with ProcessPoolExecutor(max_workers=self._workers) as ex:
+            futures = [ex.submit(_validate_function_worker,
+                                 self._workspace, config, vnfd_file)
+                       if not entry else None
+                       for vnfd_file, entry in zip(vnfd_files, cached)]
+            for key, entry, future in zip(keys, cached, futures):
+                if entry:
+                    result, events = entry
+                else:
+                    result, events = future.result()
+                    if key:
+                        self._cache_put(key, result, events)
+                evtlog.merge(events)
+                if result:
+                    continue
+                valid = False
+                if not self._keep_going:
+                    for pending in futures:
+                        if pending:
+                            pending.cancel()
+                    break
+
+        return valid or None
+
+    def _validate_cached(self, descriptor_file, validate, references=None):
+        """
+        Perform a validation, unless its result is cached. A cached
+        validation is answered with its result and the events it logged,
+        i.e. the report is the same of an actual validation. Resources
+        (e.g. network topology graphs) are not stored by cached validations,
+        thus services whose graphs are exported are not cached.
+        :param descriptor_file: validated descriptor filename
+        :param validate: function performing the validation
+        :param references: filenames of the descriptors the validation
+                           depends on, None for the ones that are not found
+        :return: result of the validation
+        """
+        key = self._validation_key(descriptor_file, references)
+        if not key:
+            return validate()
+
+        entry = self._cache_get(key)
+        if entry:
+            log.info("Validation of '{0}' answered from cache"
+                     .format(descriptor_file))
+            result, events = entry
+            evtlog.merge(events)
+            return result
+
+        # isolate the events logged by this validation
+        previous = dict(evtlog.events)
+        evtlog.clear()
+        try:
+            result = validate()
+            self._cache_put(key, result, evtlog.events)
+        finally:
+            logged = dict(evtlog.events)
+            evtlog.clear()
+            evtlog.merge(previous)
+            evtlog.merge(logged)
+
+        return result
+
+    def _validation_key(self, descriptor_file, references=None):
+        """
+        Build the cache key of a validation, from the content of the
+        validated descriptor and of the descriptors it depends on, the
+        validation flags, the loaded schemas and the event configuration.
+        :param descriptor_file: validated descriptor filename
+        :param references: filenames of the descriptors the validation
+                           depends on, None for the ones that are not found
+        :return: validation key, None if the cache is disabled or the
+                 validation cannot be cached
+        """
+        if self._cache is None:
+            return
+
+        # validations failing on missing dependencies are not cached
+        references = references or []
+        if not all(references):
+            return
+
+        if not self._cache_salt:
+            schemas = [self._schema_validator.load_schema(template)
+                       for template in
+                       (SchemaValidator.SCHEMA_SERVICE_DESCRIPTOR,
+                        SchemaValidator.SCHEMA_FUNCTION_DESCRIPTOR)]
+            if not all(schemas):
+                return
+            self._cache_salt = json.dumps(
+                [schemas, sorted(evtlog.eventcfg.items())], sort_keys=True)
+
+        key = hashlib.md5()
+        key.update(self._cache_salt.encode('utf-8'))
+        key.update(repr((self._syntax, self._integrity, self._topology,
+                         self._dext)).encode('utf-8'))
+        for filename in [descriptor_file] + sorted(references):
+            if not os.path.isfile(filename):
+                return
+            key.update(self._relocate(os.path.abspath(filename))
+                       .encode('utf-8'))
+            key.update(generate_hash(filename, cache=self._hash_cache)
+                       .encode('utf-8'))
+
+        return key.hexdigest()
+
+    def _cache_get(self, key):
+        """
+        Obtain a cached validation, its events located in the package
+        being validated, if any.
+        """
+        entry = self._cache.get(key)
+        if not entry or not self._package_root:
+            return entry
+        result, events = entry
+        return result, self._relocate(events, PACKAGE_ROOT,
+                                      self._package_root)
+
+    def _cache_put(self, key, result, events):
+        """
+        Store a validation, the paths of its events relative to the
+        package being validated, if any, as its directory is temporary.
+        """
+        if self._package_root:
+            events = self._relocate(events)
+        self._cache.put(key, result, events)
+
+    def _relocate(self, value, src=None, dst=PACKAGE_ROOT):
+        """
+        Replace the directory of the package being validated in the
+        strings of a value, e.g. paths or logged events.
+        :param value: string, or list or dictionary of values
+        :param src: directory to replace, the package directory if None
+        :param dst: replacement of the directory
+        :return: relocated value
+        """
+        src = src or self._package_root
+        if not src:
+            return value
+        if isinstance(value, str):
+            return value.replace(src, dst)
+        if isinstance(value, list):
+            return [self._relocate(v, src, dst) for v in value]
+        if isinstance(value, dict):
+            return {self._relocate(k, src, dst): self._relocate(v, src, dst)
+                    for k, v in value.items()}
+        return value
+
+    def _validate_package_struct(self, members):
         """
         Validate the file structure of a SONATA package.
-        :param package_dir: directory of extracted package
+        :param members: names of the members of the package
         :return: True if successful, False otherwise
         """
+        def children(directory):
+            # files and directories located directly inside a directory
+            prefix = directory + '/'
+            return set(n[len(prefix):].split('/', 1)[0] for n in members
+                       if n.startswith(prefix) and n != prefix)
+
+        def exists(directory):
+            return any(n.startswith(directory + '/') for n in members)
+
         # validate directory 'META-INF'
-        meta_dir = os.path.join(package_dir, 'META-INF')
-        if not os.path.isdir(meta_dir):
+        if not exists('META-INF'):
             evtlog.log("Invalid package structure",
                        "A directory named 'META-INF' must exist, "
                        "located at the root of the package",
@@ -424,7 +880,7 @@ class Validator(object):
                        'evt_package_struct_invalid')
             return
 
-        if len(os.listdir(meta_dir)) > 1:
+        if len(children('META-INF')) > 1:
             evtlog.log("Invalid package structure",
                        "The 'META-INF' directory must only contain the file "
                        "'MANIFEST.MF'",
@@ -432,7 +888,7 @@ class Validator(object):
                        'evt_package_struct_invalid')
             return
 
-        if not os.path.exists(os.path.join(meta_dir, 'MANIFEST.MF')):
+        if MANIFEST_NAME not in members:
             evtlog.log("Invalid package structure",
                        "A file named 'MANIFEST.MF' must exist in directory "
                        "'META-INF'",
@@ -441,9 +897,8 @@ class Validator(object):
             return
 
         # validate directory 'service_descriptors'
-        services_dir = os.path.join(package_dir, 'service_descriptors')
-        if os.path.isdir(services_dir):
-            if len(os.listdir(services_dir)) == 0:
+        if exists('service_descriptors'):
+            if len(children('service_descriptors')) == 0:
                 evtlog.log("Invalid package structure",
                            "The 'service_descriptors' directory must contain "
                            "at least one service descriptor file",
@@ -452,9 +907,8 @@ class Validator(object):
                 return
 
         # validate directory 'function_descriptors'
-        functions_dir = os.path.join(package_dir, 'function_descriptors')
-        if os.path.isdir(functions_dir):
-            if len(os.listdir(functions_dir)) == 0:
+        if exists('function_descriptors'):
+            if len(children('function_descriptors')) == 0:
                 evtlog.log("Invalid package structure",
                            "The 'function_descriptors' directory must contain "
                            "at least one function descriptor file",
@@ -547,39 +1001,45 @@ class Validator(object):
             return
         return True
 
-    def _validate_package_integrity(self, package, root_dir):
+    def _validate_package_integrity(self, package, reader, root_dir=None):
         """
         Validate the integrity of a package.
-        It will validate the entry service of the package as well as its
+        It will validate the MD5 hashes of the packaged files, streamed from
+        the package, and the entry service of the package as well as its
         referenced functions.
         :param package: package object
+        :param reader: PackageReader of the package
+        :param root_dir: directory of the extracted package descriptors.
+                         If None, the entry service is not validated
         :return: True if syntax is correct, None otherwise
         """
         log.info("Validating integrity of package '{0}'".format(package.id))
 
-        # load referenced service descriptor files
-        for f in package.descriptors:
-            filename = os.path.join(root_dir, strip_root(f))
-            log.debug("Verifying file '{0}'".format(f))
-            if not os.path.isfile(filename):
-                evtlog.log("Invalid descriptor reference",
-                           "Referenced descriptor file '{0}' is not "
-                           "packaged.".format(f),
-                           package.id,
-                           'evt_pd_itg_invalid_reference')
-                return
+        if not self._validate_package_members(
+                package, [m.filename for m in reader.members]):
+            return
+
+        for item in package.content['package_content']:
+            if item.get('sealed') is False or not reader.member(item['name']):
+                continue
 
-            gen_md5 = generate_hash(filename)
-            manif_md5 = package.md5(strip_root(f))
+            gen_md5 = reader.md5(item['name'])
+            manif_md5 = item.get('md5')
             if manif_md5 and gen_md5 != manif_md5:
                 evtlog.log("Invalid MD5 in PD",
                            "MD5 hash of file '{0}' is not equal to the "
                            "defined in package descriptor. Gen MD5: {1}. "
                            "MANIF MD5: {2}"
-                           .format(f, gen_md5, manif_md5),
+                           .format(item['name'], gen_md5, manif_md5),
                            package.id,
                            'evt_pd_itg_invalid_md5')
 
+        if not root_dir:
+            log.info("Descriptors of package '{0}' are not extracted, "
+                     "skipping the validation of its entry service"
+                     .format(package.id))
+            return True
+
         # configure dpath for function referencing
         self.configure(dpath=os.path.join(root_dir, 'function_descriptors'))
 
@@ -596,6 +1056,28 @@ class Validator(object):
 
         return self.validate_service(entry_service_file)
 
+    def _validate_package_members(self, package, members):
+        """
+        Validate that the descriptors referenced by a package are packaged.
+        :param package: package object
+        :param members: names of the members of the package
+        :return: True if all references are valid, None otherwise
+        """
+        members = set(members)
+
+        # load referenced service descriptor files
+        for f in package.descriptors:
+            log.debug("Verifying file '{0}'".format(f))
+            if strip_root(f) not in members:
+                evtlog.log("Invalid descriptor reference",
+                           "Referenced descriptor file '{0}' is not "
+                           "packaged.".format(f),
+                           package.id,
+                           'evt_pd_itg_invalid_reference')
+                return
+
+        return True
+
     def _validate_service_integrity(self, service):
         """
         Validate the integrity of a service (NS).
@@ -812,7 +1294,8 @@ class Validator(object):
                   .format(service.id, service.graph.edges()))
 
         # write service graphs with different levels and options
-        self.write_service_graphs(service)
+        if self._graphs_dir:
+            self.write_service_graphs(service, self._graphs_dir)
 
         if nx.is_connected(service.graph):
             log.debug("Topology graph of service '{0}' is connected"
@@ -1058,44 +1541,40 @@ class Validator(object):
         if not self._dpath:
             return
 
-        vnfd_files = list_files(self._dpath, self._dext)
-        log.debug("Found {0} descriptors in dpath='{2}': {1}"
-                  .format(len(vnfd_files), vnfd_files, self._dpath))
-
-        # load all VNFDs
-        path_vnfs = read_descriptor_files(vnfd_files)
-
         # check for errors
         if 'network_functions' not in service.content:
             log.error("Service doesn't have any functions. "
                       "Missing 'network_functions' section.")
             return
 
-        functions = service.content['network_functions']
-        if functions and not path_vnfs:
-            evtlog.log("VNF not found",
-                       "Service references VNFs but none could be found in "
-                       "'{0}'. Please specify another '--dpath'"
-                       .format(self._dpath),
-                       service.id,
-                       'evt_nsd_itg_function_unavailable')
-            return
-
-        # store function descriptors referenced in the service
-        for func in functions:
+        # store function descriptors referenced in the service, resolving
+        # their ids to files through the descriptor index
+        for func in service.content['network_functions']:
             fid = build_descriptor_id(func['vnf_vendor'],
                                       func['vnf_name'],
                                       func['vnf_version'])
-            if fid not in path_vnfs.keys():
+            vnfd_file = self._index.resolve(self._dpath, self._dext, fid)
+            if not vnfd_file:
+                # listing the descriptors reports the invalid ones
+                if not self._index.descriptors(self._dpath, self._dext):
+                    evtlog.log("VNF not found",
+                               "Service references VNFs but none could be "
+                               "found in '{0}'. Please specify another "
+                               "'--dpath'".format(self._dpath),
+                               service.id,
+                               'evt_nsd_itg_function_unavailable')
+                    return
                 evtlog.log("VNF not found",
                            "Referenced function descriptor id='{0}' couldn't "
                            "be loaded".format(fid),
                            service.id,
                            'evt_nsd_itg_function_unavailable')
                 return
+            log.debug("Resolved function descriptor id='{0}' to '{1}'"
+                      .format(fid, vnfd_file))
 
             vnf_id = func['vnf_id']
-            new_func = self._storage.create_function(path_vnfs[fid])
+            new_func = self._storage.create_function(vnfd_file)
 
             service.associate_function(new_func, vnf_id)
 
@@ -1164,16 +1643,19 @@ class Validator(object):
         return backtrace
 
     @staticmethod
-    def write_service_graphs(service):
-        graphsdir = 'graphs'
+    def write_service_graphs(service, graphsdir='graphs'):
+        """
+        Export the topology graphs of a service, with different levels and
+        options, to GraphML files.
+        :param service: service whose topology graphs are exported
+        :param graphsdir: directory of the GraphML files
+        """
         try:
             os.makedirs(graphsdir)
         except OSError as exc:
             if exc.errno == errno.EEXIST and os.path.isdir(graphsdir):
                 pass
 
-        service.build_topology_graph(level=3, bridges=False)
-
         for lvl in range(0, 4):
             g = service.build_topology_graph(level=lvl, bridges=False)
             nx.write_graphml(g, os.path.join(graphsdir,
@@ -1186,13 +1668,48 @@ class Validator(object):
 
         g = service.build_topology_graph(level=3, bridges=True,
                                          vdu_inner_connections=False)
-        service.complete_graph = nx.generate_graphml(g, encoding='utf-8',
-                                                     prettyprint=True)
         nx.write_graphml(g, os.path.join(graphsdir,
                                          "{0}-lvl3-complete.graphml"
                                          .format(service.id)))
 
 
+_worker_validator = None
+
+
+def _validate_function_worker(workspace, config, vnfd_file):
+    """
+    Validate a function in a worker process, reusing the validator of the
+    process.
+    :return: tuple of the validation result and the logged events
+    """
+    global _worker_validator
+    if not _worker_validator:
+        _worker_validator = Validator(workspace=workspace)
+    _worker_validator.configure(**config)
+
+    evtlog.clear()
+    result = _worker_validator.validate_function(vnfd_file)
+    return result, evtlog.events
+
+
+def get_validation_cache(ws_root=None):
+    """
+    Obtain the validation cache of a workspace. The cache is only
+    persisted if the workspace exists on disk.
+    :param ws_root: workspace directory. If not specified, the default
+                    workspace is used
+    :return: ValidationCache object
+    """
+    if not ws_root:
+        ws_root = Workspace.DEFAULT_WORKSPACE_DIR
+
+    if os.path.isfile(os.path.join(ws_root, Workspace.__descriptor_name__)):
+        return ValidationCache(os.path.join(
+            ws_root, Workspace.__validation_cache_name__))
+
+    return ValidationCache()
+
+
 def print_result(validator, result):
 
     if not result:
@@ -1241,7 +1758,8 @@ def main():
         "-w", "--workspace",
         dest="workspace_path",
         help="Specify the directory of the SDK workspace for validating the "
-             "SDK project. If not specified will assume the directory: '{}'"
+             "SDK project. The validation cache is kept in the workspace. "
+             "If not specified will assume the directory: '{}'"
              .format(Workspace.DEFAULT_WORKSPACE_DIR),
         required=False
     )
@@ -1308,6 +1826,52 @@ def main():
         action="store_true",
         default=False
     )
+    parser.add_argument(
+        "--extract",
+        help="Members of the package extracted to validate it, when using "
+             "the '--package' argument: 'all', only the 'descriptors' "
+             "(default) or 'none'. Packaged files are verified in place, "
+             "without extracting them. If 'none', the entry service of the "
+             "package is not validated.",
+        choices=PKG_EXTRACT_MODES,
+        required=False
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of processes validating the functions of a directory "
+             "concurrently, when using the '--function' argument "
+             "(default: 1)",
+        type=int,
+        default=1,
+        required=False
+    )
+    parser.add_argument(
+        "--keep-going",
+        dest="keep_going",
+        help="Continue validating the functions of a directory after an "
+             "invalid one, reporting all invalid functions",
+        required=False,
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "--graphs",
+        dest="graphs_dir",
+        help="Export the topology graphs of validated services to GraphML "
+             "files, in the specified directory (default: 'graphs')",
+        nargs="?",
+        const="graphs",
+        required=False
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        help="Do not answer the validation of unchanged services and "
+             "functions from the validation cache of the workspace",
+        required=False,
+        action="store_false",
+        default=True
+    )
     parser.add_argument(
         "--debug",
         help="sets verbosity level to debug",
@@ -1321,6 +1885,7 @@ def main():
     if not args.syntax and not args.integrity and not args.topology:
         args.syntax = args.integrity = args.topology = True
 
+    cache = None
     if args.package_file:
         if not os.path.isfile(args.package_file):
             log.error("Provided package is not a valid file")
@@ -1341,7 +1906,9 @@ def main():
         validator.configure(syntax=args.syntax,
                             integrity=args.integrity,
                             topology=args.topology,
-                            debug=args.debug if args.debug else None)
+                            debug=args.debug if args.debug else None,
+                            pkg_extract=args.extract,
+                            graphs_dir=args.graphs_dir)
 
         result = validator.validate_package(args.package_file)
         print_result(validator, result)
@@ -1366,33 +1933,48 @@ def main():
             log.error("Invalid project path: '%s'\n  " % prj_root)
             exit(1)
 
+        cache = get_validation_cache(ws_root) if args.cache else False
+
         validator = Validator(workspace=workspace)
         validator.configure(syntax=args.syntax,
                             integrity=args.integrity,
                             topology=args.topology,
-                            debug=args.debug)
+                            debug=args.debug,
+                            cache=cache,
+                            graphs_dir=args.graphs_dir)
 
         result = validator.validate_project(project)
         print_result(validator, result)
 
     elif args.nsd:
+        cache = get_validation_cache(args.workspace_path) \
+            if args.cache else False
+
         validator = Validator()
         validator.configure(dpath=args.dpath, dext=args.dext,
                             syntax=args.syntax,
                             integrity=args.integrity,
                             topology=args.topology,
-                            debug=args.debug)
+                            debug=args.debug,
+                            cache=cache,
+                            graphs_dir=args.graphs_dir)
 
         result = validator.validate_service(args.nsd)
         print_result(validator, result)
 
     elif args.vnfd:
+        cache = get_validation_cache(args.workspace_path) \
+            if args.cache else False
+
         validator = Validator()
         validator.configure(dext=args.dext,
                             syntax=args.syntax,
                             integrity=args.integrity,
                             topology=args.topology,
-                            debug=args.debug)
+                            debug=args.debug,
+                            workers=args.workers,
+                            keep_going=args.keep_going,
+                            cache=cache)
 
         result = validator.validate_function(args.vnfd)
         print_result(validator, result)
@@ -1401,4 +1983,7 @@ def main():
         log.error("Invalid arguments.")
         exit(1)
 
+    if cache:
+        cache.save()
+
     exit(0)
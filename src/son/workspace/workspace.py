@@ -42,6 +42,9 @@ class Workspace:
     DEFAULT_WORKSPACE_DIR = os.path.join(expanduser("~"), ".son-workspace")
     DEFAULT_SCHEMAS_DIR = os.path.join(expanduser("~"), ".son-schema")
     __descriptor_name__ = "workspace.yml"
+    __hash_cache_name__ = ".hash_cache.json"
+    __validation_cache_name__ = ".validation_cache.json"
+    __descriptor_index_name__ = ".descriptor_index.json"
 
     def __init__(self, ws_root, config=None, ws_name=None, log_level=None):
 
@@ -97,6 +100,10 @@ class Workspace:
     def config(self):
         return self._ws_config
 
+    @property
+    def hash_cache_file(self):
+        return os.path.join(self.workspace_root, Workspace.__hash_cache_name__)
+
     @property
     def catalogues_dir(self):
         return self.config['catalogues_dir']